@@ -0,0 +1,172 @@
+"""
+Фоновый отправитель писем из outbox (таблица email_logs).
+Забирает пачки ожидающих писем через FOR UPDATE SKIP LOCKED, отправляет их
+через одно SMTP-соединение на пачку и записывает sent_at/error_message.
+Неудачные попытки повторяются с экспоненциальной задержкой.
+
+Запуск: python email_sender.py [--once]
+Локально можно направить на заглушку SMTP, например:
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 python email_sender.py --once
+"""
+
+import os
+import smtplib
+import sys
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from email.message import EmailMessage
+from typing import Dict, Any, List, Optional, Tuple
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '25'))
+SMTP_USER = os.environ.get('SMTP_USER')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_TLS = os.environ.get('SMTP_TLS', 'false') == 'true'
+SMTP_FROM = os.environ.get('SMTP_FROM', 'noreply@vitamins.ru')
+
+BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '50'))
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+BACKOFF_BASE_SECONDS = 30
+LEASE_SECONDS = 300
+POLL_INTERVAL_SECONDS = 5
+
+STATUS_NAMES = {
+    'pending': 'ожидает обработки',
+    'confirmed': 'подтверждён',
+    'shipped': 'отправлен',
+    'delivered': 'доставлен',
+    'cancelled': 'отменён',
+}
+
+def backoff_seconds(attempts: int) -> int:
+    """Задержка перед следующей попыткой: 30с, 1м, 2м, 4м ... но не больше часа"""
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), 3600)
+
+def render_body(email_type: str, payload: Dict[str, Any]) -> str:
+    """Формирует текст письма по типу и данным из outbox"""
+    order_number = payload.get('orderNumber', '')
+    if email_type == 'order_created':
+        lines = [f"Здравствуйте, {payload.get('customerName') or 'покупатель'}!", '',
+                 f'Ваш заказ {order_number} принят.', '']
+        for item in payload.get('items') or []:
+            lines.append(f"— {item.get('name')} × {item.get('quantity', 1)}: {item.get('price')} ₽")
+        lines += ['', f"Итого: {payload.get('totalAmount')} ₽"]
+        return '\n'.join(lines)
+
+    status = payload.get('status')
+    lines = [f'Статус заказа {order_number}: {STATUS_NAMES.get(status, status)}.']
+    if payload.get('trackingNumber'):
+        lines.append(f"Трек-номер для отслеживания: {payload['trackingNumber']}")
+    return '\n'.join(lines)
+
+def claim_batch(conn, batch_size: int) -> List[Tuple]:
+    """Забирает пачку писем; аренда через next_attempt_at защищает от повторной выдачи при падении"""
+    cur = conn.cursor()
+    cur.execute('''
+        UPDATE email_logs
+        SET attempts = attempts + 1,
+            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+        WHERE id IN (
+            SELECT id FROM email_logs
+            WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+            ORDER BY next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, recipient_email, subject, email_type, payload, attempts
+    ''', (LEASE_SECONDS, batch_size))
+    rows = cur.fetchall()
+    conn.commit()
+    cur.close()
+    return rows
+
+def open_smtp() -> smtplib.SMTP:
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_TLS:
+        smtp.starttls()
+    if SMTP_USER:
+        smtp.login(SMTP_USER, SMTP_PASSWORD or '')
+    return smtp
+
+def send_batch(rows: List[Tuple], smtp_factory=open_smtp) -> List[Tuple[int, Optional[str]]]:
+    """Отправляет пачку через одно SMTP-соединение; возвращает (id, ошибка или None)"""
+    outcomes = []
+    try:
+        smtp = smtp_factory()
+    except (OSError, smtplib.SMTPException) as e:
+        return [(row[0], f'SMTP недоступен: {e}') for row in rows]
+
+    try:
+        for email_id, recipient, subject, email_type, payload, _ in rows:
+            try:
+                # Сборка письма тоже может упасть (CR/LF в адресе): ошибка относится только к этому письму
+                message = EmailMessage()
+                message['From'] = SMTP_FROM
+                message['To'] = recipient
+                message['Subject'] = subject or ''
+                message.set_content(render_body(email_type, payload or {}))
+                smtp.send_message(message)
+                outcomes.append((email_id, None))
+            except smtplib.SMTPServerDisconnected as e:
+                sent = {o[0] for o in outcomes}
+                outcomes += [(row[0], f'Соединение разорвано: {e}') for row in rows if row[0] not in sent]
+                break
+            except Exception as e:
+                outcomes.append((email_id, str(e)))
+    finally:
+        try:
+            smtp.quit()
+        except (OSError, smtplib.SMTPException):
+            pass
+
+    return outcomes
+
+def record_outcomes(conn, rows: List[Tuple], outcomes: List[Tuple[int, Optional[str]]]) -> None:
+    """Записывает результат отправки одной командой на пачку"""
+    attempts = {row[0]: row[5] for row in rows}
+    values = []
+    for email_id, error in outcomes:
+        if error is None:
+            values.append((email_id, 'sent', None, 0))
+        elif attempts[email_id] >= MAX_ATTEMPTS:
+            values.append((email_id, 'failed', error, 0))
+        else:
+            values.append((email_id, 'pending', error, backoff_seconds(attempts[email_id])))
+
+    cur = conn.cursor()
+    execute_values(cur, '''
+        UPDATE email_logs AS e
+        SET status = v.status,
+            error_message = v.error_message,
+            sent_at = CASE WHEN v.status = 'sent' THEN CURRENT_TIMESTAMP ELSE e.sent_at END,
+            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => v.delay)
+        FROM (VALUES %s) AS v(id, status, error_message, delay)
+        WHERE e.id = v.id
+    ''', values, template='(%s, %s::varchar, %s::text, %s::int)')
+    conn.commit()
+    cur.close()
+
+def run_once(conn, batch_size: int = BATCH_SIZE, smtp_factory=open_smtp) -> int:
+    """Обрабатывает одну пачку; возвращает количество взятых писем"""
+    rows = claim_batch(conn, batch_size)
+    if rows:
+        record_outcomes(conn, rows, send_batch(rows, smtp_factory))
+    return len(rows)
+
+def main(argv: List[str]) -> None:
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        while True:
+            processed = run_once(conn)
+            if '--once' in argv and processed < BATCH_SIZE:
+                break
+            if processed < BATCH_SIZE:
+                time.sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
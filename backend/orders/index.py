@@ -1,8 +1,154 @@
+import base64
+import csv
+import io
 import json
-import os
-import psycopg2
+import re
+from psycopg2.extras import execute_values
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from rate_limit import RATE_LIMITER
+from api_router import METRICS, Request, Router, error_response, json_response
+
+BULK_CHUNK_SIZE = 500
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+def normalize_email(email: str) -> str:
+    return (email or '').strip().lower()
+
+def normalize_phone(phone: str) -> str:
+    """Приводит телефон к E.164; российские номера 8XXXXXXXXXX и 10-значные получают +7"""
+    raw = (phone or '').strip()
+    digits = re.sub(r'\D', '', raw)
+    if not digits:
+        return raw
+    if not raw.startswith('+'):
+        if len(digits) == 11 and digits[0] == '8':
+            digits = '7' + digits[1:]
+        elif len(digits) == 10:
+            digits = '7' + digits
+    return '+' + digits
+
+STATUS_SUBJECTS = {
+    'confirmed': 'Заказ {order_number} подтверждён',
+    'shipped': 'Заказ {order_number} отправлен',
+    'delivered': 'Заказ {order_number} доставлен',
+    'cancelled': 'Заказ {order_number} отменён',
+}
+
+def status_email_row(order_id: int, email: str, order_number: str, status: str, tracking_number: str) -> Tuple:
+    """Готовит строку outbox для письма о смене статуса заказа"""
+    subject = STATUS_SUBJECTS.get(status, 'Статус заказа {order_number} изменён').format(order_number=order_number)
+    payload = {'orderNumber': order_number, 'status': status, 'trackingNumber': tracking_number}
+    return (order_id, email, subject, 'order_status', json.dumps(payload))
+
+def enqueue_emails(cur, rows: List[Tuple]) -> None:
+    """Ставит письма в outbox (email_logs) в текущей транзакции; отправляет их email_sender"""
+    if rows:
+        execute_values(cur, '''
+            INSERT INTO email_logs (order_id, recipient_email, subject, email_type, payload)
+            VALUES %s
+        ''', rows)
+
+def read_body(event: Dict[str, Any]) -> str:
+    """Возвращает тело запроса как строку с учётом base64"""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return body
+
+def manifest_value(item: Dict[str, Any], *names: str) -> Optional[str]:
+    """Первое непустое поле строки JSON-манифеста строкой (номер может прийти числом)"""
+    for name in names:
+        value = item.get(name)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return None
+
+def parse_bulk_rows(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Разбирает манифест обновлений: JSON-массив или CSV (order_number, status, tracking_number)"""
+    raw = read_body(event).lstrip('\ufeff')
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    content_type = headers.get('content-type', '')
+    
+    if 'csv' not in content_type and raw.lstrip()[:1] in ('[', '{'):
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            if 'csv' in data:
+                raw = data['csv']
+            else:
+                data = data.get('rows', [])
+        if isinstance(data, list):
+            return [{
+                'order_number': manifest_value(item, 'orderNumber', 'order_number') or '',
+                'status': manifest_value(item, 'status'),
+                'tracking_number': manifest_value(item, 'trackingNumber', 'tracking_number')
+            } for item in data if isinstance(item, dict)]
+    
+    reader = csv.reader(io.StringIO(raw))
+    rows = []
+    for values in reader:
+        if not values or not any(v.strip() for v in values):
+            continue
+        values = [v.strip() for v in values] + ['', '']
+        if not rows and values[0].lower() in ('order_number', 'ordernumber', 'номер заказа'):
+            continue
+        rows.append({
+            'order_number': values[0],
+            'status': values[1] or None,
+            'tracking_number': values[2] or None
+        })
+    return rows
+
+def apply_bulk_updates(cur, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Применяет обновления пачками по BULK_CHUNK_SIZE одним UPDATE ... FROM (VALUES ...) на пачку"""
+    results: List[Dict[str, Any]] = [None] * len(rows)
+    latest: Dict[str, int] = {}
+    
+    for i, row in enumerate(rows):
+        if not row['order_number']:
+            results[i] = {'row': i, 'orderNumber': None, 'result': 'invalid', 'error': 'order_number не указан'}
+            continue
+        if row['order_number'] in latest:
+            prev = latest[row['order_number']]
+            results[prev] = {'row': prev, 'orderNumber': row['order_number'], 'result': 'superseded'}
+        latest[row['order_number']] = i
+    
+    pending: List[Tuple[int, Dict[str, Any]]] = [(i, rows[i]) for i in sorted(latest.values())]
+    
+    for start in range(0, len(pending), BULK_CHUNK_SIZE):
+        chunk = pending[start:start + BULK_CHUNK_SIZE]
+        updated = execute_values(cur, '''
+            UPDATE orders AS o
+            SET status = COALESCE(v.status, o.status),
+                tracking_number = COALESCE(v.tracking_number, o.tracking_number),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(order_number, status, tracking_number)
+            JOIN order_lookup AS l ON l.order_number = v.order_number
+            JOIN orders AS prev ON prev.id = l.order_id AND prev.created_at = l.created_at
+            WHERE o.id = prev.id AND o.created_at = prev.created_at
+            RETURNING o.order_number, o.id, o.customer_email, prev.status, o.status, o.tracking_number
+        ''', [(row['order_number'], row['status'], row['tracking_number']) for _, row in chunk],
+            template='(%s::varchar, %s::varchar, %s::varchar)', page_size=BULK_CHUNK_SIZE, fetch=True)
+        
+        found = {}
+        emails = []
+        for order_number, order_id, email, old_status, new_status, tracking_number in updated:
+            found[order_number] = order_id
+            if new_status != old_status:
+                emails.append(status_email_row(order_id, email, order_number, new_status, tracking_number))
+        enqueue_emails(cur, emails)
+        
+        for i, row in chunk:
+            if row['order_number'] in found:
+                results[i] = {'row': i, 'orderNumber': row['order_number'], 'orderId': found[row['order_number']], 'result': 'updated'}
+            else:
+                results[i] = {'row': i, 'orderNumber': row['order_number'], 'result': 'not_found'}
+    
+    return results
+
+router = Router('GET, POST, PUT, OPTIONS')
+METRICS.collect('rateLimit', lambda: RATE_LIMITER.stats)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -10,169 +156,225 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event с httpMethod, body, queryStringParameters
     Returns: HTTP response с данными заказа или списком заказов
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    db_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(db_url)
-    cur = conn.cursor()
+    return router.handle(event, context)
+
+@router.route('POST')
+def create_order(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    raw_email = body_data.get('customerEmail')
+    customer_email = normalize_email(raw_email) if isinstance(raw_email, str) else ''
+    # Адрес уходит в заголовок To письма: пустой или с переводом строки не ставим в очередь
+    if not customer_email or '\r' in customer_email or '\n' in customer_email:
+        return error_response(400, 'Некорректный customerEmail')
     
-    try:
-        if method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            
-            order_number = f"VIT-{datetime.now().strftime('%Y%m%d')}-{datetime.now().timestamp():.0f}"
-            
-            cur.execute('''
-                INSERT INTO orders (
-                    order_number, customer_name, customer_email, customer_phone,
-                    delivery_method, delivery_address, delivery_city, delivery_postal_code,
-                    total_amount, items, survey_data, status, payment_status
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, order_number, created_at
-            ''', (
-                order_number,
-                body_data.get('customerName'),
-                body_data.get('customerEmail'),
-                body_data.get('customerPhone'),
-                body_data.get('deliveryMethod'),
-                body_data.get('deliveryAddress'),
-                body_data.get('deliveryCity'),
-                body_data.get('deliveryPostalCode'),
-                body_data.get('totalAmount'),
-                json.dumps(body_data.get('items', [])),
-                json.dumps(body_data.get('surveyData')),
-                'pending',
-                'pending'
-            ))
-            
-            result = cur.fetchone()
-            order_id, order_num, created = result
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'isBase64Encoded': False,
-                'body': json.dumps({
-                    'success': True,
-                    'orderId': order_id,
-                    'orderNumber': order_num,
-                    'createdAt': created.isoformat()
-                })
-            }
-        
-        elif method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            order_number = params.get('orderNumber')
-            
-            if order_number:
-                cur.execute('''
-                    SELECT id, order_number, customer_name, customer_email,
-                           delivery_method, total_amount, status, payment_status,
-                           tracking_number, created_at
-                    FROM orders WHERE order_number = %s
-                ''', (order_number,))
-                
-                row = cur.fetchone()
-                if not row:
-                    return {
-                        'statusCode': 404,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Order not found'}),
-                        'isBase64Encoded': False
-                    }
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'id': row[0],
-                        'orderNumber': row[1],
-                        'customerName': row[2],
-                        'customerEmail': row[3],
-                        'deliveryMethod': row[4],
-                        'totalAmount': row[5],
-                        'status': row[6],
-                        'paymentStatus': row[7],
-                        'trackingNumber': row[8],
-                        'createdAt': row[9].isoformat()
-                    })
-                }
-            else:
-                cur.execute('''
-                    SELECT id, order_number, customer_name, total_amount,
-                           status, payment_status, created_at
-                    FROM orders ORDER BY created_at DESC LIMIT 50
-                ''')
-                
-                orders = []
-                for row in cur.fetchall():
-                    orders.append({
-                        'id': row[0],
-                        'orderNumber': row[1],
-                        'customerName': row[2],
-                        'totalAmount': row[3],
-                        'status': row[4],
-                        'paymentStatus': row[5],
-                        'createdAt': row[6].isoformat()
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'orders': orders})
-                }
+    throttled, conn = RATE_LIMITER.check(request.connect, 'orders.create', request.event, customer_email)
+    if throttled:
+        return throttled
+    request.adopt(conn)
+    cur = request.cur
+    
+    order_number = f"VIT-{datetime.now().strftime('%Y%m%d')}-{datetime.now().timestamp():.0f}"
+    
+    cur.execute('''
+        INSERT INTO orders (
+            order_number, customer_name, customer_email, customer_phone,
+            delivery_method, delivery_address, delivery_city, delivery_postal_code,
+            total_amount, items, survey_data, status, payment_status
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id, order_number, created_at
+    ''', (
+        order_number,
+        body_data.get('customerName'),
+        customer_email,
+        normalize_phone(body_data.get('customerPhone')),
+        body_data.get('deliveryMethod'),
+        body_data.get('deliveryAddress'),
+        body_data.get('deliveryCity'),
+        body_data.get('deliveryPostalCode'),
+        body_data.get('totalAmount'),
+        json.dumps(body_data.get('items', [])),
+        json.dumps(body_data.get('surveyData')),
+        'pending',
+        'pending'
+    ))
+    
+    order_id, order_num, created = cur.fetchone()
+    
+    enqueue_emails(cur, [(
+        order_id,
+        customer_email,
+        f'Заказ {order_num} оформлен',
+        'order_created',
+        json.dumps({
+            'orderNumber': order_num,
+            'customerName': body_data.get('customerName'),
+            'totalAmount': body_data.get('totalAmount'),
+            'items': body_data.get('items', [])
+        })
+    )])
+    conn.commit()
+    
+    return json_response({
+        'success': True,
+        'orderId': order_id,
+        'orderNumber': order_num,
+        'createdAt': created
+    })
+
+@router.route('GET', read_only=True)
+def get_orders(request: Request) -> Dict[str, Any]:
+    params = request.params
+    cur = request.cur
+    
+    if params.get('customerEmail') or params.get('customerPhone'):
+        return customer_history(cur, params)
+    
+    order_number = params.get('orderNumber')
+    if order_number:
+        cur.execute('''
+            SELECT o.id, o.order_number, o.customer_name, o.customer_email,
+                   o.delivery_method, o.total_amount, o.status, o.payment_status,
+                   o.tracking_number, o.created_at, l.archive_ref, l.created_at
+            FROM order_lookup l
+            LEFT JOIN orders o ON o.id = l.order_id AND o.created_at = l.created_at
+            WHERE l.order_number = %s
+        ''', (order_number,))
         
-        elif method == 'PUT':
-            body_data = json.loads(event.get('body', '{}'))
-            order_id = body_data.get('orderId')
-            
-            cur.execute('''
-                UPDATE orders 
-                SET status = %s, tracking_number = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-                RETURNING order_number
-            ''', (
-                body_data.get('status'),
-                body_data.get('trackingNumber'),
-                order_id
-            ))
-            
-            result = cur.fetchone()
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'success': True, 'orderNumber': result[0]})
-            }
+        row = cur.fetchone()
+        if row and row[0] is None and row[10]:
+            # Секция заказа отсоединена orders_partitions.py archive
+            return error_response(410, 'Order archived', orderNumber=order_number, createdAt=row[11])
+        if not row or row[0] is None:
+            return error_response(404, 'Order not found')
         
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    finally:
-        cur.close()
-        conn.close()
+        return json_response({
+            'id': row[0],
+            'orderNumber': row[1],
+            'customerName': row[2],
+            'customerEmail': row[3],
+            'deliveryMethod': row[4],
+            'totalAmount': row[5],
+            'status': row[6],
+            'paymentStatus': row[7],
+            'trackingNumber': row[8],
+            'createdAt': row[9]
+        })
+    
+    cur.execute('''
+        SELECT id, order_number, customer_name, total_amount,
+               status, payment_status, created_at
+        FROM orders ORDER BY created_at DESC LIMIT 50
+    ''')
+    
+    orders = []
+    for row in cur.fetchall():
+        orders.append({
+            'id': row[0],
+            'orderNumber': row[1],
+            'customerName': row[2],
+            'totalAmount': row[3],
+            'status': row[4],
+            'paymentStatus': row[5],
+            'createdAt': row[6]
+        })
+    
+    return json_response({'orders': orders})
+
+def customer_history(cur, params: Dict[str, str]) -> Dict[str, Any]:
+    """История заказов покупателя по email или телефону с keyset-пагинацией"""
+    if params.get('customerEmail'):
+        condition, value = 'customer_email = %s', normalize_email(params['customerEmail'])
+    else:
+        condition, value = 'customer_phone = %s', normalize_phone(params['customerPhone'])
+    
+    try:
+        limit = min(max(int(params.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        cursor_args = []
+        if params.get('cursor'):
+            cursor_created, cursor_id = params['cursor'].rsplit('_', 1)
+            cursor_args = [datetime.fromisoformat(cursor_created), int(cursor_id)]
+            condition += ' AND (created_at, id) < (%s, %s)'
+    except ValueError:
+        return error_response(400, 'Некорректные limit или cursor')
+    
+    cur.execute(f'''
+        SELECT id, order_number, customer_name, total_amount,
+               status, payment_status, tracking_number, created_at
+        FROM orders
+        WHERE {condition}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    ''', [value] + cursor_args + [limit + 1])
+    
+    rows = cur.fetchall()
+    orders = []
+    for row in rows[:limit]:
+        orders.append({
+            'id': row[0],
+            'orderNumber': row[1],
+            'customerName': row[2],
+            'totalAmount': row[3],
+            'status': row[4],
+            'paymentStatus': row[5],
+            'trackingNumber': row[6],
+            'createdAt': row[7]
+        })
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f'{last[7].isoformat()}_{last[0]}'
+    
+    return json_response({'orders': orders, 'nextCursor': next_cursor})
+
+@router.route('PUT', action='bulk')
+def bulk_update(request: Request) -> Dict[str, Any]:
+    try:
+        rows = parse_bulk_rows(request.event)
+    except (ValueError, csv.Error) as e:
+        return error_response(400, f'Некорректный манифест: {e}')
+    
+    results = apply_bulk_updates(request.cur, rows)
+    request.conn.commit()
+    
+    summary = {}
+    for item in results:
+        summary[item['result']] = summary.get(item['result'], 0) + 1
+    
+    return json_response({
+        'success': True,
+        'total': len(rows),
+        'updated': summary.get('updated', 0),
+        'notFound': summary.get('not_found', 0),
+        'invalid': summary.get('invalid', 0),
+        'superseded': summary.get('superseded', 0),
+        'results': results
+    })
+
+@router.route('PUT')
+def update_order(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    order_id = body_data.get('orderId')
+    cur = request.cur
+    
+    cur.execute('''
+        UPDATE orders AS o
+        SET status = %s, tracking_number = %s, updated_at = CURRENT_TIMESTAMP
+        FROM order_lookup AS l
+        JOIN orders AS prev ON prev.id = l.order_id AND prev.created_at = l.created_at
+        WHERE l.order_id = %s AND o.id = prev.id AND o.created_at = prev.created_at
+        RETURNING o.order_number, o.customer_email, prev.status, o.status, o.tracking_number
+    ''', (
+        body_data.get('status'),
+        body_data.get('trackingNumber'),
+        order_id
+    ))
+    
+    result = cur.fetchone()
+    if not result:
+        return error_response(404, 'Order not found')
+    if result[3] and result[3] != result[2]:
+        enqueue_emails(cur, [status_email_row(order_id, result[1], result[0], result[3], result[4])])
+    request.conn.commit()
+    
+    return json_response({'success': True, 'orderNumber': result[0]})
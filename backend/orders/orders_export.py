@@ -0,0 +1,124 @@
+"""
+Потоковая выгрузка заказов для бухгалтерии в NDJSON или CSV.
+Строки читаются серверным (именованным) курсором пачками по EXPORT_BATCH_SIZE,
+поэтому расход памяти не зависит от количества заказов.
+
+    python orders_export.py --format csv --from 2025-01-01 --to 2025-12-31 \
+        --status delivered --output orders.csv
+"""
+
+import csv
+import os
+import sys
+import psycopg2
+from datetime import date, timedelta
+from typing import Any, IO, List, Optional, Tuple
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+EXPORT_BATCH_SIZE = 10000
+
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('orderNumber', 'order_number'),
+    ('customerName', 'customer_name'),
+    ('customerEmail', 'customer_email'),
+    ('customerPhone', 'customer_phone'),
+    ('deliveryMethod', 'delivery_method'),
+    ('deliveryAddress', 'delivery_address'),
+    ('deliveryCity', 'delivery_city'),
+    ('deliveryPostalCode', 'delivery_postal_code'),
+    ('totalAmount', 'total_amount'),
+    ('status', 'status'),
+    ('paymentStatus', 'payment_status'),
+    ('trackingNumber', 'tracking_number'),
+    ('items', 'items'),
+    ('createdAt', 'created_at'),
+    ('updatedAt', 'updated_at'),
+]
+
+def build_query(fmt: str, date_from: Optional[date], date_to: Optional[date],
+                status: Optional[str]) -> Tuple[str, List[Any]]:
+    """Строит запрос выгрузки; для NDJSON строку JSON собирает сам Postgres"""
+    if fmt == 'ndjson':
+        pairs = ', '.join(f"'{key}', {column}" for key, column in EXPORT_COLUMNS)
+        select = f'json_build_object({pairs})::text'
+    else:
+        select = ', '.join(
+            'items::text' if column == 'items' else column for _, column in EXPORT_COLUMNS
+        )
+
+    conditions = []
+    args: List[Any] = []
+    if date_from:
+        conditions.append('created_at >= %s')
+        args.append(date_from)
+    if date_to:
+        conditions.append('created_at < %s')
+        args.append(date_to + timedelta(days=1))
+    if status:
+        conditions.append('status = %s')
+        args.append(status)
+
+    query = f'SELECT {select} FROM orders'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    return query + ' ORDER BY created_at, id', args
+
+def export_orders(conn, out: IO[str], fmt: str = 'ndjson', date_from: Optional[date] = None,
+                  date_to: Optional[date] = None, status: Optional[str] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Пишет заказы в out пачками; возвращает количество выгруженных строк"""
+    query, args = build_query(fmt, date_from, date_to, status)
+    cur = conn.cursor(name='orders_export')
+    cur.itersize = batch_size
+    cur.execute(query, args)
+
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow([column for _, column in EXPORT_COLUMNS])
+
+    total = 0
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                out.write('\n'.join(row[0] for row in rows))
+                out.write('\n')
+            total += len(rows)
+    finally:
+        cur.close()
+        conn.rollback()
+
+    return total
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+def main(argv: List[str]) -> None:
+    import argparse  # функция импортирует модуль ради export_orders, argparse ей не нужен
+    parser = argparse.ArgumentParser(description='Выгрузка заказов')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--from', dest='date_from')
+    parser.add_argument('--to', dest='date_to')
+    parser.add_argument('--status')
+    parser.add_argument('--output', help='файл для записи, по умолчанию stdout')
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        total = export_orders(conn, out, args.format, parse_date(args.date_from),
+                              parse_date(args.date_to), args.status)
+        print(f'Выгружено заказов: {total}', file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
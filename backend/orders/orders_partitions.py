@@ -0,0 +1,110 @@
+"""
+Обслуживание месячных секций таблицы orders.
+
+    python orders_partitions.py ensure [--months 6]
+        создаёт секции на текущий и следующие месяцы (запускать по расписанию);
+        строки, попавшие в orders_default, переносятся в секции своих месяцев (V0026)
+    python orders_partitions.py list
+        показывает секции и количество строк
+    python orders_partitions.py archive --older-than 24 [--export-dir DIR]
+        отсоединяет секции старше N месяцев; с --export-dir выгружает каждую
+        в сжатый CSV (COPY), после чего удаляет отсоединённую таблицу
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import psycopg2
+from datetime import date
+from typing import List, Optional, Tuple
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+def ensure_partitions(conn, months_ahead: int) -> int:
+    cur = conn.cursor()
+    cur.execute('SELECT ensure_orders_partitions(%s)', (months_ahead,))
+    created = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return created
+
+def list_partitions(conn) -> List[Tuple[str, str, int]]:
+    """Возвращает (имя секции, границы, примерное число строк)"""
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'orders'::regclass
+        ORDER BY c.relname
+    ''')
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def month_of(partition_name: str) -> date:
+    year, month = partition_name[len('orders_p'):].split('_')
+    return date(int(year), int(month), 1)
+
+def archive_partitions(conn, older_than_months: int, export_dir: Optional[str] = None) -> List[str]:
+    """Отсоединяет (и при необходимости выгружает) секции старше older_than_months"""
+    today = date.today()
+    cutoff_index = today.year * 12 + today.month - 1 - older_than_months
+    cutoff = date(cutoff_index // 12, cutoff_index % 12 + 1, 1)
+
+    archived = []
+    for name, _, _ in list_partitions(conn):
+        if not name.startswith('orders_p') or month_of(name) >= cutoff:
+            continue
+
+        cur = conn.cursor()
+        cur.execute(f'ALTER TABLE orders DETACH PARTITION "{name}"')
+        archive_ref = name
+
+        if export_dir:
+            os.makedirs(export_dir, exist_ok=True)
+            archive_ref = os.path.join(export_dir, f'{name}.csv.gz')
+            with gzip.open(archive_ref, 'wb') as out:
+                cur.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER true)', out)
+
+        cur.execute('''
+            UPDATE order_lookup SET archive_ref = %s
+            WHERE created_at >= %s AND created_at < %s::date + INTERVAL '1 month'
+        ''', (archive_ref, month_of(name), month_of(name)))
+
+        if export_dir:
+            cur.execute(f'DROP TABLE "{name}"')
+
+        conn.commit()
+        cur.close()
+        archived.append(archive_ref)
+
+    return archived
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Секции таблицы orders')
+    sub = parser.add_subparsers(dest='command', required=True)
+    ensure = sub.add_parser('ensure')
+    ensure.add_argument('--months', type=int, default=6)
+    sub.add_parser('list')
+    archive = sub.add_parser('archive')
+    archive.add_argument('--older-than', type=int, required=True, help='возраст секции в месяцах')
+    archive.add_argument('--export-dir')
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.command == 'ensure':
+            print(f'Секций проверено: {ensure_partitions(conn, args.months)}')
+        elif args.command == 'list':
+            for name, bounds, rows in list_partitions(conn):
+                print(f'{name}\t{bounds}\t~{rows}')
+        else:
+            for ref in archive_partitions(conn, args.older_than, args.export_dir):
+                print(f'Архивировано: {ref}')
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,7 +1,139 @@
+import hashlib
 import json
-import os
-import psycopg2
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+from page_hydration import hydrate_page
+from page_patch import build_patch_update
+from ref_cache import REF_CACHE
+import page_revisions
+from api_router import (
+    COMPRESSION_CACHE, JSON_HEADERS, METRICS, REPLICA, Request, Router, dumps, error_response, header, json_response,
+    raw_response
+)
+
+PAGE_CACHE_SIZE = 64
+PAGE_CACHE: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+
+router = Router('GET, POST, PUT, PATCH, DELETE, OPTIONS', defaults={'resource': 'pages'})
+METRICS.collect('refCache', REF_CACHE.metrics)
+METRICS.collect('pageCache', lambda: {'entries': len(PAGE_CACHE), 'capacity': PAGE_CACHE_SIZE})
+
+def page_to_dict(row) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'slug': row[1],
+        'title': row[2],
+        'metaDescription': row[3],
+        'isPublished': row[4],
+        'blocks': row[5],
+        'styles': row[6],
+        'updatedAt': row[7].isoformat(),
+        'version': row[8]
+    }
+
+def render_page(row) -> Tuple[str, str]:
+    """Готовый документ опубликованной страницы и его хеш"""
+    document = json.dumps({'page': page_to_dict(row)})
+    return document, hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+def freeze_page(cur, row) -> Tuple[Optional[str], Optional[str]]:
+    """Сохраняет готовый документ опубликованной страницы с хешем; черновики не замораживаются"""
+    document, content_hash = render_page(row) if row[4] else (None, None)
+    
+    cur.execute('''
+        UPDATE pages SET render_document = %s, content_hash = %s WHERE id = %s
+    ''', (document, content_hash, row[0]))
+    return document, content_hash
+
+def cache_page(slug: str, content_hash: str, document: str) -> None:
+    PAGE_CACHE[(slug, content_hash)] = document
+    PAGE_CACHE.move_to_end((slug, content_hash))
+    while len(PAGE_CACHE) > PAGE_CACHE_SIZE:
+        PAGE_CACHE.popitem(last=False)
+
+def invalidate_page(slug: Optional[str] = None) -> None:
+    """Удаляет из LRU все версии страницы (или весь кеш, если slug неизвестен)"""
+    for key in [key for key in PAGE_CACHE if slug is None or key[0] == slug]:
+        del PAGE_CACHE[key]
+
+def published_document(cur, slug: str, content_hash: str, products_stamp: Optional[datetime],
+                       document: Optional[str] = None) -> Tuple[str, str]:
+    """Документ опубликованной страницы из LRU; гидрированный вариант кешируется под своей версией"""
+    cache_version = content_hash
+    if products_stamp is not None:
+        cache_version = hashlib.sha256(f'{content_hash}:{products_stamp.isoformat()}'.encode()).hexdigest()
+    
+    cached = PAGE_CACHE.get((slug, cache_version))
+    if cached is not None:
+        PAGE_CACHE.move_to_end((slug, cache_version))
+        return cached, cache_version
+    
+    if document is None:
+        cur.execute('SELECT render_document FROM pages WHERE slug = %s', (slug,))
+        document = cur.fetchone()[0]
+    if products_stamp is not None:
+        document = json.dumps({'page': hydrate_page(cur, json.loads(document)['page'])})
+    cache_page(slug, cache_version, document)
+    return document, cache_version
+
+def load_templates(cur) -> str:
+    cur.execute('''
+        SELECT id, name, category, preview_image, component_data, default_styles
+        FROM block_templates ORDER BY category, name
+    ''')
+    
+    templates = []
+    for row in cur.fetchall():
+        templates.append({
+            'id': row[0],
+            'name': row[1],
+            'category': row[2],
+            'previewImage': row[3],
+            'componentData': row[4],
+            'defaultStyles': row[5]
+        })
+    
+    return dumps({'templates': templates})
+
+def load_survey_questions(cur) -> str:
+    cur.execute('''
+        SELECT id, question_text, question_type, options, is_required, 
+               display_order, is_active, created_at, updated_at
+        FROM survey_questions
+        ORDER BY display_order ASC
+    ''')
+    
+    questions = []
+    for row in cur.fetchall():
+        questions.append({
+            'id': row[0],
+            'questionText': row[1],
+            'questionType': row[2],
+            'options': row[3],
+            'isRequired': row[4],
+            'displayOrder': row[5],
+            'isActive': row[6],
+            'createdAt': row[7],
+            'updatedAt': row[8]
+        })
+    
+    return dumps({'questions': questions})
+
+def page_response(event: Dict[str, Any], document: str, content_hash: str) -> Dict[str, Any]:
+    """Ответ с опубликованной страницей: 304 при совпадении If-None-Match"""
+    etag = f'"{content_hash}"'
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'ETag': etag,
+        'Cache-Control': 'no-cache'
+    }
+    # При сжатии ETag отдаётся слабым (W/"..."), клиент возвращает его в этом виде
+    if header(event, 'if-none-match') in (etag, f'W/{etag}'):
+        return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+    return {'statusCode': 200, 'headers': headers, 'isBase64Encoded': False, 'body': document}
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -9,295 +141,372 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event с httpMethod, body, queryStringParameters
     Returns: HTTP response с данными страниц, блоков или вопросов
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    db_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(db_url)
-    cur = conn.cursor()
+    return router.handle(event, context)
+
+def cached_response(body: str, hit: bool) -> Dict[str, Any]:
+    return raw_response(body, headers={**JSON_HEADERS, 'X-Cache': 'HIT' if hit else 'MISS'})
+
+@router.route('GET', resource='pages', read_only=True)
+def get_pages(request: Request) -> Dict[str, Any]:
+    params = request.params
+    slug = params.get('slug')
+    cur = request.cur
     
-    try:
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            resource = params.get('resource', 'pages')
-            slug = params.get('slug')
-            
-            if resource == 'pages':
-                if slug:
-                    cur.execute('''
-                        SELECT id, slug, title, meta_description, is_published, 
-                               blocks, styles, updated_at
-                        FROM pages WHERE slug = %s
-                    ''', (slug,))
-                    row = cur.fetchone()
-                    
-                    if not row:
-                        return {
-                            'statusCode': 404,
-                            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                            'body': json.dumps({'error': 'Page not found'}),
-                            'isBase64Encoded': False
-                        }
-                    
-                    page = {
-                        'id': row[0],
-                        'slug': row[1],
-                        'title': row[2],
-                        'metaDescription': row[3],
-                        'isPublished': row[4],
-                        'blocks': row[5],
-                        'styles': row[6],
-                        'updatedAt': row[7].isoformat()
-                    }
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'page': page})
-                    }
-                else:
-                    cur.execute('''
-                        SELECT id, slug, title, is_published, updated_at
-                        FROM pages ORDER BY updated_at DESC
-                    ''')
-                    
-                    pages = []
-                    for row in cur.fetchall():
-                        pages.append({
-                            'id': row[0],
-                            'slug': row[1],
-                            'title': row[2],
-                            'isPublished': row[3],
-                            'updatedAt': row[4].isoformat()
-                        })
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'pages': pages})
-                    }
-            
-            elif resource == 'templates':
-                cur.execute('''
-                    SELECT id, name, category, preview_image, component_data, default_styles
-                    FROM block_templates ORDER BY category, name
-                ''')
-                
-                templates = []
-                for row in cur.fetchall():
-                    templates.append({
-                        'id': row[0],
-                        'name': row[1],
-                        'category': row[2],
-                        'previewImage': row[3],
-                        'componentData': row[4],
-                        'defaultStyles': row[5]
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'templates': templates})
-                }
-            
-            elif resource == 'survey':
-                cur.execute('''
-                    SELECT id, question_text, question_type, options, is_required, 
-                           display_order, is_active, created_at, updated_at
-                    FROM survey_questions
-                    ORDER BY display_order ASC
-                ''')
-                
-                questions = []
-                for row in cur.fetchall():
-                    questions.append({
-                        'id': row[0],
-                        'questionText': row[1],
-                        'questionType': row[2],
-                        'options': row[3],
-                        'isRequired': row[4],
-                        'displayOrder': row[5],
-                        'isActive': row[6],
-                        'createdAt': row[7].isoformat() if row[7] else None,
-                        'updatedAt': row[8].isoformat() if row[8] else None
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'questions': questions})
-                }
+    if slug:
+        hydrate = params.get('hydrate') == 'true'
+        cur.execute('''
+            SELECT is_published, content_hash,
+                   CASE WHEN %s THEN (SELECT MAX(updated_at) FROM products) END
+            FROM pages WHERE slug = %s
+        ''', (hydrate, slug))
+        version = cur.fetchone()
+        products_stamp = (version[2] or datetime.min) if hydrate and version else None
         
-        elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            params = event.get('queryStringParameters') or {}
-            resource = params.get('resource', 'pages')
-            
-            if resource == 'survey':
-                question_text = body_data.get('questionText', '')
-                question_type = body_data.get('questionType', 'text')
-                options = body_data.get('options')
-                is_required = body_data.get('isRequired', True)
-                display_order = body_data.get('displayOrder', 0)
-                is_active = body_data.get('isActive', True)
-                
-                if display_order == 0:
-                    cur.execute('SELECT COALESCE(MAX(display_order), 0) + 1 FROM survey_questions')
-                    display_order = cur.fetchone()[0]
-                
-                cur.execute('''
-                    INSERT INTO survey_questions 
-                    (question_text, question_type, options, is_required, display_order, is_active)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (question_text, question_type, json.dumps(options) if options else None, 
-                      is_required, display_order, is_active))
-                
-                new_id = cur.fetchone()[0]
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'success': True, 'id': new_id})
-                }
-            else:
-                cur.execute('''
-                    INSERT INTO pages (slug, title, meta_description, is_published, blocks, styles)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    body_data.get('slug'),
-                    body_data.get('title'),
-                    body_data.get('metaDescription'),
-                    body_data.get('isPublished', False),
-                    json.dumps(body_data.get('blocks', [])),
-                    json.dumps(body_data.get('styles', {}))
-                ))
-                
-                page_id = cur.fetchone()[0]
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'success': True, 'pageId': page_id})
-                }
+        if version and version[0] and version[1]:
+            document, cache_version = published_document(cur, slug, version[1], products_stamp)
+            return page_response(request.event, document, cache_version)
         
-        elif method == 'PUT':
-            body_data = json.loads(event.get('body', '{}'))
-            params = event.get('queryStringParameters') or {}
-            resource = params.get('resource', 'pages')
-            
-            if resource == 'survey':
-                question_id = body_data.get('id')
-                
-                if not question_id:
-                    return {
-                        'statusCode': 400,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'success': False, 'error': 'ID не указан'})
-                    }
-                
-                question_text = body_data.get('questionText')
-                question_type = body_data.get('questionType')
-                options = body_data.get('options')
-                is_required = body_data.get('isRequired')
-                display_order = body_data.get('displayOrder')
-                is_active = body_data.get('isActive')
-                
-                cur.execute('''
-                    UPDATE survey_questions
-                    SET question_text = COALESCE(%s, question_text),
-                        question_type = COALESCE(%s, question_type),
-                        options = COALESCE(%s, options),
-                        is_required = COALESCE(%s, is_required),
-                        display_order = COALESCE(%s, display_order),
-                        is_active = COALESCE(%s, is_active),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                ''', (question_text, question_type, json.dumps(options) if options else None, 
-                      is_required, display_order, is_active, question_id))
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'success': True})
-                }
-            else:
-                page_id = body_data.get('id')
-                
-                cur.execute('''
-                    UPDATE pages 
-                    SET title = %s, meta_description = %s, is_published = %s, 
-                        blocks = %s, styles = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                ''', (
-                    body_data.get('title'),
-                    body_data.get('metaDescription'),
-                    body_data.get('isPublished'),
-                    json.dumps(body_data.get('blocks', [])),
-                    json.dumps(body_data.get('styles', {})),
-                    page_id
-                ))
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'success': True})
-                }
+        cur.execute('''
+            SELECT id, slug, title, meta_description, is_published, 
+                   blocks, styles, updated_at, version
+            FROM pages WHERE slug = %s
+        ''', (slug,))
+        row = cur.fetchone()
         
-        elif method == 'DELETE':
-            params = event.get('queryStringParameters') or {}
-            resource = params.get('resource', 'pages')
-            item_id = params.get('id')
-            
-            if resource == 'survey':
-                cur.execute('DELETE FROM survey_questions WHERE id = %s', (item_id,))
+        if not row:
+            return error_response(404, 'Page not found')
+        
+        if row[4]:
+            if request.on_replica:
+                # Реплика только читает: документ собирается в памяти, заморозит его запись на основной базе
+                document, content_hash = render_page(row)
             else:
-                cur.execute('DELETE FROM pages WHERE id = %s', (item_id,))
-            
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'success': True})
-            }
+                document, content_hash = freeze_page(cur, row)
+                request.conn.commit()
+            document, cache_version = published_document(cur, slug, content_hash, products_stamp, document)
+            return page_response(request.event, document, cache_version)
+        
+        page = page_to_dict(row)
+        return json_response({'page': hydrate_page(cur, page) if hydrate else page})
+    
+    cur.execute('''
+        SELECT id, slug, title, is_published, updated_at
+        FROM pages ORDER BY updated_at DESC
+    ''')
+    
+    pages = []
+    for row in cur.fetchall():
+        pages.append({
+            'id': row[0],
+            'slug': row[1],
+            'title': row[2],
+            'isPublished': row[3],
+            'updatedAt': row[4]
+        })
+    
+    return json_response({'pages': pages})
+
+@router.route('GET', resource='revisions', read_only=True)
+def get_revisions(request: Request) -> Dict[str, Any]:
+    params = request.params
+    page_id = params.get('pageId')
+    revision = params.get('revision')
+    cur = request.cur
+    
+    if not revision:
+        return json_response({'revisions': page_revisions.list_revisions(cur, page_id)})
+    
+    try:
+        revision = int(revision)
+        diff = int(params['diff']) if params.get('diff') else None
+    except ValueError:
+        return error_response(400, 'Некорректные revision или diff')
+    
+    state = page_revisions.reconstruct(cur, page_id, revision)
+    base = page_revisions.reconstruct(cur, page_id, diff) if diff is not None else None
+    
+    if state is None or (diff is not None and base is None):
+        return error_response(404, 'Revision not found')
+    
+    result = {'diff': page_revisions.diff_states(base, state)} if base else {'revision': state}
+    return json_response(result)
+
+@router.route('GET', resource='templates', read_only=True)
+def get_templates(request: Request) -> Dict[str, Any]:
+    body, hit = REF_CACHE.get(lambda: request.cur, 'block_templates', 'all', load_templates)
+    return cached_response(body, hit)
+
+@router.route('GET', resource='survey', read_only=True)
+def get_survey_questions(request: Request) -> Dict[str, Any]:
+    body, hit = REF_CACHE.get(lambda: request.cur, 'survey_questions', 'all', load_survey_questions)
+    return cached_response(body, hit)
+
+@router.route('GET', resource='cache', read_only=True)
+def get_cache_stats(request: Request) -> Dict[str, Any]:
+    return json_response({
+        'refCache': REF_CACHE.metrics(),
+        'pageCacheEntries': len(PAGE_CACHE),
+        'compression': COMPRESSION_CACHE.metrics(),
+        'replica': REPLICA.metrics()
+    })
+
+@router.route('POST', resource='survey')
+def create_survey_question(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    question_text = body_data.get('questionText', '')
+    question_type = body_data.get('questionType', 'text')
+    options = body_data.get('options')
+    is_required = body_data.get('isRequired', True)
+    # Явный null равнозначен отсутствию поля: номер назначает сервер
+    display_order = body_data.get('displayOrder') or 0
+    is_active = body_data.get('isActive', True)
+    cur = request.cur
+    
+    # Сериализуем вставки, чтобы MAX(display_order) + 1 не выдавал одинаковые номера
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('survey_questions.display_order'))")
+    cur.execute('''
+        INSERT INTO survey_questions 
+        (question_text, question_type, options, is_required, display_order, is_active)
+        SELECT %s, %s, %s, %s,
+               CASE WHEN %s = 0 THEN COALESCE(MAX(display_order), 0) + 1 ELSE %s END,
+               %s
+        FROM survey_questions
+        RETURNING id
+    ''', (question_text, question_type, json.dumps(options) if options else None, 
+          is_required, display_order, display_order, is_active))
+    
+    new_id = cur.fetchone()[0]
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions')
+    
+    return json_response({'success': True, 'id': new_id})
+
+@router.route('POST', resource='revisions')
+def restore_revision(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    cur = request.cur
+    
+    if request.params.get('action') == 'compact':
+        try:
+            daily_after = int(body_data.get('dailyAfterDays', 30))
+            drop_after = int(body_data.get('dropAfterDays', 365))
+        except (TypeError, ValueError):
+            return error_response(400, 'Некорректные dailyAfterDays или dropAfterDays')
+        now = datetime.now()
+        stats = page_revisions.compact(
+            request.conn,
+            now - timedelta(days=daily_after),
+            now - timedelta(days=drop_after)
+        )
+        return json_response({'success': True, **stats})
+    
+    try:
+        revision = int(body_data.get('revision', 0))
+    except (TypeError, ValueError):
+        return error_response(400, 'Некорректный revision')
+    
+    page_id = body_data.get('pageId')
+    state = page_revisions.reconstruct(cur, page_id, revision)
+    if state is None:
+        return error_response(404, 'Revision not found')
+    
+    cur.execute('''
+        UPDATE pages
+        SET title = %s, meta_description = %s, blocks = %s, styles = %s,
+            updated_at = CURRENT_TIMESTAMP, version = version + 1
+        WHERE id = %s
+        RETURNING id, slug, title, meta_description, is_published, blocks, styles, updated_at, version
+    ''', (
+        state['title'],
+        state['metaDescription'],
+        json.dumps(state['blocks']),
+        json.dumps(state['styles']),
+        page_id
+    ))
+    row = cur.fetchone()
+    freeze_page(cur, row)
+    request.conn.commit()
+    invalidate_page(row[1])
+    
+    return json_response({'success': True, 'restoredRevision': state['revision'], 'version': row[8]})
+
+@router.route('POST')
+def create_page(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    cur = request.cur
+    
+    cur.execute('''
+        INSERT INTO pages (slug, title, meta_description, is_published, blocks, styles)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id, slug, title, meta_description, is_published, blocks, styles, updated_at, version
+    ''', (
+        body_data.get('slug'),
+        body_data.get('title'),
+        body_data.get('metaDescription'),
+        body_data.get('isPublished', False),
+        json.dumps(body_data.get('blocks', [])),
+        json.dumps(body_data.get('styles', {}))
+    ))
+    
+    row = cur.fetchone()
+    page_id = row[0]
+    freeze_page(cur, row)
+    request.conn.commit()
+    invalidate_page(row[1])
+    
+    return json_response({'success': True, 'pageId': page_id})
+
+@router.route('PUT', resource='survey')
+def update_survey_question(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    cur = request.cur
+    
+    if request.params.get('action') == 'reorder':
+        ids = body_data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return json_response({'success': False, 'error': 'Передайте упорядоченный список ids'}, 400)
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return json_response({'success': False, 'error': 'ids должны быть числами'}, 400)
         
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        cur.execute('''
+            UPDATE survey_questions AS q
+            SET display_order = o.position, updated_at = CURRENT_TIMESTAMP
+            FROM unnest(%s::int[]) WITH ORDINALITY AS o(id, position)
+            WHERE q.id = o.id AND q.display_order IS DISTINCT FROM o.position
+        ''', (ids,))
+        updated = cur.rowcount
+        request.conn.commit()
+        REF_CACHE.invalidate('survey_questions')
+        
+        return json_response({'success': True, 'updated': updated})
+    
+    question_id = body_data.get('id')
+    
+    if not question_id:
+        return json_response({'success': False, 'error': 'ID не указан'}, 400)
+    
+    question_text = body_data.get('questionText')
+    question_type = body_data.get('questionType')
+    options = body_data.get('options')
+    is_required = body_data.get('isRequired')
+    display_order = body_data.get('displayOrder')
+    is_active = body_data.get('isActive')
+    
+    cur.execute('''
+        UPDATE survey_questions
+        SET question_text = COALESCE(%s, question_text),
+            question_type = COALESCE(%s, question_type),
+            options = COALESCE(%s, options),
+            is_required = COALESCE(%s, is_required),
+            display_order = COALESCE(%s, display_order),
+            is_active = COALESCE(%s, is_active),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    ''', (question_text, question_type, json.dumps(options) if options else None, 
+          is_required, display_order, is_active, question_id))
+    
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions')
+    
+    return json_response({'success': True})
+
+@router.route('PUT')
+def update_page(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    page_id = body_data.get('id')
+    cur = request.cur
+    
+    cur.execute('''
+        UPDATE pages 
+        SET title = %s, meta_description = %s, is_published = %s, 
+            blocks = %s, styles = %s, updated_at = CURRENT_TIMESTAMP,
+            version = version + 1
+        WHERE id = %s
+        RETURNING id, slug, title, meta_description, is_published, blocks, styles, updated_at, version
+    ''', (
+        body_data.get('title'),
+        body_data.get('metaDescription'),
+        body_data.get('isPublished'),
+        json.dumps(body_data.get('blocks', [])),
+        json.dumps(body_data.get('styles', {})),
+        page_id
+    ))
+    
+    row = cur.fetchone()
+    if row:
+        freeze_page(cur, row)
+    request.conn.commit()
+    if row:
+        invalidate_page(row[1])
+    
+    return json_response({'success': True, 'version': row[8] if row else None})
+
+@router.route('PATCH')
+def patch_page(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    page_id = body_data.get('id')
+    expected_version = body_data.get('version')
+    cur = request.cur
+    
+    cur.execute('''
+        SELECT version, ARRAY(SELECT b->>'id' FROM jsonb_array_elements(blocks) b)
+        FROM pages WHERE id = %s
+    ''', (page_id,))
+    current = cur.fetchone()
+    
+    if not current:
+        return error_response(404, 'Page not found')
+    
+    if current[0] != expected_version:
+        return error_response(409, 'Страница изменена другим редактором', version=current[0])
+    
+    try:
+        assignments, params, conditions, condition_params = build_patch_update(
+            body_data.get('operations'), current[1]
+        )
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    cur.execute(f'''
+        UPDATE pages
+        SET {assignments + ', ' if assignments else ''}render_document = NULL, content_hash = NULL,
+            version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND version = %s{conditions}
+        RETURNING id, slug, title, meta_description, is_published,
+                  CASE WHEN is_published THEN blocks END,
+                  CASE WHEN is_published THEN styles END,
+                  updated_at, version
+    ''', params + [page_id, expected_version] + condition_params)
+    row = cur.fetchone()
+    
+    if not row:
+        request.conn.rollback()
+        return error_response(409, 'Патч не применён: изменилась версия или не прошла операция test')
+    
+    if row[4]:
+        freeze_page(cur, row)
+    request.conn.commit()
+    invalidate_page(row[1])
+    
+    return json_response({'success': True, 'version': row[8], 'updatedAt': row[7]})
+
+@router.route('DELETE')
+def delete_item(request: Request) -> Dict[str, Any]:
+    resource = request.params.get('resource', 'pages')
+    item_id = request.params.get('id')
+    cur = request.cur
+    
+    if resource == 'survey':
+        cur.execute('DELETE FROM survey_questions WHERE id = %s', (item_id,))
+        REF_CACHE.invalidate('survey_questions')
+    else:
+        cur.execute('DELETE FROM pages WHERE id = %s RETURNING slug', (item_id,))
+        deleted = cur.fetchone()
+        if deleted:
+            invalidate_page(deleted[0])
+    
+    request.conn.commit()
+    
+    return json_response({'success': True})
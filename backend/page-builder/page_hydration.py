@@ -0,0 +1,89 @@
+"""
+Серверная гидрация блоков типа products: карточки товаров для всех таких блоков
+страницы выбираются одним запросом и встраиваются в блок как поле products.
+
+Настройки блока (в content или в самом блоке): productIds, category, popularOnly,
+limit (по умолчанию itemsPerRow * 2).
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+MAX_PRODUCTS_PER_BLOCK = 24
+PG_INT_MAX = 2147483647
+
+def as_int(value: Any) -> Optional[int]:
+    """Целое из настроек редактора (число или строка с числом) или None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        number = int(value)
+    except (ValueError, OverflowError):
+        return None
+    return number if -PG_INT_MAX <= number <= PG_INT_MAX else None
+
+def product_block_specs(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    specs = []
+    for index, block in enumerate(blocks):
+        if not isinstance(block, dict) or block.get('type') != 'products':
+            continue
+        content = block.get('content') if isinstance(block.get('content'), dict) else block
+        ids = content.get('productIds')
+        if isinstance(ids, list) and ids:
+            # Некорректные id из редактора пропускаются, а не ломают рендер страницы
+            ids = [i for i in map(as_int, ids) if i is not None]
+        else:
+            ids = None
+        per_row = as_int(content.get('itemsPerRow')) or 3
+        limit = as_int(content.get('limit')) or per_row * 2
+        specs.append({
+            'block_index': index,
+            'ids': ids,
+            'category': content.get('category') or None,
+            'popular': bool(content.get('popularOnly')),
+            'lim': min(max(limit, 1), MAX_PRODUCTS_PER_BLOCK),
+        })
+    return specs
+
+def hydrate_page(cur, page: Dict[str, Any]) -> Dict[str, Any]:
+    """Возвращает копию страницы, где у блоков products заполнено поле products"""
+    blocks = page.get('blocks') or []
+    specs = product_block_specs(blocks)
+    if not specs:
+        return page
+
+    cur.execute('''
+        SELECT s.block_index, p.id, p.name, p.category, p.price, p.dosage, p.emoji,
+               p.rating, p.popular, p.main_image
+        FROM jsonb_to_recordset(%s::jsonb)
+             AS s(block_index int, ids int[], category text, popular boolean, lim int)
+        CROSS JOIN LATERAL (
+            SELECT id, name, category, price, dosage, emoji, rating, popular, main_image
+            FROM products
+            WHERE in_stock = true
+              AND (s.ids IS NULL OR id = ANY(s.ids))
+              AND (s.category IS NULL OR category = s.category)
+              AND (NOT s.popular OR popular = true)
+            ORDER BY array_position(s.ids, id), popular DESC, rating DESC
+            LIMIT s.lim
+        ) p
+    ''', (json.dumps(specs),))
+
+    cards: Dict[int, List[Dict[str, Any]]] = {spec['block_index']: [] for spec in specs}
+    for row in cur.fetchall():
+        cards[row[0]].append({
+            'id': row[1],
+            'name': row[2],
+            'category': row[3],
+            'price': row[4],
+            'dosage': row[5],
+            'emoji': row[6],
+            'rating': float(row[7]) if row[7] else 0,
+            'popular': row[8],
+            'mainImage': row[9]
+        })
+
+    hydrated = list(blocks)
+    for index, products in cards.items():
+        hydrated[index] = {**blocks[index], 'products': products}
+    return {**page, 'blocks': hydrated}
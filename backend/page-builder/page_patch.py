@@ -0,0 +1,176 @@
+"""
+Частичное обновление страницы операциями JSON Patch (RFC 6902).
+Блоки адресуются по id: /blocks/{blockId}/content/title, /blocks/- для добавления в конец.
+Операции превращаются в цепочку jsonb_set / jsonb_insert / #- над колонками
+blocks и styles, поэтому запрос и передаваемые данные растут с правкой, а не со страницей.
+Поддерживаются add, remove, replace, move (только целые блоки) и test; copy не поддерживается.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+SCALAR_FIELDS = {
+    'title': 'title',
+    'metaDescription': 'meta_description',
+    'isPublished': 'is_published',
+}
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Разбирает JSON Pointer (RFC 6901) на сегменты"""
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise ValueError(f'Некорректный путь: {pointer!r}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+def is_array_position(segment: str) -> bool:
+    return segment == '-' or segment.isdigit()
+
+class PatchBuilder:
+    """Накапливает SQL-выражения для колонок страницы по мере применения операций"""
+
+    def __init__(self, block_ids: List[str]):
+        self.block_ids = list(block_ids)
+        self.exprs: Dict[str, Tuple[str, List[Any]]] = {
+            'blocks': ('blocks', []),
+            'styles': ('styles', []),
+        }
+        self.scalars: Dict[str, Any] = {}
+        self.conditions: List[Tuple[str, List[Any]]] = []
+        self.permutation: List[int] = []
+
+    def wrap(self, column: str, template: str, *args: Any) -> None:
+        """Оборачивает текущее выражение колонки: template содержит {expr} и плейсхолдеры"""
+        if column == 'blocks':
+            self.flush_permutation()
+        expr, params = self.exprs[column]
+        before, _, after = template.partition('{expr}')
+        leading = before.count('%s')
+        params = list(args[:leading]) + params + list(args[leading:])
+        self.exprs[column] = (before + expr + after, params)
+
+    def flush_permutation(self) -> None:
+        """Применяет накопленные перемещения блоков одной перестановкой массива"""
+        if not self.permutation:
+            return
+        order, self.permutation = self.permutation, []
+        expr, params = self.exprs['blocks']
+        self.exprs['blocks'] = (
+            '(SELECT COALESCE(jsonb_agg(t.e ORDER BY array_position(%s::int[], t.i::int)), \'[]\'::jsonb) '
+            f'FROM jsonb_array_elements({expr}) WITH ORDINALITY AS t(e, i))',
+            [order] + params
+        )
+
+    def block_index(self, block_id: str) -> int:
+        try:
+            return self.block_ids.index(block_id)
+        except ValueError:
+            raise ValueError(f'Блок не найден: {block_id}')
+
+    def resolve(self, segments: List[str]) -> Tuple[str, List[str]]:
+        """Возвращает колонку и путь внутри неё для jsonb-функций"""
+        root, rest = segments[0], segments[1:]
+        if root == 'styles':
+            return 'styles', rest
+        if root == 'blocks' and rest:
+            if rest[0] == '-':
+                return 'blocks', rest
+            return 'blocks', [str(self.block_index(rest[0]))] + rest[1:]
+        raise ValueError(f'Неизвестный путь: /{"/".join(segments)}')
+
+    def apply(self, op: Dict[str, Any]) -> None:
+        name = op.get('op')
+        segments = parse_pointer(op.get('path'))
+
+        if len(segments) == 1 and segments[0] in SCALAR_FIELDS:
+            if name not in ('add', 'replace'):
+                raise ValueError(f'Операция {name} недоступна для /{segments[0]}')
+            self.scalars[SCALAR_FIELDS[segments[0]]] = op.get('value')
+            return
+
+        if name == 'move':
+            self.move(parse_pointer(op.get('from')), segments)
+            return
+
+        column, path = self.resolve(segments)
+        if path[:1] == ['-'] and name != 'add':
+            raise ValueError('Путь /blocks/- допустим только для add')
+        value = json.dumps(op.get('value'))
+        whole_block = column == 'blocks' and len(path) == 1
+        if whole_block and name in ('add', 'replace') and not isinstance(op.get('value'), dict):
+            raise ValueError('Блок должен быть объектом')
+
+        if name == 'test':
+            self.flush_permutation()
+            expr, params = self.exprs[column]
+            self.conditions.append((f'({expr}) #> %s::text[] = %s::jsonb', params + [path, value]))
+        elif name == 'replace':
+            if not path:
+                raise ValueError('Нельзя заменить styles целиком через PATCH')
+            self.wrap(column, 'jsonb_set({expr}, %s::text[], %s::jsonb, false)', path, value)
+        elif name == 'remove':
+            if whole_block:
+                self.wrap(column, '({expr}) - %s', int(path[0]))
+                del self.block_ids[int(path[0])]
+            else:
+                self.wrap(column, '({expr}) #- %s::text[]', path)
+        elif name == 'add':
+            if whole_block:
+                block_id = (op.get('value') or {}).get('id')
+                if not block_id or block_id in self.block_ids:
+                    raise ValueError('Новый блок должен иметь уникальный id')
+                if path[0] == '-':
+                    self.wrap(column, '({expr}) || jsonb_build_array(%s::jsonb)', value)
+                    self.block_ids.append(block_id)
+                else:
+                    self.wrap(column, 'jsonb_insert({expr}, %s::text[], %s::jsonb)', path, value)
+                    self.block_ids.insert(int(path[0]), block_id)
+            elif path and is_array_position(path[-1]):
+                after = path[-1] == '-'
+                target = path[:-1] + ['-1'] if after else path
+                self.wrap(column, 'jsonb_insert({expr}, %s::text[], %s::jsonb, %s)', target, value, after)
+            else:
+                self.wrap(column, 'jsonb_set({expr}, %s::text[], %s::jsonb, true)', path, value)
+        else:
+            raise ValueError(f'Операция не поддерживается: {name}')
+
+    def move(self, source: List[str], target: List[str]) -> None:
+        """Перемещает целый блок перед блоком target (или в конец для /blocks/-)"""
+        if len(source) != 2 or len(target) != 2 or source[0] != 'blocks' or target[0] != 'blocks':
+            raise ValueError('move поддерживается только для целых блоков')
+        if not self.permutation:
+            self.permutation = list(range(1, len(self.block_ids) + 1))
+
+        moved = self.block_index(source[1])
+        position = self.permutation.pop(moved)
+        block_id = self.block_ids.pop(moved)
+        index = len(self.block_ids) if target[1] == '-' else self.block_index(target[1])
+        self.permutation.insert(index, position)
+        self.block_ids.insert(index, block_id)
+
+    def assignments(self) -> Tuple[List[str], List[Any]]:
+        """SET-часть UPDATE для изменённых колонок"""
+        self.flush_permutation()
+        clauses, params = [], []
+        for column, (expr, expr_params) in self.exprs.items():
+            if expr != column:
+                clauses.append(f'{column} = {expr}')
+                params += expr_params
+        for column, value in self.scalars.items():
+            clauses.append(f'{column} = %s')
+            params.append(value)
+        return clauses, params
+
+def build_patch_update(operations: List[Dict[str, Any]], block_ids: List[str]) -> Tuple[str, List[Any], str, List[Any]]:
+    """Возвращает (SET-выражения, параметры, условия test, параметры условий)"""
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('Ожидается непустой массив операций')
+
+    builder = PatchBuilder(block_ids)
+    for op in operations:
+        if not isinstance(op, dict):
+            raise ValueError('Операция должна быть объектом')
+        builder.apply(op)
+
+    clauses, params = builder.assignments()
+    condition_sql = ''.join(f' AND {sql}' for sql, _ in builder.conditions)
+    condition_params = [p for _, cond_params in builder.conditions for p in cond_params]
+    return ', '.join(clauses), params, condition_sql, condition_params
@@ -0,0 +1,157 @@
+"""
+Работа с историей ревизий страниц (таблица page_revisions, заполняется триггером).
+Ревизия восстанавливается из ближайшего предшествующего снимка и не более чем
+19 дельт (триггер V0017 пишет снимок каждые 20 ревизий). Политика хранения схлопывает старые дельты до одной
+за день и удаляет историю старше предела хранения.
+
+    python page_revisions.py compact [--daily-after-days 30] [--drop-after-days 365]
+"""
+
+import argparse
+import json
+import os
+import sys
+import psycopg2
+from psycopg2.extras import execute_values
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+def block_key(block: Dict[str, Any], index: int) -> str:
+    """Ключ блока как в page_block_key() из V0017"""
+    return block.get('id') if isinstance(block, dict) and block.get('id') is not None else f'#{index}'
+
+def apply_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    blocks = {block_key(b, i): b for i, b in enumerate(state['blocks'])}
+    order = delta['order'] if 'order' in delta else list(blocks)
+    blocks.update(delta.get('set') or {})
+    state = dict(state)
+    state['blocks'] = [blocks[key] for key in order if key in blocks]
+    for field in ('styles', 'title', 'metaDescription'):
+        if field in delta:
+            state[field] = delta[field]
+    return state
+
+def merge_deltas(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    """Склеивает две последовательные дельты в одну"""
+    merged = {**older, **newer}
+    merged['set'] = {**(older.get('set') or {}), **(newer.get('set') or {})}
+    if 'order' in merged:
+        merged['set'] = {key: block for key, block in merged['set'].items() if key in merged['order']}
+    if not merged['set']:
+        del merged['set']
+    return merged
+
+def list_revisions(cur, page_id: int) -> List[Dict[str, Any]]:
+    cur.execute('''
+        SELECT revision, kind, pg_column_size(data), created_at
+        FROM page_revisions WHERE page_id = %s
+        ORDER BY revision DESC
+    ''', (page_id,))
+    return [{
+        'revision': row[0],
+        'kind': row[1],
+        'size': row[2],
+        'createdAt': row[3].isoformat()
+    } for row in cur.fetchall()]
+
+def reconstruct(cur, page_id: int, revision: int) -> Optional[Dict[str, Any]]:
+    """Собирает состояние страницы на ревизии: снимок + последующие дельты"""
+    cur.execute('''
+        SELECT revision, kind, data FROM page_revisions
+        WHERE page_id = %s AND revision <= %s AND revision >= (
+            SELECT MAX(revision) FROM page_revisions
+            WHERE page_id = %s AND kind = 'snapshot' AND revision <= %s
+        )
+        ORDER BY revision
+    ''', (page_id, revision, page_id, revision))
+    rows = cur.fetchall()
+    if not rows or rows[-1][0] != revision:
+        return None
+
+    state = dict(rows[0][2])
+    for _, _, delta in rows[1:]:
+        state = apply_delta(state, delta)
+    state['revision'] = revision
+    return state
+
+def diff_states(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Поблочная разница между двумя состояниями страницы"""
+    old_blocks = {block_key(b, i): b for i, b in enumerate(old['blocks'])}
+    new_blocks = {block_key(b, i): b for i, b in enumerate(new['blocks'])}
+    common_old = [key for key in old_blocks if key in new_blocks]
+    common_new = [key for key in new_blocks if key in old_blocks]
+    return {
+        'added': [key for key in new_blocks if key not in old_blocks],
+        'removed': [key for key in old_blocks if key not in new_blocks],
+        'changed': [key for key in common_new if old_blocks[key] != new_blocks[key]],
+        'reordered': common_old != common_new,
+        'fields': [field for field in ('styles', 'title', 'metaDescription') if old.get(field) != new.get(field)]
+    }
+
+def compact(conn, daily_after: datetime, drop_before: datetime) -> Dict[str, int]:
+    """Схлопывает дельты старше daily_after до одной за день, удаляет историю до последнего снимка старше drop_before"""
+    cur = conn.cursor()
+    cur.execute('SELECT DISTINCT page_id FROM page_revisions WHERE created_at < %s', (daily_after,))
+    page_ids = [row[0] for row in cur.fetchall()]
+    stats = {'pages': len(page_ids), 'merged': 0, 'dropped': 0}
+
+    for page_id in page_ids:
+        cur.execute('''
+            DELETE FROM page_revisions
+            WHERE page_id = %s AND revision < (
+                SELECT MAX(revision) FROM page_revisions
+                WHERE page_id = %s AND kind = 'snapshot' AND created_at < %s
+            )
+        ''', (page_id, page_id, drop_before))
+        stats['dropped'] += cur.rowcount
+
+        cur.execute('''
+            SELECT id, kind, data, created_at FROM page_revisions
+            WHERE page_id = %s AND created_at < %s
+            ORDER BY revision
+        ''', (page_id, daily_after))
+        rows = [list(row) for row in cur.fetchall()]
+
+        deleted, dirty = [], {}
+        for current, following in zip(rows, rows[1:]):
+            if (current[1] == 'delta' and following[1] == 'delta'
+                    and current[3].date() == following[3].date()):
+                following[2] = merge_deltas(current[2], following[2])
+                dirty[following[0]] = following
+                dirty.pop(current[0], None)
+                deleted.append(current[0])
+
+        if deleted:
+            cur.execute('DELETE FROM page_revisions WHERE id = ANY(%s)', (deleted,))
+            execute_values(cur, '''
+                UPDATE page_revisions AS r SET data = v.data
+                FROM (VALUES %s) AS v(id, data)
+                WHERE r.id = v.id
+            ''', [(row[0], json.dumps(row[2])) for row in dirty.values()], template='(%s, %s::jsonb)')
+            stats['merged'] += len(deleted)
+        conn.commit()
+
+    cur.close()
+    return stats
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Обслуживание истории ревизий страниц')
+    sub = parser.add_subparsers(dest='command', required=True)
+    compact_parser = sub.add_parser('compact')
+    compact_parser.add_argument('--daily-after-days', type=int, default=30)
+    compact_parser.add_argument('--drop-after-days', type=int, default=365)
+    args = parser.parse_args(argv)
+
+    now = datetime.now()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        stats = compact(conn, now - timedelta(days=args.daily_after_days),
+                        now - timedelta(days=args.drop_after_days))
+        print(json.dumps(stats, ensure_ascii=False))
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -4,81 +4,23 @@ Backend функция для работы с анкетами пользова
 """
 
 import json
-import os
-import psycopg2
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from ref_cache import REF_CACHE
+from recommendations import features_from_answers, features_from_survey_data, recommend
+from survey_analytics import read_analytics
+from rate_limit import RATE_LIMITER
+from api_router import (
+    COMPRESSION_CACHE, JSON_HEADERS, METRICS, REPLICA, Request, Router, dumps, error_response, json_response, raw_response
+)
 
-DATABASE_URL = os.environ.get('DATABASE_URL')
-
-def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+router = Router('GET, POST, PUT, DELETE, OPTIONS', allow_headers='Content-Type, X-User-Id')
+METRICS.collect('refCache', REF_CACHE.metrics)
+METRICS.collect('rateLimit', lambda: RATE_LIMITER.stats)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method = event.get('httpMethod', 'GET')
-    params = event.get('queryStringParameters') or {}
-    action = params.get('action', '')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*'
-    }
-    
-    try:
-        if action == 'questions':
-            if method == 'GET':
-                return get_questions(event, headers)
-            elif method == 'POST':
-                return create_question(event, headers)
-            elif method == 'PUT':
-                return update_question(event, headers)
-            elif method == 'DELETE':
-                return delete_question(event, headers)
-        
-        elif action == 'register' and method == 'POST':
-            return register_user(event, headers)
-        
-        elif action == 'submit' and method == 'POST':
-            return submit_survey(event, headers)
-        
-        elif action == 'user' and method == 'GET':
-            return get_user_survey(event, headers)
-        
-        return {
-            'statusCode': 404,
-            'headers': headers,
-            'body': json.dumps({'error': 'Not found. Use ?action=questions|register|submit|user'}),
-            'isBase64Encoded': False
-        }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+    return router.handle(event, context)
 
-def get_questions(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    params = event.get('queryStringParameters') or {}
-    include_inactive = params.get('includeInactive') == 'true'
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
+def load_questions(cur, include_inactive: bool) -> str:
     if include_inactive:
         cur.execute("""
             SELECT id, category, question_text, question_type, options, 
@@ -109,26 +51,32 @@ def get_questions(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, A
             'active': row[8]
         })
     
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps({'questions': questions}),
-        'isBase64Encoded': False
-    }
+    return dumps({'questions': questions})
 
-def create_question(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    body = json.loads(event.get('body', '{}'))
+@router.route('GET', action='questions', read_only=True)
+def get_questions(request: Request) -> Dict[str, Any]:
+    include_inactive = request.params.get('includeInactive') == 'true'
     
-    conn = get_db_connection()
-    cur = conn.cursor()
+    body, hit = REF_CACHE.get(
+        lambda: request.cur, 'survey_questions_v2', include_inactive,
+        lambda cur: load_questions(cur, include_inactive)
+    )
     
+    return raw_response(body, headers={**JSON_HEADERS, 'X-Cache': 'HIT' if hit else 'MISS'})
+
+@router.route('POST', action='questions')
+def create_question(request: Request) -> Dict[str, Any]:
+    body = request.body
+    cur = request.cur
+    
+    # Сериализуем вставки, чтобы MAX(order_index) + 1 не выдавал одинаковые номера
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('survey_questions_v2.order_index'))")
     cur.execute("""
         INSERT INTO survey_questions_v2 
         (category, question_text, question_type, options, placeholder, required, order_index, active)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        SELECT %s, %s, %s, %s, %s, %s,
+               COALESCE(%s, (SELECT COALESCE(MAX(order_index), 0) + 1 FROM survey_questions_v2 WHERE category = %s)),
+               %s
         RETURNING id
     """, (
         body.get('category'),
@@ -137,30 +85,23 @@ def create_question(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str,
         json.dumps(body.get('options', {})),
         body.get('placeholder'),
         body.get('required', True),
-        body.get('order_index', 999),
+        body.get('order_index'),
+        body.get('category'),
         body.get('active', True)
     ))
     
     question_id = cur.fetchone()[0]
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 201,
-        'headers': headers,
-        'body': json.dumps({'id': question_id, 'message': 'Question created'}),
-        'isBase64Encoded': False
-    }
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions_v2')
+    
+    return json_response({'id': question_id, 'message': 'Question created'}, 201)
 
-def update_question(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    body = json.loads(event.get('body', '{}'))
+@router.route('PUT', action='questions')
+def update_question(request: Request) -> Dict[str, Any]:
+    body = request.body
     question_id = body.get('id')
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
+    request.cur.execute("""
         UPDATE survey_questions_v2
         SET category = %s, question_text = %s, question_type = %s,
             options = %s, placeholder = %s, required = %s, 
@@ -178,47 +119,70 @@ def update_question(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str,
         question_id
     ))
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions_v2')
     
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps({'message': 'Question updated'}),
-        'isBase64Encoded': False
-    }
+    return json_response({'message': 'Question updated'})
 
-def delete_question(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    params = event.get('queryStringParameters') or {}
-    question_id = params.get('id')
+@router.route('PUT', action='reorder')
+def reorder_questions(request: Request) -> Dict[str, Any]:
+    ids = request.body.get('ids')
+    
+    if not isinstance(ids, list) or not ids:
+        return error_response(400, 'ids must be a non-empty ordered list')
+    try:
+        ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        return error_response(400, 'ids must be integers')
+    
+    cur = request.cur
+    cur.execute("""
+        UPDATE survey_questions_v2 AS q
+        SET order_index = o.position
+        FROM unnest(%s::int[]) WITH ORDINALITY AS o(id, position)
+        WHERE q.id = o.id AND q.order_index IS DISTINCT FROM o.position
+    """, (ids,))
+    updated = cur.rowcount
+    
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions_v2')
+    
+    return json_response({'message': 'Questions reordered', 'updated': updated})
+
+@router.route('DELETE', action='questions')
+def delete_question(request: Request) -> Dict[str, Any]:
+    question_id = request.params.get('id')
     
     if not question_id:
-        return {
-            'statusCode': 400,
-            'headers': headers,
-            'body': json.dumps({'error': 'Missing question id'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("UPDATE survey_questions_v2 SET active = FALSE WHERE id = %s", (question_id,))
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps({'message': 'Question deactivated'}),
-        'isBase64Encoded': False
-    }
+        return error_response(400, 'Missing question id')
+    
+    request.cur.execute("UPDATE survey_questions_v2 SET active = FALSE WHERE id = %s", (question_id,))
+    
+    request.conn.commit()
+    REF_CACHE.invalidate('survey_questions_v2')
+    
+    return json_response({'message': 'Question deactivated'})
+
+@router.route('GET', action='cache_stats', read_only=True)
+def get_cache_stats(request: Request) -> Dict[str, Any]:
+    return json_response({
+        'refCache': REF_CACHE.metrics(),
+        'rateLimit': RATE_LIMITER.stats,
+        'compression': COMPRESSION_CACHE.metrics(),
+        'replica': REPLICA.metrics()
+    })
+
+@router.route('GET', action='analytics', read_only=True)
+def get_analytics(request: Request) -> Dict[str, Any]:
+    try:
+        days = min(max(int(request.params.get('days', 30)), 1), 366)
+    except ValueError:
+        return error_response(400, 'days must be an integer')
+    return json_response(read_analytics(request.cur, days))
 
-def register_user(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    body = json.loads(event.get('body', '{}'))
+@router.route('POST', action='register')
+def register_user(request: Request) -> Dict[str, Any]:
+    body = request.body
     
     name = body.get('name')
     email = body.get('email')
@@ -226,126 +190,255 @@ def register_user(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, A
     birth_date = body.get('birthDate')
     goals = body.get('goals', [])
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT id FROM users WHERE email = %s", (email,))
-    existing_user = cur.fetchone()
+    throttled, conn = RATE_LIMITER.check(request.connect, 'survey.register', request.event, email)
+    if throttled:
+        return throttled
+    request.adopt(conn)
+    cur = request.cur
     
-    if existing_user:
-        user_id = existing_user[0]
-        cur.execute("""
-            UPDATE users 
-            SET name = %s, gender = %s, birth_date = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """, (name, gender, birth_date, user_id))
-    else:
-        cur.execute("""
+    # Одна операция вместо SELECT + UPDATE/INSERT: параллельные регистрации одного email не конфликтуют
+    cur.execute("""
+        WITH upserted AS (
             INSERT INTO users (name, email, gender, birth_date)
             VALUES (%s, %s, %s, %s)
+            ON CONFLICT (email) DO UPDATE
+            SET name = EXCLUDED.name, gender = EXCLUDED.gender,
+                birth_date = EXCLUDED.birth_date, updated_at = CURRENT_TIMESTAMP
             RETURNING id
-        """, (name, email, gender, birth_date))
-        user_id = cur.fetchone()[0]
-    
-    cur.execute("""
+        )
         INSERT INTO user_surveys (user_id, goals, stage, completed)
-        VALUES (%s, %s, 1, FALSE)
-        RETURNING id
-    """, (user_id, goals))
-    
-    survey_id = cur.fetchone()[0]
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps({
-            'user_id': user_id,
-            'survey_id': survey_id,
-            'message': 'User registered successfully'
-        }),
-        'isBase64Encoded': False
-    }
+        SELECT id, %s, 1, FALSE FROM upserted
+        RETURNING user_id, id
+    """, (name, email, gender, birth_date, goals))
+    
+    user_id, survey_id = cur.fetchone()
+    request.conn.commit()
+    
+    return json_response({
+        'user_id': user_id,
+        'survey_id': survey_id,
+        'message': 'User registered successfully'
+    })
+
+# Общая часть upsert ответов: вставляет пачку одним запросом и не трогает строки,
+# где ответ не изменился. Параметры: survey_id и три параллельных массива из answer_arrays()
+UPSERT_ANSWERS_SQL = """
+    INSERT INTO survey_answers (survey_id, question_id, answer_value, answer_json)
+    SELECT %s, a.question_id, a.answer_value, a.answer_json::jsonb
+    FROM unnest(%s::int[], %s::text[], %s::text[]) AS a(question_id, answer_value, answer_json)
+    ON CONFLICT (survey_id, question_id) DO UPDATE
+    SET answer_value = EXCLUDED.answer_value,
+        answer_json = EXCLUDED.answer_json,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (survey_answers.answer_value, survey_answers.answer_json)
+          IS DISTINCT FROM (EXCLUDED.answer_value, EXCLUDED.answer_json)
+"""
+
+def answer_arrays(answers: Dict[str, Any]) -> List[List[Any]]:
+    """Раскладывает ответы {question_id: value} в массивы question_id, answer_value, answer_json"""
+    rows = {}
+    for question_id, answer_value in answers.items():
+        if isinstance(answer_value, (list, dict)):
+            rows[int(question_id)] = (None, json.dumps(answer_value))
+        else:
+            rows[int(question_id)] = (str(answer_value), None)
+    
+    return [
+        list(rows),
+        [value for value, _ in rows.values()],
+        [answer_json for _, answer_json in rows.values()]
+    ]
 
-def submit_survey(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    body = json.loads(event.get('body', '{}'))
+@router.route('POST', action='submit')
+def submit_survey(request: Request) -> Dict[str, Any]:
+    body = request.body
     
     survey_id = body.get('survey_id')
     answers = body.get('answers', {})
     
-    conn = get_db_connection()
-    cur = conn.cursor()
+    throttled, conn = RATE_LIMITER.check(request.connect, 'survey.submit', request.event)
+    if throttled:
+        return throttled
+    request.adopt(conn)
+    cur = request.cur
     
-    for question_id, answer_value in answers.items():
-        if isinstance(answer_value, (list, dict)):
-            cur.execute("""
-                INSERT INTO survey_answers (survey_id, question_id, answer_json)
-                VALUES (%s, %s, %s)
-            """, (survey_id, int(question_id), json.dumps(answer_value)))
-        else:
-            cur.execute("""
-                INSERT INTO survey_answers (survey_id, question_id, answer_value)
-                VALUES (%s, %s, %s)
-            """, (survey_id, int(question_id), str(answer_value)))
+    cur.execute(f"""
+        WITH saved AS ({UPSERT_ANSWERS_SQL})
+        UPDATE user_surveys
+        SET stage = 2, completed = TRUE, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (survey_id, *answer_arrays(answers), survey_id))
+    
+    recommendations = None
+    survey = survey_features(cur, survey_id)
+    if survey:
+        recommendations, _ = recommend(cur, str(survey[0]), survey_id, survey[1], survey[2])
+    
+    request.conn.commit()
     
+    return json_response({
+        'message': 'Survey completed successfully',
+        'recommendations': recommendations
+    })
+
+def survey_features(cur, survey_id: Any) -> Optional[tuple]:
+    """Возвращает (user_id, признаки для подбора, исходные ответы) по сохранённой анкете"""
     cur.execute("""
+        SELECT s.user_id, s.goals, u.gender,
+               COALESCE(
+                   jsonb_object_agg(q.question_text, COALESCE(a.answer_json, to_jsonb(a.answer_value)))
+                       FILTER (WHERE q.id IS NOT NULL),
+                   '{}'::jsonb
+               )
+        FROM user_surveys s
+        JOIN users u ON u.id = s.user_id
+        LEFT JOIN survey_answers a ON a.survey_id = s.id
+        LEFT JOIN survey_questions_v2 q ON q.id = a.question_id
+        WHERE s.id = %s
+        GROUP BY s.id, u.id
+    """, (survey_id,))
+    
+    row = cur.fetchone()
+    if not row:
+        return None
+    survey_data = {'goals': row[1], 'gender': row[2], 'answers': row[3]}
+    return row[0], features_from_answers(row[1], row[2], row[3]), survey_data
+
+@router.route('GET', action='recommendations')
+def get_recommendations(request: Request) -> Dict[str, Any]:
+    survey_id = request.params.get('survey_id')
+    
+    if not survey_id:
+        return error_response(400, 'survey_id is required')
+    
+    cur = request.cur
+    survey = survey_features(cur, survey_id)
+    if not survey:
+        return error_response(404, 'Survey not found')
+    
+    recommendations, hit = recommend(cur, str(survey[0]), int(survey_id), survey[1], survey[2])
+    request.conn.commit()
+    
+    return json_response({'recommendations': recommendations},
+                         headers={**JSON_HEADERS, 'X-Cache': 'HIT' if hit else 'MISS'})
+
+@router.route('POST', action='recommendations')
+def recommend_for_survey_data(request: Request) -> Dict[str, Any]:
+    survey_data = request.body.get('survey_data')
+    user_id = request.body.get('user_id')
+    
+    if not isinstance(survey_data, dict) or not user_id:
+        return error_response(400, 'survey_data and user_id are required')
+    
+    recommendations, hit = recommend(request.cur, str(user_id), None, features_from_survey_data(survey_data),
+                                     survey_data)
+    request.conn.commit()
+    
+    return json_response({'recommendations': recommendations},
+                         headers={**JSON_HEADERS, 'X-Cache': 'HIT' if hit else 'MISS'})
+
+@router.route('POST', action='save')
+def save_progress(request: Request) -> Dict[str, Any]:
+    body = request.body
+    
+    survey_id = body.get('survey_id')
+    step = body.get('step')
+    answers = body.get('answers', {})
+    
+    if not survey_id:
+        return error_response(400, 'survey_id is required')
+    
+    cur = request.cur
+    
+    # Клиент присылает только ответы текущего шага; завершённую анкету обратно не открываем
+    cur.execute(f"""
+        WITH saved AS ({UPSERT_ANSWERS_SQL} RETURNING 1)
         UPDATE user_surveys
-        SET stage = 2, completed = TRUE, updated_at = CURRENT_TIMESTAMP
+        SET stage = GREATEST(stage, 2),
+            last_step = COALESCE(%s, last_step),
+            updated_at = CURRENT_TIMESTAMP
         WHERE id = %s
+        RETURNING stage, completed, (SELECT COUNT(*) FROM saved)
+    """, (survey_id, *answer_arrays(answers), step, survey_id))
+    
+    row = cur.fetchone()
+    request.conn.commit()
+    
+    if not row:
+        return error_response(404, 'Survey not found')
+    
+    return json_response({'stage': row[0], 'completed': row[1], 'saved': row[2]})
+
+@router.route('GET', action='resume', read_only=True)
+def resume_survey(request: Request) -> Dict[str, Any]:
+    survey_id = request.params.get('survey_id')
+    
+    if not survey_id:
+        return error_response(400, 'survey_id is required')
+    
+    cur = request.cur
+    cur.execute("""
+        SELECT s.id, s.stage, s.completed, s.last_step,
+               COALESCE(
+                   jsonb_object_agg(a.question_id, COALESCE(a.answer_json, to_jsonb(a.answer_value)))
+                       FILTER (WHERE a.question_id IS NOT NULL),
+                   '{}'::jsonb
+               )
+        FROM user_surveys s
+        LEFT JOIN survey_answers a ON a.survey_id = s.id
+        WHERE s.id = %s
+        GROUP BY s.id
     """, (survey_id,))
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    row = cur.fetchone()
     
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps({'message': 'Survey completed successfully'}),
-        'isBase64Encoded': False
-    }
+    if not row:
+        return error_response(404, 'Survey not found')
+    
+    return json_response({
+        'survey_id': row[0],
+        'stage': row[1],
+        'completed': row[2],
+        'step': row[3],
+        'answers': row[4]
+    })
 
-def get_user_survey(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
-    params = event.get('queryStringParameters') or {}
-    email = params.get('email')
+@router.route('GET', action='user', read_only=True)
+def get_user_survey(request: Request) -> Dict[str, Any]:
+    email = request.params.get('email')
     
     if not email:
-        return {
-            'statusCode': 400,
-            'headers': headers,
-            'body': json.dumps({'error': 'Email is required'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+        return error_response(400, 'Email is required')
     
+    cur = request.cur
     cur.execute("""
         SELECT u.id, u.name, u.email, u.gender, u.birth_date,
-               s.id, s.goals, s.stage, s.completed
+               s.id, s.goals, s.stage, s.completed, s.last_step, a.answers
         FROM users u
-        LEFT JOIN user_surveys s ON u.id = s.user_id
+        LEFT JOIN LATERAL (
+            SELECT id, goals, stage, completed, last_step
+            FROM user_surveys
+            WHERE user_id = u.id
+            ORDER BY created_at DESC
+            LIMIT 1
+        ) s ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(
+                       jsonb_object_agg(question_id, COALESCE(answer_json, to_jsonb(answer_value))),
+                       '{}'::jsonb
+                   ) AS answers
+            FROM survey_answers
+            WHERE survey_id = s.id
+        ) a ON TRUE
         WHERE u.email = %s
-        ORDER BY s.created_at DESC
-        LIMIT 1
     """, (email,))
     
     row = cur.fetchone()
     
     if not row:
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 404,
-            'headers': headers,
-            'body': json.dumps({'error': 'User not found'}),
-            'isBase64Encoded': False
-        }
-    
-    result = {
+        return error_response(404, 'User not found')
+    
+    return json_response({
         'user': {
             'id': row[0],
             'name': row[1],
@@ -357,16 +450,8 @@ def get_user_survey(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str,
             'id': row[5],
             'goals': row[6],
             'stage': row[7],
-            'completed': row[8]
+            'completed': row[8],
+            'step': row[9],
+            'answers': row[10]
         } if row[5] else None
-    }
-    
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': headers,
-        'body': json.dumps(result),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    })
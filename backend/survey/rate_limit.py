@@ -0,0 +1,140 @@
+"""
+Token bucket для публичных эндпоинтов: ключи по IP клиента и email.
+
+Локальные корзины экземпляра функции учитывают только его собственные запросы,
+то есть не больше общего расхода: если локальная корзина пуста, запрос
+отклоняется без обращения к базе. Иначе решение принимает общая корзина в
+UNLOGGED-таблице rate_limit_buckets (V0024): все корзины ключей проверяются
+под блокировкой, и токен списывается только если пройдены все.
+
+Лимиты: RATE_LIMITS='{"orders.create": [10, 60]}' — 10 запросов за 60 секунд
+на ключ, с равномерным пополнением.
+
+Функции деплоятся независимо, поэтому модуль лежит в каждой функции,
+которая его использует (orders, survey); копии должны совпадать.
+"""
+
+import json
+import math
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    'survey.register': (5, 60),
+    'survey.submit': (10, 60),
+    'orders.create': (10, 60),
+}
+
+LIMITS: Dict[str, Tuple[int, int]] = {
+    **DEFAULT_LIMITS,
+    **{action: tuple(limit) for action, limit in json.loads(os.environ.get('RATE_LIMITS') or '{}').items()}
+}
+
+CLEANUP_PROBABILITY = 0.01
+
+def client_ip(event: Dict[str, Any]) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'x-forwarded-for' and value:
+            return value.split(',')[0].strip()
+    return 'unknown'
+
+def throttled_response(retry_after: int) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Retry-After': str(retry_after)
+        },
+        'body': json.dumps({'error': 'Too many requests', 'retryAfter': retry_after}),
+        'isBase64Encoded': False
+    }
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Tuple[int, int]] = LIMITS):
+        self.limits = limits
+        self.local: Dict[str, Tuple[float, float]] = {}
+        self.stats = {'allowed': 0, 'rejected_local': 0, 'rejected_shared': 0}
+
+    def keys(self, action: str, event: Dict[str, Any], email: Optional[str] = None) -> List[str]:
+        keys = [f'{action}:ip:{client_ip(event)}']
+        if isinstance(email, str) and email.strip():
+            keys.append(f'{action}:email:{email.strip().lower()}')
+        return keys
+
+    def take_local(self, key: str, capacity: int, rate: float, now: float) -> bool:
+        tokens, stamp = self.local.get(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - stamp) * rate)
+        if tokens < 1:
+            self.local[key] = (tokens, now)
+            return False
+        self.local[key] = (tokens - 1, now)
+        return True
+
+    def take_shared(self, cur, keys: List[str], capacity: int, rate: float) -> bool:
+        """Списывает по токену с каждой общей корзины, только если ни одна не пуста.
+        Корзины блокируются в порядке ключей, проверка и списание идут в одной транзакции"""
+        keys = sorted(keys)
+        cur.execute('''
+            INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+            SELECT k, %s, clock_timestamp() FROM unnest(%s::text[]) AS k
+            ON CONFLICT (key) DO NOTHING
+        ''', (capacity, keys))
+        cur.execute('''
+            WITH refilled AS (
+                SELECT key, LEAST(%s, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %s) AS tokens
+                FROM rate_limit_buckets
+                WHERE key = ANY(%s)
+                ORDER BY key
+                FOR UPDATE
+            )
+            UPDATE rate_limit_buckets AS b
+            SET tokens = r.tokens - 1, updated_at = clock_timestamp()
+            FROM refilled AS r
+            WHERE b.key = r.key AND (SELECT bool_and(tokens >= 1) FROM refilled)
+            RETURNING b.key
+        ''', (capacity, rate, keys))
+        allowed = len(cur.fetchall()) == len(keys)
+
+        if random.random() < CLEANUP_PROBABILITY:
+            cur.execute("DELETE FROM rate_limit_buckets WHERE updated_at < clock_timestamp() - INTERVAL '1 day'")
+        return allowed
+
+    def check(self, connect: Callable[[], Any], action: str, event: Dict[str, Any],
+              email: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """Возвращает (ответ 429 или None, соединение для дальнейшей работы).
+        Соединение открывается только после локальной проверки; списание токенов
+        фиксируется отдельным коммитом до основной транзакции"""
+        capacity, period = self.limits[action]
+        rate = capacity / period
+        retry_after = max(1, math.ceil(1 / rate))
+        keys = self.keys(action, event, email)
+
+        now = time.monotonic()
+        if not all([self.take_local(key, capacity, rate, now) for key in keys]):
+            self.stats['rejected_local'] += 1
+            return throttled_response(retry_after), None
+
+        conn = connect()
+        try:
+            cur = conn.cursor()
+            allowed = self.take_shared(cur, keys, capacity, rate)
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.close()
+            raise
+
+        if not allowed:
+            conn.close()
+            self.stats['rejected_shared'] += 1
+            return throttled_response(retry_after), None
+        self.stats['allowed'] += 1
+        return None, conn
+
+RATE_LIMITER = RateLimiter()
@@ -0,0 +1,325 @@
+"""
+Серверный подбор витаминов по тегам товаров (recommendation_tags), тот же
+алгоритм, что в src/services/vitaminRecommendations.ts.
+
+Ответы второго этапа (survey_questions_v2) сформулированы иначе, чем значения
+правил, поэтому они переводятся в словарь правил через V2_ANSWER_RULES;
+scripts/recommendations_parity.py сверяет TAG_RULES с правилами клиента.
+
+Результат мемоизируется в recommendations_history по каноническому хешу ответов:
+в хеш попадают только значения, которые встречаются в правилах, поэтому
+одинаковые по смыслу анкеты получают одну запись. Вместе с хешем хранится
+версия каталога 'product_recommendations' из cache_versions; триггер V0022
+увеличивает её при изменении товаров с тегами, и старые записи перестают совпадать.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+MAX_RECOMMENDATIONS = 6
+
+SINGLE_FIELDS = ('activity', 'diet', 'workType')
+MULTI_FIELDS = ('healthIssues', 'habits')
+
+TAG_RULES: Dict[str, List[Dict[str, Any]]] = {
+    'vitamin_d3': [
+        {'goals': ['Укрепить иммунитет', 'Улучшить настроение'], 'reason': 'поддерживает иммунную систему и регулирует настроение', 'priority': 10},
+        {'healthIssues': ['Частые простуды', 'Усталость', 'Плохое настроение'], 'reason': 'помогает бороться с усталостью и укрепляет защитные силы организма', 'priority': 9},
+        {'workType': ['Офисная работа'], 'reason': 'компенсирует недостаток солнца при работе в помещении', 'priority': 7},
+        {'activity': ['Низкая активность'], 'reason': 'важен при малоподвижном образе жизни', 'priority': 6}
+    ],
+    'omega_3': [
+        {'goals': ['Улучшить концентрацию', 'Здоровье сердца'], 'reason': 'поддерживает работу мозга и сердечно-сосудистую систему', 'priority': 10},
+        {'healthIssues': ['Проблемы с концентрацией', 'Сухость кожи'], 'reason': 'улучшает когнитивные функции и состояние кожи', 'priority': 9},
+        {'diet': ['Веган/вегетарианец'], 'reason': 'восполняет дефицит жирных кислот при растительном питании', 'priority': 8},
+        {'workType': ['Умственная работа'], 'reason': 'поддерживает работу мозга при интенсивных умственных нагрузках', 'priority': 8}
+    ],
+    'magnesium': [
+        {'goals': ['Улучшить сон', 'Снизить стресс'], 'reason': 'помогает расслабиться и улучшает качество сна', 'priority': 10},
+        {'healthIssues': ['Проблемы со сном', 'Тревожность', 'Мышечные спазмы'], 'reason': 'снижает тревожность и расслабляет мышцы', 'priority': 9},
+        {'habits': ['Высокий стресс', 'Много кофе'], 'reason': 'компенсирует потери магния из-за стресса и кофеина', 'priority': 8},
+        {'activity': ['Высокая активность'], 'reason': 'восстанавливает мышцы после физических нагрузок', 'priority': 7}
+    ],
+    'b_complex': [
+        {'goals': ['Повысить энергию'], 'reason': 'участвует в энергетическом обмене и повышает работоспособность', 'priority': 10},
+        {'healthIssues': ['Усталость', 'Проблемы с концентрацией'], 'reason': 'борется с усталостью и улучшает концентрацию', 'priority': 9},
+        {'workType': ['Умственная работа', 'Физическая работа'], 'reason': 'поддерживает высокую работоспособность', 'priority': 8},
+        {'habits': ['Много кофе', 'Курение', 'Алкоголь'], 'reason': 'восполняет дефицит витаминов группы B', 'priority': 7}
+    ],
+    'vitamin_c': [
+        {'goals': ['Укрепить иммунитет', 'Улучшить кожу'], 'reason': 'мощный антиоксидант для иммунитета и красоты кожи', 'priority': 9},
+        {'healthIssues': ['Частые простуды', 'Долгое заживление'], 'reason': 'укрепляет иммунитет и ускоряет восстановление', 'priority': 9},
+        {'habits': ['Курение'], 'reason': 'компенсирует повышенную потребность в витамине C', 'priority': 8}
+    ],
+    'zinc': [
+        {'goals': ['Укрепить иммунитет', 'Улучшить кожу'], 'reason': 'поддерживает иммунитет и здоровье кожи', 'priority': 8},
+        {'healthIssues': ['Частые простуды', 'Проблемы с кожей', 'Выпадение волос'], 'reason': 'укрепляет иммунитет, улучшает состояние кожи и волос', 'priority': 9},
+        {'gender': ['male'], 'reason': 'особенно важен для мужского здоровья', 'priority': 7}
+    ],
+    'coq10': [
+        {'goals': ['Повысить энергию', 'Здоровье сердца'], 'reason': 'улучшает энергетику клеток и поддерживает сердце', 'priority': 8},
+        {'activity': ['Высокая активность'], 'reason': 'повышает выносливость при физических нагрузках', 'priority': 8},
+        {'healthIssues': ['Усталость'], 'reason': 'борется с хронической усталостью на клеточном уровне', 'priority': 7}
+    ],
+    'iron': [
+        {'healthIssues': ['Усталость', 'Головокружение'], 'reason': 'устраняет дефицит железа и повышает уровень энергии', 'priority': 9},
+        {'gender': ['female'], 'reason': 'компенсирует потери железа', 'priority': 8},
+        {'diet': ['Веган/вегетарианец'], 'reason': 'восполняет дефицит при растительном питании', 'priority': 8}
+    ],
+    'curcumin': [
+        {'goals': ['Снизить воспаление'], 'reason': 'мощный натуральный противовоспалительный агент', 'priority': 9},
+        {'healthIssues': ['Боли в суставах', 'Воспаления'], 'reason': 'снижает воспаление и боль в суставах', 'priority': 9},
+        {'activity': ['Высокая активность'], 'reason': 'ускоряет восстановление после тренировок', 'priority': 7}
+    ],
+    'probiotics': [
+        {'goals': ['Улучшить пищеварение'], 'reason': 'восстанавливает баланс микрофлоры кишечника', 'priority': 10},
+        {'healthIssues': ['Проблемы с пищеварением'], 'reason': 'нормализует работу ЖКТ', 'priority': 10},
+        {'diet': ['Много обработанной пищи'], 'reason': 'компенсирует негативное влияние обработанной пищи', 'priority': 7}
+    ],
+    'collagen': [
+        {'goals': ['Улучшить кожу', 'Здоровье суставов'], 'reason': 'улучшает состояние кожи, волос и суставов', 'priority': 8},
+        {'healthIssues': ['Проблемы с кожей', 'Боли в суставах'], 'reason': 'восстанавливает коллаген в коже и суставах', 'priority': 8}
+    ],
+    'ashwagandha': [
+        {'goals': ['Снизить стресс', 'Улучшить сон'], 'reason': 'адаптоген, который снижает стресс и улучшает сон', 'priority': 9},
+        {'healthIssues': ['Тревожность', 'Проблемы со сном'], 'reason': 'помогает справиться со стрессом и нормализует сон', 'priority': 9},
+        {'habits': ['Высокий стресс'], 'reason': 'повышает стрессоустойчивость', 'priority': 8}
+    ],
+    'l_theanine': [
+        {'goals': ['Улучшить концентрацию', 'Снизить стресс'], 'reason': 'улучшает фокус без перевозбуждения', 'priority': 7},
+        {'healthIssues': ['Тревожность', 'Проблемы с концентрацией'], 'reason': 'снижает тревожность и улучшает концентрацию', 'priority': 8},
+        {'habits': ['Много кофе'], 'reason': 'снижает нервозность от кофеина', 'priority': 7}
+    ],
+    'melatonin': [
+        {'goals': ['Улучшить сон'], 'reason': 'регулирует циркадные ритмы и улучшает засыпание', 'priority': 9},
+        {'healthIssues': ['Проблемы со сном'], 'reason': 'помогает быстрее засыпать и улучшает качество сна', 'priority': 10},
+        {'workType': ['Ночные смены'], 'reason': 'помогает адаптироваться к нерегулярному графику', 'priority': 9}
+    ],
+    'creatine': [
+        {'goals': ['Повысить энергию', 'Набрать мышечную массу'], 'reason': 'увеличивает силу и мышечную массу', 'priority': 9},
+        {'activity': ['Высокая активность'], 'reason': 'повышает спортивную производительность', 'priority': 10},
+        {'workType': ['Физическая работа'], 'reason': 'увеличивает силу и выносливость', 'priority': 7}
+    ],
+    'rhodiola': [
+        {'goals': ['Повысить энергию', 'Снизить стресс'], 'reason': 'адаптоген для энергии и стрессоустойчивости', 'priority': 8},
+        {'healthIssues': ['Усталость', 'Тревожность'], 'reason': 'борется с усталостью и повышает устойчивость к стрессу', 'priority': 8},
+        {'habits': ['Высокий стресс'], 'reason': 'помогает организму адаптироваться к стрессу', 'priority': 7}
+    ]
+}
+
+# Вопрос второго этапа -> ответ -> значения правил; тексты как в V0010
+V2_ANSWER_RULES: Dict[str, Dict[str, List[str]]] = {
+    'Следуете ли вы какой-либо диете?': {
+        'Веганская': ['Веган/вегетарианец'],
+        'Вегетарианская': ['Веган/вегетарианец']
+    },
+    'Опишите ваш тип работы': {
+        'Сидячая работа (офис, компьютер)': ['Офисная работа'],
+        'Физически активная работа': ['Физическая работа']
+    },
+    'Как часто вы занимаетесь спортом или физическими упражнениями?': {
+        'Ежедневно': ['Высокая активность'],
+        'Редко или никогда': ['Низкая активность']
+    },
+    'Сколько часов в день вы спите в среднем?': {
+        'Менее 5 часов': ['Проблемы со сном']
+    },
+    'Оцените качество вашего сна': {
+        'Плохое': ['Проблемы со сном'],
+        'Очень плохое': ['Проблемы со сном']
+    },
+    'Курите ли вы?': {
+        'Да, регулярно': ['Курение'],
+        'Иногда': ['Курение']
+    },
+    'Как часто вы употребляете алкоголь?': {
+        'Ежедневно': ['Алкоголь'],
+        'Несколько раз в неделю': ['Алкоголь']
+    },
+    'Как часто вы испытываете стресс?': {
+        'Постоянно': ['Высокий стресс'],
+        'Часто': ['Высокий стресс']
+    },
+    'Испытываете ли вы постоянную усталость?': {
+        'Да, постоянно': ['Усталость'],
+        'Часто': ['Усталость']
+    },
+    'Есть ли у вас проблемы с концентрацией внимания?': {
+        'Да, серьезные': ['Проблемы с концентрацией'],
+        'Да, небольшие': ['Проблемы с концентрацией']
+    },
+    'Как часто вы болеете простудными заболеваниями?': {
+        'Более 6 раз в год': ['Частые простуды'],
+        '4-6 раз в год': ['Частые простуды']
+    },
+    'Есть ли у вас проблемы с кожей?': {
+        'Акне': ['Проблемы с кожей'],
+        'Сухость': ['Проблемы с кожей', 'Сухость кожи'],
+        'Воспаления': ['Проблемы с кожей'],
+        'Пигментация': ['Проблемы с кожей']
+    },
+    'Есть ли у вас проблемы с волосами?': {
+        'Выпадение': ['Выпадение волос']
+    },
+    'Испытываете ли вы проблемы с пищеварением?': {
+        'Вздутие': ['Проблемы с пищеварением'],
+        'Запоры': ['Проблемы с пищеварением'],
+        'Диарея': ['Проблемы с пищеварением'],
+        'Изжога': ['Проблемы с пищеварением']
+    }
+}
+
+@lru_cache(maxsize=None)
+def vocabulary() -> FrozenSet[str]:
+    """Все значения, которые встречаются в правилах: остальное на результат не влияет"""
+    return frozenset(
+        value
+        for rules in TAG_RULES.values()
+        for rule in rules
+        for field, values in rule.items() if isinstance(values, list)
+        for value in values
+    )
+
+def flatten_values(values: Iterable[Any]) -> List[str]:
+    flat = []
+    for value in values:
+        if isinstance(value, list):
+            flat.extend(str(item) for item in value)
+        elif isinstance(value, dict):
+            flat.extend(str(item) for item in value.values())
+        elif value is not None:
+            flat.append(str(value))
+    return flat
+
+def rule_values(answers: Dict[str, Any]) -> List[str]:
+    """Значения правил по ответам {текст вопроса: ответ}. Ответы на вопросы из V2_ANSWER_RULES
+    переводятся по таблице; ответы на прочие (добавленные в админке) вопросы учитываются,
+    только если совпадают со значением правил дословно"""
+    values = []
+    for question, answer in answers.items():
+        mapping = V2_ANSWER_RULES.get(question)
+        for value in flatten_values([answer]):
+            values.extend(mapping.get(value, []) if mapping is not None else [value])
+    return values
+
+def features_from_answers(goals: Optional[List[str]], gender: Optional[str],
+                          answers: Dict[str, Any]) -> Dict[str, Any]:
+    """Признаки из анкеты второго этапа (ответы по тексту вопроса)"""
+    known = vocabulary()
+    selected = sorted(known.intersection(rule_values(answers)))
+    return {
+        'goals': sorted(known.intersection(goals or [])),
+        'gender': gender if gender in known else None,
+        'selected': selected
+    }
+
+def features_from_survey_data(survey_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Признаки из SurveyData клиентской анкеты"""
+    answers = {field: survey_data.get(field) for field in SINGLE_FIELDS + MULTI_FIELDS}
+    return features_from_answers(survey_data.get('goals'), survey_data.get('gender'), answers)
+
+def answers_hash(features: Dict[str, Any]) -> str:
+    canonical = json.dumps(features, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def rule_score(rule: Dict[str, Any], features: Dict[str, Any]) -> Tuple[float, int]:
+    goals = set(features['goals'])
+    selected = set(features['selected'])
+    score, matches = 0.0, 0
+
+    goal_matches = len(goals.intersection(rule.get('goals', [])))
+    score += goal_matches * rule['priority']
+    matches += goal_matches
+
+    health_matches = len(selected.intersection(rule.get('healthIssues', [])))
+    score += health_matches * rule['priority'] * 1.2
+    matches += health_matches
+
+    habit_matches = len(selected.intersection(rule.get('habits', [])))
+    score += habit_matches * rule['priority']
+    matches += habit_matches
+
+    for field in SINGLE_FIELDS:
+        if selected.intersection(rule.get(field, [])):
+            score += rule['priority']
+            matches += 1
+
+    if features['gender'] and features['gender'] in rule.get('gender', []):
+        score += rule['priority'] * 0.8
+        matches += 1
+
+    return score, matches
+
+def calculate_recommendations(features: Dict[str, Any], products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    recommendations = []
+    for product in products:
+        rules = [rule for tag in product.get('recommendation_tags') or [] for rule in TAG_RULES.get(tag, [])]
+        total, best_reason, highest = 0.0, '', 0
+        for rule in rules:
+            score, matches = rule_score(rule, features)
+            if matches > 0 and rule['priority'] > highest:
+                highest = rule['priority']
+                best_reason = rule['reason']
+            total += score
+        if total > 0:
+            recommendations.append({'product': product, 'reason': best_reason, 'score': round(total, 2)})
+
+    recommendations.sort(key=lambda item: item['score'], reverse=True)
+    return recommendations[:MAX_RECOMMENDATIONS]
+
+def load_tagged_products(cur) -> List[Dict[str, Any]]:
+    cur.execute("""
+        SELECT id, name, category, price, dosage, count, emoji, main_image, recommendation_tags
+        FROM products
+        WHERE in_stock = TRUE AND recommendation_tags <> '[]'::jsonb
+        ORDER BY id
+    """)
+    return [{
+        'id': row[0],
+        'name': row[1],
+        'category': row[2],
+        'price': row[3],
+        'dosage': row[4],
+        'count': row[5],
+        'emoji': row[6],
+        'mainImage': row[7],
+        'recommendation_tags': row[8]
+    } for row in cur.fetchall()]
+
+def recommend(cur, user_id: str, survey_id: Optional[int], features: Dict[str, Any],
+              survey_data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Возвращает (рекомендации, попадание в мемо) и записывает результат в историю пользователя;
+    в survey_data истории сохраняются исходные ответы, а не признаки"""
+    digest = answers_hash(features)
+
+    cur.execute("""
+        SELECT v.version, h.recommendations
+        FROM (SELECT COALESCE((SELECT version FROM cache_versions WHERE name = 'product_recommendations'), 0) AS version) v
+        LEFT JOIN LATERAL (
+            SELECT recommendations FROM recommendations_history
+            WHERE answers_hash = %s AND catalog_version = v.version
+            ORDER BY id DESC
+            LIMIT 1
+        ) h ON TRUE
+    """, (digest,))
+    version, memo = cur.fetchone()
+
+    hit = memo is not None
+    recommendations = memo if hit else calculate_recommendations(features, load_tagged_products(cur))
+
+    # Одна запись истории на анкету и версию каталога; повторные запросы её не дублируют
+    cur.execute("""
+        INSERT INTO recommendations_history
+            (user_id, survey_id, survey_data, recommendations, answers_hash, catalog_version)
+        SELECT %s, %s, %s, %s, %s, %s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM recommendations_history
+            WHERE user_id = %s AND answers_hash = %s AND catalog_version = %s
+        )
+    """, (
+        user_id, survey_id, json.dumps(survey_data, ensure_ascii=False), json.dumps(recommendations, ensure_ascii=False),
+        digest, version, user_id, digest, version
+    ))
+    return recommendations, hit
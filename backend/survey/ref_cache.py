@@ -0,0 +1,66 @@
+"""
+In-process кеш справочных данных с версиями из таблицы cache_versions.
+Хранит уже сериализованный JSON ответа. В пределах TTL отдаёт его без запросов,
+после TTL сверяет версию таблицы одним запросом по первичному ключу и
+перезагружает данные только если версия изменилась.
+
+Функции деплоятся независимо, поэтому модуль лежит в каждой функции,
+которая его использует (page-builder, survey); копии должны совпадать.
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+REF_CACHE_TTL_SECONDS = float(os.environ.get('REF_CACHE_TTL_SECONDS', '2'))
+
+class RefCache:
+    def __init__(self, ttl_seconds: float = REF_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[Tuple[str, Hashable], Tuple[Optional[int], float, str]] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'version_checks': 0}
+
+    def current_version(self, cur, table: str) -> Optional[int]:
+        self.stats['version_checks'] += 1
+        cur.execute('SELECT version FROM cache_versions WHERE name = %s', (table,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def get(self, cur_factory: Callable[[], Any], table: str, variant: Hashable,
+            loader: Callable[[Any], str]) -> Tuple[str, bool]:
+        """Возвращает (JSON-строка, попадание в кеш); cur_factory вызывается только при необходимости"""
+        key = (table, variant)
+        entry = self.entries.get(key)
+        now = time.monotonic()
+
+        if entry and now - entry[1] < self.ttl_seconds:
+            self.stats['hits'] += 1
+            return entry[2], True
+
+        cur = cur_factory()
+        version = self.current_version(cur, table)
+        if entry and version is not None and entry[0] == version:
+            self.entries[key] = (version, now, entry[2])
+            self.stats['hits'] += 1
+            return entry[2], True
+
+        self.stats['misses'] += 1
+        body = loader(cur)
+        self.entries[key] = (version, now, body)
+        return body, False
+
+    def invalidate(self, table: str) -> None:
+        """Сбрасывает записи таблицы в этом экземпляре; остальные увидят новую версию после TTL"""
+        for key in [key for key in self.entries if key[0] == table]:
+            del self.entries[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'hitRatio': round(self.stats['hits'] / lookups, 4) if lookups else None,
+            'ttlSeconds': self.ttl_seconds
+        }
+
+REF_CACHE = RefCache()
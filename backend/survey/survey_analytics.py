@@ -0,0 +1,104 @@
+"""
+Аналитика анкет по счётчикам survey_answer_counts и survey_funnel_daily (V0023).
+Счётчики ведутся триггерами при записи ответов и переходах между этапами;
+чтение не сканирует survey_answers и user_surveys.
+
+    python survey_analytics.py backfill
+"""
+
+import json
+import os
+import sys
+import psycopg2
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+FUNNEL_STAGES = {1: 'registered', 2: 'stage2', 3: 'completed'}
+
+def read_analytics(cur, days: int) -> Dict[str, Any]:
+    cur.execute("""
+        SELECT q.id, q.category, q.question_text, q.question_type,
+               COALESCE(MAX(c.count) FILTER (WHERE c.option = ''), 0),
+               COALESCE(jsonb_object_agg(c.option, c.count) FILTER (WHERE c.option <> ''), '{}'::jsonb)
+        FROM survey_questions_v2 q
+        LEFT JOIN survey_answer_counts c ON c.question_id = q.id
+        WHERE q.active = TRUE
+        GROUP BY q.id
+        ORDER BY q.category, q.order_index
+    """)
+    questions = [{
+        'id': row[0],
+        'category': row[1],
+        'question_text': row[2],
+        'question_type': row[3],
+        'answered': row[4],
+        'options': row[5]
+    } for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT day, stage, count FROM survey_funnel_daily
+        WHERE day >= %s
+        ORDER BY day
+    """, (date.today() - timedelta(days=days - 1),))
+    funnel: Dict[str, Dict[str, int]] = {}
+    for day, stage, count in cur.fetchall():
+        entry = funnel.setdefault(day.isoformat(), {name: 0 for name in FUNNEL_STAGES.values()})
+        entry[FUNNEL_STAGES[stage]] = count
+
+    totals = {name: sum(entry[name] for entry in funnel.values()) for name in FUNNEL_STAGES.values()}
+    return {
+        'questions': questions,
+        'funnel': [{'day': day, **counts} for day, counts in funnel.items()],
+        'totals': totals
+    }
+
+def backfill(conn) -> Dict[str, int]:
+    """Пересчитывает счётчики с нуля; записи ответов и анкет на время пересчёта блокируются"""
+    cur = conn.cursor()
+    cur.execute('LOCK TABLE survey_answers, user_surveys IN SHARE MODE')
+    cur.execute('TRUNCATE survey_answer_counts, survey_funnel_daily')
+
+    cur.execute("""
+        INSERT INTO survey_answer_counts (question_id, option, count)
+        SELECT a.question_id, o.option, COUNT(*)
+        FROM survey_answers a
+        JOIN survey_questions_v2 q ON q.id = a.question_id
+        CROSS JOIN LATERAL survey_answer_options(q.question_type, a.answer_value, a.answer_json) AS o(option)
+        GROUP BY a.question_id, o.option
+    """)
+    answer_rows = cur.rowcount
+
+    cur.execute("""
+        INSERT INTO survey_funnel_daily (day, stage, count)
+        SELECT created_at::date, s.stage, COUNT(*)
+        FROM user_surveys
+        CROSS JOIN LATERAL (VALUES
+            (1, TRUE),
+            (2, COALESCE(stage, 1) >= 2),
+            (3, COALESCE(completed, FALSE))
+        ) AS s(stage, reached)
+        WHERE s.reached
+        GROUP BY created_at::date, s.stage
+    """)
+    funnel_rows = cur.rowcount
+
+    conn.commit()
+    cur.close()
+    return {'answer_counts': answer_rows, 'funnel_days': funnel_rows}
+
+def main(argv: List[str]) -> None:
+    import argparse  # только для CLI: не нагружает холодный старт функции
+    parser = argparse.ArgumentParser(description='Счётчики аналитики анкет')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('backfill')
+    parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        print(json.dumps(backfill(conn), ensure_ascii=False))
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,609 @@
+"""
+Общий HTTP-слой функций: таблица маршрутов, собранная при импорте модуля,
+быстрый JSON (orjson, если установлен, иначе стандартный json) с поддержкой
+datetime/date/Decimal, готовые словари заголовков и единый формат ошибок.
+
+    router = Router('GET, POST, OPTIONS', defaults={'resource': 'pages'})
+
+    @router.route('GET', resource='pages')
+    def list_pages(request: Request) -> Dict[str, Any]:
+        request.cur.execute(...)
+        return json_response({'pages': ...})
+
+    def handler(event, context):
+        return router.handle(event, context)
+
+Соединение с базой открывается лениво при первом обращении к request.conn
+или request.cur и закрывается после ответа.
+
+Маршруты с read_only=True читают с реплики DATABASE_REPLICA_URL, если она
+задана и отстаёт не больше REPLICA_MAX_LAG_SECONDS; иначе — с основной базы.
+Успешный ответ на изменяющий запрос несёт заголовок X-DB-Pin (срок,
+PRIMARY_PIN_SECONDS); пока клиент присылает его обратно, чтения идут на
+основную базу и видят только что записанное.
+
+Ответы больше COMPRESS_MIN_BYTES сжимаются по Accept-Encoding (br, если
+установлен brotli, иначе gzip) и отдаются в base64. Сжатые тела хранятся в
+LRU по содержимому: повторная отдача того же JSON, в том числе из кеша
+справочников, не сжимает его заново.
+
+Каждый вызов учитывается в METRICS: число ответов по статусам и гистограмма
+времени на маршрут (метод + значение action/resource), время и строки
+запросов к базе, время подключения, счётчики кешей. GET ?resource=metrics
+отдаёт их в формате Prometheus (format=json — снимком в JSON); при
+METRICS_LOG_SECONDS > 0 снимок раз в столько секунд пишется строкой в лог.
+
+Функции деплоятся независимо, поэтому модуль лежит в каждой функции;
+копии должны совпадать.
+"""
+
+import base64
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import psycopg2
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESSION_CACHE_BYTES = int(os.environ.get('COMPRESSION_CACHE_BYTES', str(8 * 1024 * 1024)))
+
+def encode_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+if orjson is not None:
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value, default=encode_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(text: Any) -> Any:
+        return orjson.loads(text)
+else:
+    _encoder = json.JSONEncoder(default=encode_default)
+    dumps = _encoder.encode
+    loads = json.loads
+
+def json_response(payload: Any, status: int = 200, headers: Dict[str, str] = JSON_HEADERS) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': headers,
+        'isBase64Encoded': False,
+        'body': dumps(payload)
+    }
+
+def raw_response(body: str, status: int = 200, headers: Dict[str, str] = JSON_HEADERS) -> Dict[str, Any]:
+    """Ответ с уже сериализованным JSON (например, из кеша)"""
+    return {
+        'statusCode': status,
+        'headers': headers,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def error_response(status: int, message: str, **extra: Any) -> Dict[str, Any]:
+    return json_response({'error': message, **extra}, status)
+
+def header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Заголовок запроса без учёта регистра имени"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+@lru_cache(maxsize=None)
+def compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    """Доступные кодировки в порядке предпочтения при равных q; модули сжатия
+    импортируются при первом большом ответе, а не при холодном старте"""
+    import gzip
+    available: Dict[str, Callable[[bytes], bytes]] = {}
+    try:
+        import brotli
+        available['br'] = lambda data: brotli.compress(data, quality=5)
+    except ImportError:
+        pass
+    available['gzip'] = lambda data: gzip.compress(data, compresslevel=6)
+    return available
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка из Accept-Encoding с учётом q; None — без сжатия"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, param = part.strip().partition(';')
+        try:
+            q = float(param.strip()[2:]) if param.strip().startswith('q=') else 1.0
+        except ValueError:
+            q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in compressors():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(body: str, encoding: str) -> str:
+    return base64.b64encode(compressors()[encoding](body.encode('utf-8'))).decode('ascii')
+
+class CompressionCache:
+    """LRU сжатых тел по (кодировка, JSON); хеш строки Python кеширует в самом объекте,
+    поэтому для тела из кеша справочников поиск почти бесплатен"""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'bytesIn': 0, 'bytesOut': 0}
+
+    def get(self, body: str, encoding: str) -> str:
+        key = (encoding, body)
+        encoded = self.entries.get(key)
+        if encoded is not None:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return encoded
+
+        encoded = compress(body, encoding)
+        self.stats['misses'] += 1
+        self.stats['bytesIn'] += len(body)
+        self.stats['bytesOut'] += len(encoded)
+        self.entries[key] = encoded
+        self.size += len(body) + len(encoded)
+        while self.size > self.max_bytes and self.entries:
+            (_, old_body), old_encoded = self.entries.popitem(last=False)
+            self.size -= len(old_body) + len(old_encoded)
+        return encoded
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, 'entries': len(self.entries), 'encodings': list(compressors())}
+
+COMPRESSION_CACHE = CompressionCache()
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Сжимает тело ответа, если клиент это принимает и тело не меньше COMPRESS_MIN_BYTES"""
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    headers = {**response.get('headers', {}), 'Vary': 'Accept-Encoding'}
+    encoding = negotiate_encoding(header(event, 'accept-encoding'))
+    if encoding is None:
+        return {**response, 'headers': headers}
+
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        # Сжатое представление отличается побайтно, поэтому ETag становится слабым
+        headers['ETag'] = f'W/{etag}'
+    headers['Content-Encoding'] = encoding
+    return {**response, 'headers': headers, 'isBase64Encoded': True, 'body': COMPRESSION_CACHE.get(body, encoding)}
+
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_SECONDS = float(os.environ.get('REPLICA_CHECK_SECONDS', '1'))
+PRIMARY_PIN_SECONDS = int(os.environ.get('PRIMARY_PIN_SECONDS', '10'))
+PIN_HEADER = 'X-DB-Pin'
+
+def default_connect():
+    return psycopg2.connect(os.environ.get('DATABASE_URL'))
+
+def replica_connect():
+    return psycopg2.connect(os.environ['DATABASE_REPLICA_URL'])
+
+def pinned_to_primary(event: Dict[str, Any]) -> bool:
+    """Клиент недавно писал: X-DB-Pin содержит unix-время окончания привязки"""
+    value = header(event, PIN_HEADER.lower())
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+def with_pin(response: Dict[str, Any]) -> Dict[str, Any]:
+    headers = {**response.get('headers', {}), PIN_HEADER: str(int(time.time()) + PRIMARY_PIN_SECONDS)}
+    exposed = headers.get('Access-Control-Expose-Headers')
+    headers['Access-Control-Expose-Headers'] = f'{exposed}, {PIN_HEADER}' if exposed else PIN_HEADER
+    return {**response, 'headers': headers}
+
+class ReplicaRouter:
+    """Соединение с репликой для чтения или None, если читать надо с основной базы.
+    Отставание проверяется не чаще раза в REPLICA_CHECK_SECONDS; при ошибке
+    подключения реплика пропускается до следующей проверки"""
+
+    def __init__(self, enabled: bool, connect: Callable[[], Any] = replica_connect,
+                 max_lag: float = REPLICA_MAX_LAG_SECONDS, check_interval: float = REPLICA_CHECK_SECONDS):
+        self.enabled = enabled
+        self.connect = connect
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.checked_at = float('-inf')
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.stats = {'replica': 0, 'primary_pinned': 0, 'primary_lagging': 0, 'replica_errors': 0}
+
+    def measure_lag(self, conn) -> float:
+        cur = conn.cursor()
+        # Без новых записей replay_timestamp стареет, но реплика не отстаёт: сравниваем LSN
+        cur.execute('''
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        ''')
+        lag = float(cur.fetchone()[0])
+        cur.close()
+        conn.rollback()
+        return lag
+
+    def acquire(self, pinned: bool) -> Optional[Any]:
+        if pinned:
+            self.stats['primary_pinned'] += 1
+            return None
+
+        now = time.monotonic()
+        due = now - self.checked_at >= self.check_interval
+        if not self.healthy and not due:
+            self.stats['primary_lagging'] += 1
+            return None
+
+        try:
+            conn = self.connect()
+            if due:
+                self.checked_at = now
+                self.lag = self.measure_lag(conn)
+                self.healthy = self.lag <= self.max_lag
+        except Exception:
+            self.checked_at, self.healthy, self.lag = now, False, None
+            self.stats['replica_errors'] += 1
+            return None
+
+        if not self.healthy:
+            conn.close()
+            self.stats['primary_lagging'] += 1
+            return None
+        self.stats['replica'] += 1
+        return conn
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, 'enabled': self.enabled, 'healthy': self.healthy, 'lagSeconds': self.lag}
+
+REPLICA = ReplicaRouter(bool(os.environ.get('DATABASE_REPLICA_URL')))
+
+METRICS_RESOURCE = 'metrics'
+METRICS_LOG_SECONDS = float(os.environ.get('METRICS_LOG_SECONDS', '0'))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_HEADERS = {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Access-Control-Allow-Origin': '*'}
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        # bisect_left: значение, равное границе, попадает в эту корзину (le включительно)
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def prometheus(self, name: str, labels: str) -> List[str]:
+        lines, total = [], 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {total}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {total}')
+        return lines
+
+class RouteMetrics:
+    __slots__ = ('statuses', 'latency', 'db_seconds', 'queries', 'rows')
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.latency = Histogram()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+class Metrics:
+    """Реестр метрик экземпляра функции. Экземпляр обрабатывает один запрос
+    за раз, поэтому запись — прибавление к полям без блокировок; итоги
+    запросов к базе копятся в current и переносятся в маршрут после ответа.
+    Сторонние счётчики (кеши, rate limit) подключаются через collect()"""
+
+    def __init__(self, log_seconds: float = METRICS_LOG_SECONDS):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.query_latency = Histogram()
+        self.connect_latency: Dict[str, Histogram] = {}
+        self.collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.current = [0.0, 0, 0]
+        self.started_at = time.time()
+        self.log_seconds = log_seconds
+        self.flushed_at = time.monotonic()
+
+    def collect(self, name: str, metrics: Callable[[], Dict[str, Any]]) -> None:
+        self.collectors[name] = metrics
+
+    def observe_query(self, seconds: float, rows: int) -> None:
+        self.query_latency.observe(seconds)
+        current = self.current
+        current[0] += seconds
+        current[1] += 1
+        current[2] += max(rows, 0)
+
+    def observe_connect(self, target: str, seconds: float) -> None:
+        histogram = self.connect_latency.get(target)
+        if histogram is None:
+            histogram = self.connect_latency[target] = Histogram()
+        histogram.observe(seconds)
+
+    def begin(self) -> None:
+        self.current = [0.0, 0, 0]
+
+    def finish(self, method: str, route: str, status: int, seconds: float) -> None:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteMetrics()
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.latency.observe(seconds)
+        db_seconds, queries, rows = self.current
+        stats.db_seconds += db_seconds
+        stats.queries += queries
+        stats.rows += rows
+
+        if self.log_seconds and time.monotonic() - self.flushed_at >= self.log_seconds:
+            self.flushed_at = time.monotonic()
+            print(dumps({'metrics': self.snapshot()}), flush=True)
+
+    def gauges(self) -> Dict[str, Dict[str, float]]:
+        """Числовые значения коллекторов; при hits/misses без hitRatio доля попаданий считается здесь"""
+        result = {}
+        for name, metrics in self.collectors.items():
+            # bool — подкласс int: флаги экспортируются как 0/1, None и списки пропускаются
+            values = {key: float(value) for key, value in metrics().items() if isinstance(value, (int, float))}
+            if 'hitRatio' not in values and 'hits' in values and 'misses' in values:
+                lookups = values['hits'] + values['misses']
+                if lookups:
+                    values['hitRatio'] = round(values['hits'] / lookups, 4)
+            result[name] = values
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'uptimeSeconds': round(time.time() - self.started_at, 3),
+            'routes': [{
+                'method': method,
+                'route': route,
+                'statuses': stats.statuses,
+                'count': sum(stats.latency.counts),
+                'seconds': round(stats.latency.sum, 6),
+                'buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], stats.latency.counts)),
+                'dbSeconds': round(stats.db_seconds, 6),
+                'queries': stats.queries,
+                'rows': stats.rows
+            } for (method, route), stats in self.routes.items()],
+            'db': {
+                'queries': sum(self.query_latency.counts),
+                'querySeconds': round(self.query_latency.sum, 6),
+                'connections': {target: sum(histogram.counts) for target, histogram in self.connect_latency.items()},
+                'connectSeconds': {target: round(histogram.sum, 6) for target, histogram in self.connect_latency.items()}
+            },
+            'collectors': self.gauges()
+        }
+
+    def prometheus(self) -> str:
+        lines = [
+            '# TYPE api_uptime_seconds gauge',
+            f'api_uptime_seconds {time.time() - self.started_at:.3f}',
+            '# TYPE api_requests_total counter'
+        ]
+        for (method, route), stats in self.routes.items():
+            for status, count in stats.statuses.items():
+                lines.append(f'api_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        lines.append('# TYPE api_request_duration_seconds histogram')
+        for (method, route), stats in self.routes.items():
+            lines.extend(stats.latency.prometheus('api_request_duration_seconds', f'method="{method}",route="{route}"'))
+        for name, kind, field in (('api_db_seconds_total', 'counter', 'db_seconds'),
+                                  ('api_db_queries_total', 'counter', 'queries'),
+                                  ('api_db_rows_total', 'counter', 'rows')):
+            lines.append(f'# TYPE {name} {kind}')
+            for (method, route), stats in self.routes.items():
+                lines.append(f'{name}{{method="{method}",route="{route}"}} {getattr(stats, field):g}')
+        lines.append('# TYPE api_db_query_duration_seconds histogram')
+        lines.extend(self.query_latency.prometheus('api_db_query_duration_seconds', ''))
+        lines.append('# TYPE api_db_connect_duration_seconds histogram')
+        for target, histogram in self.connect_latency.items():
+            lines.extend(histogram.prometheus('api_db_connect_duration_seconds', f'target="{target}"'))
+        for name, values in self.gauges().items():
+            for key, value in values.items():
+                metric = f'api_{snake_case(name)}_{snake_case(key)}'
+                lines.append(f'# TYPE {metric} gauge')
+                lines.append(f'{metric} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+def snake_case(name: str) -> str:
+    return ''.join(f'_{char.lower()}' if char.isupper() else char for char in name).strip('_')
+
+METRICS = Metrics()
+METRICS.collect('compression', lambda: COMPRESSION_CACHE.metrics())
+METRICS.collect('replica', lambda: REPLICA.metrics())
+
+class MeteredCursor(psycopg2.extensions.cursor):
+    """Курсор, который учитывает время запроса и число строк (rowcount) в METRICS"""
+
+    def execute(self, query: Any, vars: Any = None) -> None:
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            METRICS.observe_query(time.perf_counter() - started, self.rowcount)
+
+def metered_connect(connect: Callable[[], Any], target: str) -> Optional[Any]:
+    """Открывает соединение через connect, засекая время; курсоры соединения учитываются в METRICS"""
+    started = time.perf_counter()
+    conn = connect()
+    if conn is not None:
+        METRICS.observe_connect(target, time.perf_counter() - started)
+        conn.cursor_factory = MeteredCursor
+    return conn
+
+def metrics_response(params: Dict[str, str]) -> Dict[str, Any]:
+    """GET ?resource=metrics — Prometheus text; ?resource=metrics&format=json — тот же снимок в JSON"""
+    if params.get('format') == 'json':
+        return json_response(METRICS.snapshot())
+    return raw_response(METRICS.prometheus(), headers=PROMETHEUS_HEADERS)
+
+class Request:
+    __slots__ = ('event', 'method', 'params', 'connect', 'replica', 'on_replica', '_body', '_conn', '_cur')
+
+    def __init__(self, event: Dict[str, Any], method: str, params: Dict[str, str], connect: Callable[[], Any],
+                 replica: Optional[Callable[[], Any]] = None):
+        self.event = event
+        self.method = method
+        self.params = params
+        self.connect = connect
+        self.replica = replica
+        self.on_replica = False
+        self._body = None
+        self._conn = None
+        self._cur = None
+
+    @property
+    def body(self) -> Dict[str, Any]:
+        """JSON-тело запроса; пустое тело считается {}"""
+        if self._body is None:
+            body = self.event.get('body') or '{}'
+            if self.event.get('isBase64Encoded'):
+                body = base64.b64decode(body)
+            self._body = loads(body)
+        return self._body
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            if self.replica is not None:
+                self._conn = self.replica()
+                self.on_replica = self._conn is not None
+            if self._conn is None:
+                self._conn = self.connect()
+        return self._conn
+
+    @property
+    def cur(self):
+        if self._cur is None:
+            self._cur = self.conn.cursor()
+        return self._cur
+
+    def adopt(self, conn) -> None:
+        """Использует уже открытое соединение (например, после проверки rate limit)"""
+        self._conn = conn
+
+    def close(self) -> None:
+        if self._cur is not None:
+            self._cur.close()
+        if self._conn is not None:
+            self._conn.close()
+
+class Router:
+    def __init__(self, allow_methods: str, allow_headers: str = 'Content-Type, X-Admin-Token',
+                 defaults: Optional[Dict[str, str]] = None, connect: Callable[[], Any] = default_connect,
+                 replica: ReplicaRouter = REPLICA):
+        self.defaults = defaults or {}
+        self.connect = connect
+        self.replica = replica
+        self.read_only: Set[Callable] = set()
+        # method -> (имя параметра, {значение: обработчик}, обработчик по умолчанию)
+        self.routes: Dict[str, Tuple[Optional[str], Dict[str, Callable], Optional[Callable]]] = {}
+        self.preflight = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': allow_methods,
+                'Access-Control-Allow-Headers': f'{allow_headers}, {PIN_HEADER}',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    def route(self, method: str, read_only: bool = False, **selector: str) -> Callable[[Callable], Callable]:
+        """Регистрирует обработчик: route('GET') или route('POST', action='sync');
+        read_only=True разрешает читать с реплики"""
+        def register(fn: Callable) -> Callable:
+            if read_only:
+                self.read_only.add(fn)
+            param, table, fallback = self.routes.get(method, (None, {}, None))
+            if not selector:
+                self.routes[method] = (param, table, fn)
+                return fn
+            ((name, value),) = selector.items()
+            if param not in (None, name):
+                raise ValueError(f'{method} routes already dispatch on {param}')
+            table[value] = fn
+            self.routes[method] = (name, table, fallback)
+            return fn
+        return register
+
+    def resolve(self, method: str, params: Dict[str, str]) -> Tuple[Optional[Callable], str]:
+        """(обработчик, имя маршрута для метрик): значение action/resource или '' для обработчика по умолчанию"""
+        entry = self.routes.get(method)
+        if entry is None:
+            return None, ''
+        param, table, fallback = entry
+        if param is None:
+            return fallback, ''
+        value = params.get(param, self.defaults.get(param))
+        if value in table:
+            return table[value], value
+        return fallback, ''
+
+    def handle(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        method = event.get('httpMethod', 'GET')
+        if method == 'OPTIONS':
+            return self.preflight
+
+        params = event.get('queryStringParameters') or {}
+        if method == 'GET' and params.get('resource') == METRICS_RESOURCE:
+            return metrics_response(params)
+
+        fn, route = self.resolve(method, params)
+        if fn is None:
+            if method in self.routes:
+                return error_response(404, 'Not found')
+            return error_response(405, 'Method not allowed')
+
+        replica = None
+        if fn in self.read_only and self.replica.enabled:
+            pinned = pinned_to_primary(event)
+            replica = lambda: metered_connect(lambda: self.replica.acquire(pinned), 'replica')
+        request = Request(event, method, params, lambda: metered_connect(self.connect, 'primary'), replica)
+        METRICS.begin()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = fn(request)
+            if method != 'GET' and self.replica.enabled and response.get('statusCode', 200) < 400:
+                response = with_pin(response)
+            status = response.get('statusCode', 200)
+            return compress_response(event, response)
+        except Exception as e:
+            return error_response(500, str(e))
+        finally:
+            request.close()
+            METRICS.finish(method, route, status, time.perf_counter() - started)
@@ -5,13 +5,40 @@ Returns: HTTP response с результатом синхронизации
 '''
 
 import json
-import os
 import re
-import psycopg2
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Pattern, Tuple
+from api_router import Request, Router, error_response, json_response
 from datetime import datetime
 from urllib.parse import urlparse
-import urllib.request
+
+# Всё ниже нужно только при запуске синхронизации, поэтому инициализируется
+# при первом обращении, а не при холодном старте функции
+
+def fetch_text(url: str, errors: str = 'strict') -> str:
+    """GET с таймаутом; urllib.request (http.client, email, ssl) импортируется только здесь"""
+    import urllib.request
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read().decode('utf-8', errors=errors)
+
+@lru_cache(maxsize=None)
+def website_patterns() -> Tuple[List[Pattern[str]], List[Pattern[str]]]:
+    """Скомпилированные шаблоны цен и названий для parse_website"""
+    price_patterns = [
+        r'(\d+(?:\s?\d+)*)\s*(?:руб|₽|rub)',
+        r'price["\']?\s*:\s*["\']?(\d+)',
+        r'<[^>]*price[^>]*>.*?(\d+)',
+    ]
+    name_patterns = [
+        r'<h[1-6][^>]*>([^<]+)</h[1-6]>',
+        r'product[_-]?name["\']?\s*:\s*["\']([^"\']+)',
+        r'<[^>]*product[_-]?title[^>]*>([^<]+)',
+    ]
+    return (
+        [re.compile(pattern, re.IGNORECASE) for pattern in price_patterns],
+        [re.compile(pattern, re.IGNORECASE) for pattern in name_patterns]
+    )
 
 def parse_google_sheets_url(url: str) -> str:
     """Конвертирует URL Google Sheets в CSV export URL"""
@@ -30,9 +57,7 @@ def fetch_google_sheets(url: str) -> List[Dict[str, Any]]:
     """Загружает данные из Google Таблицы"""
     csv_url = parse_google_sheets_url(url)
     
-    req = urllib.request.Request(csv_url, headers={'User-Agent': 'Mozilla/5.0'})
-    with urllib.request.urlopen(req, timeout=30) as response:
-        content = response.read().decode('utf-8')
+    content = fetch_text(csv_url)
     
     lines = content.strip().split('\n')
     if len(lines) < 2:
@@ -80,31 +105,18 @@ def fetch_google_sheets(url: str) -> List[Dict[str, Any]]:
 
 def parse_website(url: str) -> List[Dict[str, Any]]:
     """Парсит товары с веб-сайта"""
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-    with urllib.request.urlopen(req, timeout=30) as response:
-        html = response.read().decode('utf-8', errors='ignore')
+    html = fetch_text(url, errors='ignore')
     
     products = []
-    
-    price_patterns = [
-        r'(\d+(?:\s?\d+)*)\s*(?:руб|₽|rub)',
-        r'price["\']?\s*:\s*["\']?(\d+)',
-        r'<[^>]*price[^>]*>.*?(\d+)',
-    ]
-    
-    name_patterns = [
-        r'<h[1-6][^>]*>([^<]+)</h[1-6]>',
-        r'product[_-]?name["\']?\s*:\s*["\']([^"\']+)',
-        r'<[^>]*product[_-]?title[^>]*>([^<]+)',
-    ]
+    price_patterns, name_patterns = website_patterns()
     
     price_matches = []
     for pattern in price_patterns:
-        price_matches.extend(re.findall(pattern, html, re.IGNORECASE))
+        price_matches.extend(pattern.findall(html))
     
     name_matches = []
     for pattern in name_patterns:
-        name_matches.extend(re.findall(pattern, html, re.IGNORECASE))
+        name_matches.extend(pattern.findall(html))
     
     for i, name in enumerate(name_matches[:20]):
         price = 0
@@ -124,337 +136,277 @@ def parse_website(url: str) -> List[Dict[str, Any]]:
     
     return products
 
+router = Router('GET, POST, PUT, DELETE, OPTIONS', defaults={'resource': 'settings', 'action': 'create'})
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
+    return router.handle(event, context)
+
+# GET - получить настройки и логи синхронизации
+@router.route('GET', resource='settings', read_only=True)
+def get_settings(request: Request) -> Dict[str, Any]:
+    cur = request.cur
+    cur.execute('''
+        SELECT id, sync_type, is_active, source_url, schedule_minutes,
+               update_prices_only, last_sync_at, last_sync_status, settings
+        FROM sync_settings
+        ORDER BY id DESC
+    ''')
+    
+    settings = []
+    for row in cur.fetchall():
+        settings.append({
+            'id': row[0],
+            'syncType': row[1],
+            'isActive': row[2],
+            'sourceUrl': row[3],
+            'scheduleMinutes': row[4],
+            'updatePricesOnly': row[5],
+            'lastSyncAt': row[6],
+            'lastSyncStatus': row[7],
+            'settings': row[8]
+        })
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+    return json_response({'settings': settings})
+
+@router.route('GET', resource='logs', read_only=True)
+def get_logs(request: Request) -> Dict[str, Any]:
+    setting_id = request.params.get('setting_id')
+    query = '''
+        SELECT id, sync_setting_id, started_at, finished_at, status,
+               items_processed, items_added, items_updated, items_skipped, error_message
+        FROM sync_logs
+    '''
+    args = []
+    if setting_id:
+        query += ' WHERE sync_setting_id = %s'
+        args.append(int(setting_id))
+    query += ' ORDER BY started_at DESC LIMIT 50'
+    
+    cur = request.cur
+    cur.execute(query, args)
+    
+    logs = []
+    for row in cur.fetchall():
+        logs.append({
+            'id': row[0],
+            'syncSettingId': row[1],
+            'startedAt': row[2],
+            'finishedAt': row[3],
+            'status': row[4],
+            'itemsProcessed': row[5],
+            'itemsAdded': row[6],
+            'itemsUpdated': row[7],
+            'itemsSkipped': row[8],
+            'errorMessage': row[9]
+        })
+    
+    return json_response({'logs': logs})
+
+# POST - запустить синхронизацию
+@router.route('POST', action='sync')
+def run_sync(request: Request) -> Dict[str, Any]:
+    setting_id = request.body.get('settingId')
+    conn = request.conn
+    cur = request.cur
     
-    db_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(db_url)
-    cur = conn.cursor()
+    cur.execute('''
+        SELECT sync_type, source_url, update_prices_only, settings
+        FROM sync_settings WHERE id = %s
+    ''', (setting_id,))
+    row = cur.fetchone()
+    
+    if not row:
+        return error_response(404, 'Настройка не найдена')
+    
+    sync_type, source_url, update_prices_only, settings = row
+    
+    cur.execute('''
+        INSERT INTO sync_logs (sync_setting_id, status)
+        VALUES (%s, %s) RETURNING id
+    ''', (setting_id, 'running'))
+    log_id = cur.fetchone()[0]
+    conn.commit()
     
     try:
-        # GET - получить настройки и логи синхронизации
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            resource = params.get('resource', 'settings')
-            
-            if resource == 'settings':
-                cur.execute('''
-                    SELECT id, sync_type, is_active, source_url, schedule_minutes,
-                           update_prices_only, last_sync_at, last_sync_status, settings
-                    FROM sync_settings
-                    ORDER BY id DESC
-                ''')
-                
-                settings = []
-                for row in cur.fetchall():
-                    settings.append({
-                        'id': row[0],
-                        'syncType': row[1],
-                        'isActive': row[2],
-                        'sourceUrl': row[3],
-                        'scheduleMinutes': row[4],
-                        'updatePricesOnly': row[5],
-                        'lastSyncAt': row[6].isoformat() if row[6] else None,
-                        'lastSyncStatus': row[7],
-                        'settings': row[8]
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'settings': settings})
-                }
-            
-            elif resource == 'logs':
-                setting_id = params.get('setting_id')
-                query = '''
-                    SELECT id, sync_setting_id, started_at, finished_at, status,
-                           items_processed, items_added, items_updated, items_skipped, error_message
-                    FROM sync_logs
-                '''
-                if setting_id:
-                    query += f' WHERE sync_setting_id = {setting_id}'
-                query += ' ORDER BY started_at DESC LIMIT 50'
-                
-                cur.execute(query)
-                
-                logs = []
-                for row in cur.fetchall():
-                    logs.append({
-                        'id': row[0],
-                        'syncSettingId': row[1],
-                        'startedAt': row[2].isoformat() if row[2] else None,
-                        'finishedAt': row[3].isoformat() if row[3] else None,
-                        'status': row[4],
-                        'itemsProcessed': row[5],
-                        'itemsAdded': row[6],
-                        'itemsUpdated': row[7],
-                        'itemsSkipped': row[8],
-                        'errorMessage': row[9]
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'logs': logs})
-                }
+        products = []
         
-        # POST - создать настройку синхронизации или запустить синхронизацию
-        elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            params = event.get('queryStringParameters') or {}
-            action = params.get('action', 'create')
+        if sync_type == 'google_sheets':
+            products = fetch_google_sheets(source_url)
+        elif sync_type == 'website':
+            products = parse_website(source_url)
+        
+        items_added = 0
+        items_updated = 0
+        items_skipped = 0
+        
+        for product in products:
+            if not product.get('name'):
+                items_skipped += 1
+                continue
             
-            if action == 'sync':
-                setting_id = body_data.get('settingId')
-                
+            if update_prices_only:
                 cur.execute('''
-                    SELECT sync_type, source_url, update_prices_only, settings
-                    FROM sync_settings WHERE id = %s
-                ''', (setting_id,))
-                row = cur.fetchone()
-                
-                if not row:
-                    return {
-                        'statusCode': 404,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Настройка не найдена'})
-                    }
-                
-                sync_type, source_url, update_prices_only, settings = row
-                
+                    UPDATE products SET price = %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE LOWER(name) = LOWER(%s)
+                ''', (product.get('price', 0), product['name']))
+                if cur.rowcount > 0:
+                    items_updated += 1
+                else:
+                    items_skipped += 1
+            else:
                 cur.execute('''
-                    INSERT INTO sync_logs (sync_setting_id, status)
-                    VALUES (%s, %s) RETURNING id
-                ''', (setting_id, 'running'))
-                log_id = cur.fetchone()[0]
-                conn.commit()
-                
-                try:
-                    products = []
-                    
-                    if sync_type == 'google_sheets':
-                        products = fetch_google_sheets(source_url)
-                    elif sync_type == 'website':
-                        products = parse_website(source_url)
-                    
-                    items_added = 0
-                    items_updated = 0
-                    items_skipped = 0
-                    
-                    for product in products:
-                        if not product.get('name'):
-                            items_skipped += 1
-                            continue
-                        
-                        if update_prices_only:
-                            cur.execute('''
-                                UPDATE products SET price = %s, updated_at = CURRENT_TIMESTAMP
-                                WHERE LOWER(name) = LOWER(%s)
-                            ''', (product.get('price', 0), product['name']))
-                            if cur.rowcount > 0:
-                                items_updated += 1
-                            else:
-                                items_skipped += 1
-                        else:
-                            cur.execute('''
-                                SELECT id FROM products WHERE LOWER(name) = LOWER(%s)
-                            ''', (product['name'],))
-                            existing = cur.fetchone()
-                            
-                            if existing:
-                                cur.execute('''
-                                    UPDATE products
-                                    SET price = %s, category = COALESCE(%s, category),
-                                        description = COALESCE(%s, description),
-                                        dosage = COALESCE(%s, dosage),
-                                        count = COALESCE(%s, count),
-                                        emoji = COALESCE(%s, emoji),
-                                        rating = COALESCE(%s, rating),
-                                        updated_at = CURRENT_TIMESTAMP
-                                    WHERE id = %s
-                                ''', (
-                                    product.get('price', 0),
-                                    product.get('category'),
-                                    product.get('description'),
-                                    product.get('dosage'),
-                                    product.get('count'),
-                                    product.get('emoji'),
-                                    product.get('rating'),
-                                    existing[0]
-                                ))
-                                items_updated += 1
-                            else:
-                                cur.execute('''
-                                    INSERT INTO products (
-                                        name, category, price, dosage, count, description,
-                                        emoji, rating, popular, external_url, in_stock
-                                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                ''', (
-                                    product['name'],
-                                    product.get('category', 'Импорт'),
-                                    product.get('price', 0),
-                                    product.get('dosage', ''),
-                                    product.get('count', ''),
-                                    product.get('description', ''),
-                                    product.get('emoji', '💊'),
-                                    product.get('rating', 0),
-                                    False,
-                                    source_url,
-                                    True
-                                ))
-                                items_added += 1
-                    
-                    cur.execute('''
-                        UPDATE sync_logs
-                        SET finished_at = CURRENT_TIMESTAMP, status = %s,
-                            items_processed = %s, items_added = %s,
-                            items_updated = %s, items_skipped = %s
-                        WHERE id = %s
-                    ''', ('success', len(products), items_added, items_updated, items_skipped, log_id))
-                    
-                    cur.execute('''
-                        UPDATE sync_settings
-                        SET last_sync_at = CURRENT_TIMESTAMP, last_sync_status = %s
-                        WHERE id = %s
-                    ''', ('success', setting_id))
-                    
-                    conn.commit()
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({
-                            'success': True,
-                            'itemsProcessed': len(products),
-                            'itemsAdded': items_added,
-                            'itemsUpdated': items_updated,
-                            'itemsSkipped': items_skipped
-                        })
-                    }
+                    SELECT id FROM products WHERE LOWER(name) = LOWER(%s)
+                ''', (product['name'],))
+                existing = cur.fetchone()
                 
-                except Exception as e:
-                    error_msg = str(e)
+                if existing:
                     cur.execute('''
-                        UPDATE sync_logs
-                        SET finished_at = CURRENT_TIMESTAMP, status = %s, error_message = %s
+                        UPDATE products
+                        SET price = %s, category = COALESCE(%s, category),
+                            description = COALESCE(%s, description),
+                            dosage = COALESCE(%s, dosage),
+                            count = COALESCE(%s, count),
+                            emoji = COALESCE(%s, emoji),
+                            rating = COALESCE(%s, rating),
+                            updated_at = CURRENT_TIMESTAMP
                         WHERE id = %s
-                    ''', ('error', error_msg, log_id))
-                    
+                    ''', (
+                        product.get('price', 0),
+                        product.get('category'),
+                        product.get('description'),
+                        product.get('dosage'),
+                        product.get('count'),
+                        product.get('emoji'),
+                        product.get('rating'),
+                        existing[0]
+                    ))
+                    items_updated += 1
+                else:
                     cur.execute('''
-                        UPDATE sync_settings
-                        SET last_sync_status = %s
-                        WHERE id = %s
-                    ''', ('error', setting_id))
-                    
-                    conn.commit()
-                    
-                    return {
-                        'statusCode': 500,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': error_msg})
-                    }
-            
-            else:
-                cur.execute('''
-                    INSERT INTO sync_settings (
-                        sync_type, is_active, source_url, schedule_minutes,
-                        update_prices_only, settings
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    body_data.get('syncType'),
-                    body_data.get('isActive', False),
-                    body_data.get('sourceUrl'),
-                    body_data.get('scheduleMinutes', 60),
-                    body_data.get('updatePricesOnly', False),
-                    json.dumps(body_data.get('settings', {}))
-                ))
-                
-                new_id = cur.fetchone()[0]
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'success': True, 'id': new_id})
-                }
+                        INSERT INTO products (
+                            name, category, price, dosage, count, description,
+                            emoji, rating, popular, external_url, in_stock
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ''', (
+                        product['name'],
+                        product.get('category', 'Импорт'),
+                        product.get('price', 0),
+                        product.get('dosage', ''),
+                        product.get('count', ''),
+                        product.get('description', ''),
+                        product.get('emoji', '💊'),
+                        product.get('rating', 0),
+                        False,
+                        source_url,
+                        True
+                    ))
+                    items_added += 1
         
-        # PUT - обновить настройку
-        elif method == 'PUT':
-            body_data = json.loads(event.get('body', '{}'))
-            setting_id = body_data.get('id')
-            
-            cur.execute('''
-                UPDATE sync_settings
-                SET sync_type = COALESCE(%s, sync_type),
-                    is_active = COALESCE(%s, is_active),
-                    source_url = COALESCE(%s, source_url),
-                    schedule_minutes = COALESCE(%s, schedule_minutes),
-                    update_prices_only = COALESCE(%s, update_prices_only),
-                    settings = COALESCE(%s, settings),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            ''', (
-                body_data.get('syncType'),
-                body_data.get('isActive'),
-                body_data.get('sourceUrl'),
-                body_data.get('scheduleMinutes'),
-                body_data.get('updatePricesOnly'),
-                json.dumps(body_data.get('settings')) if body_data.get('settings') else None,
-                setting_id
-            ))
-            
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'success': True})
-            }
+        cur.execute('''
+            UPDATE sync_logs
+            SET finished_at = CURRENT_TIMESTAMP, status = %s,
+                items_processed = %s, items_added = %s,
+                items_updated = %s, items_skipped = %s
+            WHERE id = %s
+        ''', ('success', len(products), items_added, items_updated, items_skipped, log_id))
         
-        # DELETE - удалить настройку
-        elif method == 'DELETE':
-            params = event.get('queryStringParameters') or {}
-            setting_id = params.get('id')
-            
-            cur.execute('UPDATE sync_settings SET is_active = false WHERE id = %s', (setting_id,))
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'success': True})
-            }
+        cur.execute('''
+            UPDATE sync_settings
+            SET last_sync_at = CURRENT_TIMESTAMP, last_sync_status = %s
+            WHERE id = %s
+        ''', ('success', setting_id))
+        
+        conn.commit()
+        
+        return json_response({
+            'success': True,
+            'itemsProcessed': len(products),
+            'itemsAdded': items_added,
+            'itemsUpdated': items_updated,
+            'itemsSkipped': items_skipped
+        })
+    
+    except Exception as e:
+        error_msg = str(e)
+        cur.execute('''
+            UPDATE sync_logs
+            SET finished_at = CURRENT_TIMESTAMP, status = %s, error_message = %s
+            WHERE id = %s
+        ''', ('error', error_msg, log_id))
+        
+        cur.execute('''
+            UPDATE sync_settings
+            SET last_sync_status = %s
+            WHERE id = %s
+        ''', ('error', setting_id))
         
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'isBase64Encoded': False,
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        conn.commit()
+        
+        return error_response(500, error_msg)
+
+# POST - создать настройку синхронизации
+@router.route('POST')
+def create_setting(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    cur = request.cur
+    
+    cur.execute('''
+        INSERT INTO sync_settings (
+            sync_type, is_active, source_url, schedule_minutes,
+            update_prices_only, settings
+        ) VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id
+    ''', (
+        body_data.get('syncType'),
+        body_data.get('isActive', False),
+        body_data.get('sourceUrl'),
+        body_data.get('scheduleMinutes', 60),
+        body_data.get('updatePricesOnly', False),
+        json.dumps(body_data.get('settings', {}))
+    ))
+    
+    new_id = cur.fetchone()[0]
+    request.conn.commit()
+    
+    return json_response({'success': True, 'id': new_id})
+
+# PUT - обновить настройку
+@router.route('PUT')
+def update_setting(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    setting_id = body_data.get('id')
+    cur = request.cur
+    
+    cur.execute('''
+        UPDATE sync_settings
+        SET sync_type = COALESCE(%s, sync_type),
+            is_active = COALESCE(%s, is_active),
+            source_url = COALESCE(%s, source_url),
+            schedule_minutes = COALESCE(%s, schedule_minutes),
+            update_prices_only = COALESCE(%s, update_prices_only),
+            settings = COALESCE(%s, settings),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    ''', (
+        body_data.get('syncType'),
+        body_data.get('isActive'),
+        body_data.get('sourceUrl'),
+        body_data.get('scheduleMinutes'),
+        body_data.get('updatePricesOnly'),
+        json.dumps(body_data.get('settings')) if body_data.get('settings') else None,
+        setting_id
+    ))
+    
+    request.conn.commit()
+    
+    return json_response({'success': True})
+
+# DELETE - удалить настройку
+@router.route('DELETE')
+def delete_setting(request: Request) -> Dict[str, Any]:
+    setting_id = request.params.get('id')
+    
+    request.cur.execute('UPDATE sync_settings SET is_active = false WHERE id = %s', (setting_id,))
+    request.conn.commit()
     
-    finally:
-        cur.close()
-        conn.close()
+    return json_response({'success': True})
@@ -0,0 +1,11 @@
+-- Превращаем email_logs в outbox для транзакционных писем
+ALTER TABLE email_logs ADD COLUMN IF NOT EXISTS payload JSONB DEFAULT '{}';
+ALTER TABLE email_logs ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0;
+ALTER TABLE email_logs ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- Индекс для выборки очереди отправителем
+CREATE INDEX IF NOT EXISTS idx_email_logs_pending ON email_logs(next_attempt_at) WHERE status = 'pending';
+
+COMMENT ON COLUMN email_logs.payload IS 'Данные для шаблона письма (номер заказа, сумма, статус, трек-номер)';
+COMMENT ON COLUMN email_logs.attempts IS 'Количество попыток отправки';
+COMMENT ON COLUMN email_logs.next_attempt_at IS 'Время, раньше которого письмо не берётся в отправку (бэкофф и аренда)';
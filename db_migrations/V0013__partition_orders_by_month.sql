@@ -0,0 +1,134 @@
+-- Секционирование заказов по месяцам created_at
+-- Уникальность order_number обеспечивает глобальная таблица order_lookup,
+-- т.к. уникальный индекс секционированной таблицы обязан включать ключ секционирования
+
+ALTER TABLE orders RENAME TO orders_legacy;
+ALTER TABLE email_logs DROP CONSTRAINT IF EXISTS email_logs_order_id_fkey;
+DROP INDEX IF EXISTS idx_orders_status;
+DROP INDEX IF EXISTS idx_orders_payment_status;
+DROP INDEX IF EXISTS idx_orders_order_number;
+
+CREATE TABLE orders (
+    id INTEGER NOT NULL DEFAULT nextval('orders_id_seq'),
+    order_number VARCHAR(50) NOT NULL,
+    customer_name VARCHAR(255) NOT NULL,
+    customer_email VARCHAR(255) NOT NULL,
+    customer_phone VARCHAR(50) NOT NULL,
+    delivery_method VARCHAR(50) NOT NULL,
+    delivery_address TEXT,
+    delivery_city VARCHAR(255),
+    delivery_postal_code VARCHAR(20),
+    total_amount INTEGER NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    payment_status VARCHAR(50) DEFAULT 'pending',
+    payment_id VARCHAR(255),
+    tracking_number VARCHAR(255),
+    items JSONB NOT NULL,
+    survey_data JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE orders_id_seq OWNED BY orders.id;
+
+CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_payment_status ON orders(payment_status);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at DESC);
+
+-- Глобальный индекс номеров заказов (в т.ч. архивированных)
+CREATE TABLE IF NOT EXISTS order_lookup (
+    order_number VARCHAR(50) PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    archive_ref TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_lookup_order_id ON order_lookup(order_id);
+
+COMMENT ON TABLE order_lookup IS 'Глобальный поиск заказа по номеру: order_number -> (id, created_at) секции';
+COMMENT ON COLUMN order_lookup.archive_ref IS 'Куда перенесена секция при архивации (таблица или файл выгрузки)';
+
+-- Создание месячной секции; индексы наследуются от родительской таблицы
+CREATE OR REPLACE FUNCTION create_orders_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    partition_name TEXT := format('orders_p%s', to_char(from_date, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+            partition_name, from_date, (from_date + INTERVAL '1 month')::date
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции на текущий и months_ahead следующих месяцев (вызывается по расписанию)
+CREATE OR REPLACE FUNCTION ensure_orders_partitions(months_ahead INTEGER DEFAULT 3) RETURNS INTEGER AS $$
+DECLARE
+    i INTEGER;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM create_orders_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date);
+    END LOOP;
+    RETURN months_ahead + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Поддержка order_lookup; нарушение PK здесь сохраняет уникальность order_number
+CREATE OR REPLACE FUNCTION orders_lookup_sync() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO order_lookup (order_number, order_id, created_at)
+        VALUES (NEW.order_number, NEW.id, NEW.created_at);
+        RETURN NEW;
+    END IF;
+    DELETE FROM order_lookup WHERE order_number = OLD.order_number AND archive_ref IS NULL;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Перенос существующих данных: секции на весь диапазон истории и на 3 месяца вперёд
+DO $$
+DECLARE
+    month_cursor DATE;
+BEGIN
+    SELECT date_trunc('month', COALESCE(MIN(created_at), CURRENT_TIMESTAMP))::date
+    INTO month_cursor FROM orders_legacy;
+
+    WHILE month_cursor < date_trunc('month', CURRENT_DATE) LOOP
+        PERFORM create_orders_partition(month_cursor);
+        month_cursor := (month_cursor + INTERVAL '1 month')::date;
+    END LOOP;
+END $$;
+
+SELECT ensure_orders_partitions(3);
+
+INSERT INTO orders (
+    id, order_number, customer_name, customer_email, customer_phone,
+    delivery_method, delivery_address, delivery_city, delivery_postal_code,
+    total_amount, status, payment_status, payment_id, tracking_number,
+    items, survey_data, created_at, updated_at
+)
+SELECT id, order_number, customer_name, customer_email, customer_phone,
+       delivery_method, delivery_address, delivery_city, delivery_postal_code,
+       total_amount, status, payment_status, payment_id, tracking_number,
+       items, survey_data, COALESCE(created_at, CURRENT_TIMESTAMP), updated_at
+FROM orders_legacy;
+
+INSERT INTO order_lookup (order_number, order_id, created_at)
+SELECT order_number, id, created_at FROM orders;
+
+CREATE TRIGGER trg_orders_lookup_insert
+    AFTER INSERT ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_lookup_sync();
+
+CREATE TRIGGER trg_orders_lookup_delete
+    AFTER DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_lookup_sync();
+
+DROP TABLE orders_legacy;
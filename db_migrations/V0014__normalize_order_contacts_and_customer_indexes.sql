@@ -0,0 +1,27 @@
+-- Нормализация контактов покупателя для поиска истории заказов
+-- email: нижний регистр без пробелов, телефон: E.164 (российские 8XXXXXXXXXX и 10-значные -> +7)
+
+CREATE OR REPLACE FUNCTION normalize_phone(raw TEXT) RETURNS TEXT AS $$
+DECLARE
+    digits TEXT := regexp_replace(COALESCE(raw, ''), '\D', '', 'g');
+BEGIN
+    IF digits = '' THEN
+        RETURN btrim(raw);
+    END IF;
+    IF length(digits) = 11 AND left(digits, 1) = '8' AND left(btrim(raw), 1) <> '+' THEN
+        digits := '7' || substr(digits, 2);
+    ELSIF length(digits) = 10 AND left(btrim(raw), 1) <> '+' THEN
+        digits := '7' || digits;
+    END IF;
+    RETURN '+' || digits;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+UPDATE orders
+SET customer_email = lower(btrim(customer_email)),
+    customer_phone = normalize_phone(customer_phone)
+WHERE customer_email <> lower(btrim(customer_email))
+   OR customer_phone <> normalize_phone(customer_phone);
+
+CREATE INDEX IF NOT EXISTS idx_orders_customer_email ON orders(customer_email, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_phone ON orders(customer_phone, created_at DESC, id DESC);
@@ -0,0 +1,6 @@
+-- Замороженный документ опубликованной страницы и его хеш (используется как ETag и версия кеша)
+ALTER TABLE pages ADD COLUMN IF NOT EXISTS render_document TEXT;
+ALTER TABLE pages ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+COMMENT ON COLUMN pages.render_document IS 'Готовый JSON ответа для опубликованной страницы; NULL для черновиков';
+COMMENT ON COLUMN pages.content_hash IS 'SHA-256 от render_document';
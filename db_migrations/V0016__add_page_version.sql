@@ -0,0 +1,4 @@
+-- Номер версии страницы для оптимистичной блокировки при частичных обновлениях (PATCH)
+ALTER TABLE pages ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+COMMENT ON COLUMN pages.version IS 'Увеличивается при каждом сохранении; PATCH применяется только к ожидаемой версии';
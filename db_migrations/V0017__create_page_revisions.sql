@@ -0,0 +1,98 @@
+-- История ревизий страниц: периодические полные снимки + поблочные дельты между ними
+CREATE TABLE IF NOT EXISTS page_revisions (
+    id SERIAL PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    revision INTEGER NOT NULL,
+    kind VARCHAR(10) NOT NULL, -- 'snapshot' или 'delta'
+    data JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (page_id, revision)
+);
+
+CREATE INDEX IF NOT EXISTS idx_page_revisions_snapshots ON page_revisions(page_id, revision) WHERE kind = 'snapshot';
+
+COMMENT ON TABLE page_revisions IS 'Ревизии страниц; revision совпадает с pages.version';
+COMMENT ON COLUMN page_revisions.data IS 'snapshot: {blocks, styles, title, metaDescription}; delta: {order?, set?, styles?, title?, metaDescription?}';
+
+-- Ключ блока: его id, либо позиция для блоков без id
+CREATE OR REPLACE FUNCTION page_block_key(block JSONB, position BIGINT) RETURNS TEXT AS $$
+    SELECT COALESCE(block->>'id', '#' || (position - 1));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Снимок каждые 20 ревизий ограничивает восстановление не более чем 19 дельтами
+CREATE OR REPLACE FUNCTION record_page_revision() RETURNS TRIGGER AS $$
+DECLARE
+    last_snapshot INTEGER;
+    delta JSONB := '{}'::jsonb;
+    new_order JSONB;
+    old_order JSONB;
+    changed JSONB;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        SELECT MAX(revision) INTO last_snapshot
+        FROM page_revisions WHERE page_id = NEW.id AND kind = 'snapshot';
+    END IF;
+
+    IF TG_OP = 'INSERT' OR last_snapshot IS NULL OR NEW.version - last_snapshot >= 20 THEN
+        INSERT INTO page_revisions (page_id, revision, kind, data)
+        VALUES (NEW.id, NEW.version, 'snapshot', jsonb_build_object(
+            'blocks', NEW.blocks, 'styles', NEW.styles,
+            'title', NEW.title, 'metaDescription', NEW.meta_description))
+        ON CONFLICT (page_id, revision) DO UPDATE SET kind = 'snapshot', data = EXCLUDED.data;
+        RETURN NEW;
+    END IF;
+
+    SELECT jsonb_agg(page_block_key(e, i) ORDER BY i) INTO new_order
+    FROM jsonb_array_elements(NEW.blocks) WITH ORDINALITY AS t(e, i);
+    SELECT jsonb_agg(page_block_key(e, i) ORDER BY i) INTO old_order
+    FROM jsonb_array_elements(OLD.blocks) WITH ORDINALITY AS t(e, i);
+    IF new_order IS DISTINCT FROM old_order THEN
+        delta := delta || jsonb_build_object('order', COALESCE(new_order, '[]'::jsonb));
+    END IF;
+
+    SELECT jsonb_object_agg(n.key, n.e) INTO changed
+    FROM (SELECT page_block_key(e, i) AS key, e FROM jsonb_array_elements(NEW.blocks) WITH ORDINALITY AS t(e, i)) n
+    LEFT JOIN (SELECT page_block_key(e, i) AS key, e FROM jsonb_array_elements(OLD.blocks) WITH ORDINALITY AS t(e, i)) o
+        ON o.key = n.key
+    WHERE o.e IS DISTINCT FROM n.e;
+    IF changed IS NOT NULL THEN
+        delta := delta || jsonb_build_object('set', changed);
+    END IF;
+
+    IF NEW.styles IS DISTINCT FROM OLD.styles THEN
+        delta := delta || jsonb_build_object('styles', NEW.styles);
+    END IF;
+    IF NEW.title IS DISTINCT FROM OLD.title THEN
+        delta := delta || jsonb_build_object('title', NEW.title);
+    END IF;
+    IF NEW.meta_description IS DISTINCT FROM OLD.meta_description THEN
+        delta := delta || jsonb_build_object('metaDescription', NEW.meta_description);
+    END IF;
+
+    INSERT INTO page_revisions (page_id, revision, kind, data)
+    VALUES (NEW.id, NEW.version, 'delta', delta)
+    ON CONFLICT (page_id, revision) DO UPDATE
+    SET data = jsonb_set(
+        page_revisions.data || EXCLUDED.data, '{set}',
+        COALESCE(page_revisions.data->'set', '{}'::jsonb) || COALESCE(EXCLUDED.data->'set', '{}'::jsonb));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_pages_revision_insert
+    AFTER INSERT ON pages
+    FOR EACH ROW EXECUTE FUNCTION record_page_revision();
+
+CREATE TRIGGER trg_pages_revision_update
+    AFTER UPDATE ON pages
+    FOR EACH ROW
+    WHEN (OLD.blocks IS DISTINCT FROM NEW.blocks OR OLD.styles IS DISTINCT FROM NEW.styles
+          OR OLD.title IS DISTINCT FROM NEW.title OR OLD.meta_description IS DISTINCT FROM NEW.meta_description)
+    EXECUTE FUNCTION record_page_revision();
+
+-- Начальные снимки для существующих страниц
+INSERT INTO page_revisions (page_id, revision, kind, data)
+SELECT id, version, 'snapshot', jsonb_build_object(
+    'blocks', blocks, 'styles', styles, 'title', title, 'metaDescription', meta_description)
+FROM pages
+ON CONFLICT (page_id, revision) DO NOTHING;
@@ -0,0 +1,2 @@
+-- Индекс для дешёвого MAX(updated_at): версия каталога для кеша гидрированных страниц
+CREATE INDEX IF NOT EXISTS idx_products_updated_at ON products(updated_at);
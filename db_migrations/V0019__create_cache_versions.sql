@@ -0,0 +1,34 @@
+-- Счётчики версий справочных таблиц для in-process кеша функций
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE cache_versions IS 'Версии справочных таблиц; увеличиваются триггерами при любой записи';
+
+CREATE OR REPLACE FUNCTION bump_cache_version() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO cache_versions (name, version, updated_at)
+    VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (name) DO UPDATE
+    SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_block_templates_cache_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON block_templates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+CREATE TRIGGER trg_survey_questions_cache_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON survey_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+CREATE TRIGGER trg_survey_questions_v2_cache_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON survey_questions_v2
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+INSERT INTO cache_versions (name) VALUES
+('block_templates'), ('survey_questions'), ('survey_questions_v2')
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,12 @@
+-- Один ответ на вопрос в рамках анкеты: повторная отправка перезаписывает, а не дублирует
+DELETE FROM survey_answers a
+USING survey_answers newer
+WHERE a.survey_id = newer.survey_id
+  AND a.question_id = newer.question_id
+  AND a.id < newer.id;
+
+ALTER TABLE survey_answers ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE survey_answers ADD CONSTRAINT uq_survey_answers_survey_question UNIQUE (survey_id, question_id);
+
+-- Уникальный индекс (survey_id, question_id) покрывает поиск по survey_id
+DROP INDEX IF EXISTS idx_survey_answers_survey_id;
@@ -0,0 +1,4 @@
+-- Последний сохранённый шаг второго этапа (категория вопросов) для продолжения анкеты
+ALTER TABLE user_surveys ADD COLUMN IF NOT EXISTS last_step VARCHAR(100);
+
+COMMENT ON COLUMN user_surveys.last_step IS 'Категория, на которой пользователь остановился при автосохранении';
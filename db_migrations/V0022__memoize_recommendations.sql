@@ -0,0 +1,40 @@
+-- Мемоизация серверных рекомендаций: канонический хеш ответов + версия каталога товаров с тегами
+ALTER TABLE recommendations_history ADD COLUMN IF NOT EXISTS survey_id INTEGER REFERENCES user_surveys(id);
+ALTER TABLE recommendations_history ADD COLUMN IF NOT EXISTS answers_hash VARCHAR(64);
+ALTER TABLE recommendations_history ADD COLUMN IF NOT EXISTS catalog_version BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_recommendations_memo ON recommendations_history(answers_hash, catalog_version, id DESC);
+CREATE INDEX IF NOT EXISTS idx_recommendations_survey_id ON recommendations_history(survey_id);
+
+COMMENT ON COLUMN recommendations_history.answers_hash IS 'sha256 канонических признаков анкеты (recommendations.py)';
+COMMENT ON COLUMN recommendations_history.catalog_version IS 'cache_versions.product_recommendations на момент расчёта';
+
+-- Версия увеличивается только при изменениях, которые видны в рекомендациях
+CREATE OR REPLACE FUNCTION bump_product_recommendations_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (OLD.name, OLD.category, OLD.price, OLD.dosage, OLD.count, OLD.emoji,
+            OLD.main_image, OLD.in_stock, OLD.recommendation_tags)
+           IS NOT DISTINCT FROM
+           (NEW.name, NEW.category, NEW.price, NEW.dosage, NEW.count, NEW.emoji,
+            NEW.main_image, NEW.in_stock, NEW.recommendation_tags) THEN
+        RETURN NULL;
+    END IF;
+
+    IF (TG_OP <> 'INSERT' AND COALESCE(OLD.recommendation_tags, '[]'::jsonb) <> '[]'::jsonb)
+       OR (TG_OP <> 'DELETE' AND COALESCE(NEW.recommendation_tags, '[]'::jsonb) <> '[]'::jsonb) THEN
+        INSERT INTO cache_versions (name, version, updated_at)
+        VALUES ('product_recommendations', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE
+        SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_products_recommendations_version
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    FOR EACH ROW EXECUTE FUNCTION bump_product_recommendations_version();
+
+INSERT INTO cache_versions (name) VALUES ('product_recommendations')
+ON CONFLICT (name) DO NOTHING;
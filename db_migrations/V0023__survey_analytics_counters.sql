@@ -0,0 +1,115 @@
+-- Инкрементальные счётчики аналитики анкет: распределение ответов и воронка по этапам
+CREATE TABLE IF NOT EXISTS survey_answer_counts (
+    question_id INTEGER NOT NULL,
+    option TEXT NOT NULL, -- '' = всего ответивших на вопрос
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (question_id, option)
+);
+
+CREATE TABLE IF NOT EXISTS survey_funnel_daily (
+    day DATE NOT NULL, -- день регистрации анкеты (когорта)
+    stage SMALLINT NOT NULL, -- 1 = зарегистрирован, 2 = начат второй этап, 3 = анкета завершена
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, stage)
+);
+
+COMMENT ON TABLE survey_answer_counts IS 'Поддерживается триггерами на survey_answers; пересчёт: python survey_analytics.py backfill';
+COMMENT ON TABLE survey_funnel_daily IS 'Поддерживается триггером на user_surveys; пересчёт: python survey_analytics.py backfill';
+
+-- Варианты, которые учитываются для ответа: '' всегда, выбранные опции только у вопросов с выбором
+CREATE OR REPLACE FUNCTION survey_answer_options(question_type TEXT, answer_value TEXT, answer_json JSONB)
+RETURNS SETOF TEXT AS $$
+    SELECT ''
+    UNION ALL
+    SELECT answer_value
+    WHERE question_type = 'single_choice' AND answer_value IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT jsonb_array_elements_text(answer_json)
+    WHERE question_type IN ('single_choice', 'multiple_choice') AND jsonb_typeof(answer_json) = 'array';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Statement-триггеры с transition tables: одна агрегированная запись на вариант за оператор
+CREATE OR REPLACE FUNCTION count_survey_answers() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO survey_answer_counts (question_id, option, count)
+        SELECT a.question_id, o.option, COUNT(*)
+        FROM new_answers a
+        JOIN survey_questions_v2 q ON q.id = a.question_id
+        CROSS JOIN LATERAL survey_answer_options(q.question_type, a.answer_value, a.answer_json) AS o(option)
+        GROUP BY a.question_id, o.option
+        ORDER BY a.question_id, o.option
+        ON CONFLICT (question_id, option) DO UPDATE SET count = survey_answer_counts.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE survey_answer_counts c SET count = c.count - d.total
+        FROM (
+            SELECT a.question_id, o.option, COUNT(*) AS total
+            FROM old_answers a
+            JOIN survey_questions_v2 q ON q.id = a.question_id
+            CROSS JOIN LATERAL survey_answer_options(q.question_type, a.answer_value, a.answer_json) AS o(option)
+            GROUP BY a.question_id, o.option
+        ) d
+        WHERE c.question_id = d.question_id AND c.option = d.option;
+    ELSE
+        INSERT INTO survey_answer_counts (question_id, option, count)
+        SELECT question_id, option, SUM(delta)
+        FROM (
+            SELECT a.question_id, o.option, 1 AS delta
+            FROM new_answers a
+            JOIN survey_questions_v2 q ON q.id = a.question_id
+            CROSS JOIN LATERAL survey_answer_options(q.question_type, a.answer_value, a.answer_json) AS o(option)
+            UNION ALL
+            SELECT a.question_id, o.option, -1
+            FROM old_answers a
+            JOIN survey_questions_v2 q ON q.id = a.question_id
+            CROSS JOIN LATERAL survey_answer_options(q.question_type, a.answer_value, a.answer_json) AS o(option)
+        ) d
+        GROUP BY question_id, option
+        HAVING SUM(delta) <> 0
+        ORDER BY question_id, option
+        ON CONFLICT (question_id, option) DO UPDATE SET count = survey_answer_counts.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_survey_answers_counts_insert
+    AFTER INSERT ON survey_answers
+    REFERENCING NEW TABLE AS new_answers
+    FOR EACH STATEMENT EXECUTE FUNCTION count_survey_answers();
+
+CREATE TRIGGER trg_survey_answers_counts_update
+    AFTER UPDATE ON survey_answers
+    REFERENCING OLD TABLE AS old_answers NEW TABLE AS new_answers
+    FOR EACH STATEMENT EXECUTE FUNCTION count_survey_answers();
+
+CREATE TRIGGER trg_survey_answers_counts_delete
+    AFTER DELETE ON survey_answers
+    REFERENCING OLD TABLE AS old_answers
+    FOR EACH STATEMENT EXECUTE FUNCTION count_survey_answers();
+
+-- Воронка: анкета учитывается в когорте дня регистрации при переходе на каждый этап
+CREATE OR REPLACE FUNCTION count_survey_funnel() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO survey_funnel_daily (day, stage, count)
+    SELECT NEW.created_at::date, s.stage, 1
+    FROM (VALUES
+        (1, TG_OP = 'INSERT'),
+        (2, COALESCE(NEW.stage, 1) >= 2 AND (TG_OP = 'INSERT' OR COALESCE(OLD.stage, 1) < 2)),
+        (3, COALESCE(NEW.completed, FALSE) AND (TG_OP = 'INSERT' OR NOT COALESCE(OLD.completed, FALSE)))
+    ) AS s(stage, reached)
+    WHERE s.reached
+    ON CONFLICT (day, stage) DO UPDATE SET count = survey_funnel_daily.count + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_user_surveys_funnel_insert
+    AFTER INSERT ON user_surveys
+    FOR EACH ROW EXECUTE FUNCTION count_survey_funnel();
+
+CREATE TRIGGER trg_user_surveys_funnel_update
+    AFTER UPDATE OF stage, completed ON user_surveys
+    FOR EACH ROW
+    WHEN (OLD.stage IS DISTINCT FROM NEW.stage OR OLD.completed IS DISTINCT FROM NEW.completed)
+    EXECUTE FUNCTION count_survey_funnel();
@@ -0,0 +1,10 @@
+-- Общие корзины token bucket для публичных эндпоинтов; UNLOGGED: потеря при сбое допустима, WAL не пишется
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY, -- '{action}:ip:{адрес}' или '{action}:email:{email}'
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated_at ON rate_limit_buckets(updated_at);
+
+COMMENT ON TABLE rate_limit_buckets IS 'Состояние rate limiter (rate_limit.py); записи старше суток удаляются при обращениях';
@@ -0,0 +1,6 @@
+-- Индексы, которых не хватало на данных в масштабе продакшена (scripts/plan_check.py)
+-- Сопоставление товаров при синхронизации: LOWER(name) выполняется на каждую строку источника
+CREATE INDEX IF NOT EXISTS idx_products_lower_name ON products(LOWER(name));
+
+-- Логи одной настройки синхронизации без сортировки всех её запусков
+CREATE INDEX IF NOT EXISTS idx_sync_logs_setting_started ON sync_logs(sync_setting_id, started_at DESC);
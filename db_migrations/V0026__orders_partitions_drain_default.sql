@@ -0,0 +1,68 @@
+-- Создание месячной секции с переносом её строк из orders_default.
+-- Пока в DEFAULT-секции есть строки за месяц, CREATE ... PARTITION OF для этого месяца
+-- завершается ошибкой, поэтому секция собирается отдельной таблицей и присоединяется.
+CREATE OR REPLACE FUNCTION create_orders_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := format('orders_p%s', to_char(from_date, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM orders_default WHERE created_at >= from_date AND created_at < to_date) THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+            partition_name, from_date, to_date
+        );
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM orders_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+         INSERT INTO %I SELECT * FROM moved',
+        from_date, to_date, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE orders ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, from_date, to_date
+    );
+
+    -- DELETE из orders_default сработал через trg_orders_lookup_delete: возвращаем номера
+    EXECUTE format(
+        'INSERT INTO order_lookup (order_number, order_id, created_at)
+         SELECT order_number, id, created_at FROM %I
+         ON CONFLICT (order_number) DO NOTHING',
+        partition_name
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции на текущий и months_ahead следующих месяцев, а также на все месяцы,
+-- строки которых попали в orders_default (ensure не запускался вовремя)
+CREATE OR REPLACE FUNCTION ensure_orders_partitions(months_ahead INTEGER DEFAULT 3) RETURNS INTEGER AS $$
+DECLARE
+    i INTEGER;
+    month_start DATE;
+    checked INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT DISTINCT date_trunc('month', created_at)::date FROM orders_default ORDER BY 1
+    LOOP
+        PERFORM create_orders_partition(month_start);
+        checked := checked + 1;
+    END LOOP;
+
+    FOR i IN 0..months_ahead LOOP
+        PERFORM create_orders_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date);
+        checked := checked + 1;
+    END LOOP;
+    RETURN checked;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Запас секций на полгода вперёд, чтобы пропуск расписания не отправлял заказы в DEFAULT
+SELECT ensure_orders_partitions(6);
@@ -0,0 +1,191 @@
+"""
+Профиль холодного старта функций: каждый прогон — новый интерпретатор,
+который импортирует backend/<функция>/index.py и выполняет два запроса
+(первый и тёплый) через handler.
+
+    DATABASE_URL=... python scripts/cold_start_profile.py --runs 30 [--imports 10] [--json]
+
+Фазы (мс):
+    process         запуск интерпретатора и весь прогон, замер снаружи
+    import          import index
+    connect         первое соединение с базой (router.connect)
+    first_query     первый cursor.execute
+    serialize       первый вызов api_router.dumps
+    first_request   первый вызов handler целиком
+    warm_request    второй такой же вызов
+
+Без DATABASE_URL измеряются только process и import. Для каждой фазы
+печатаются p50, p99 и максимум; --imports N добавляет N самых дорогих
+модулей из одного прогона с python -X importtime.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Лёгкие читающие запросы, которые есть у каждой функции
+PROBES = {
+    'orders': {},
+    'page-builder': {'resource': 'templates'},
+    'products': {},
+    'survey': {'action': 'questions'},
+    'sync-catalog': {'resource': 'settings'},
+}
+
+PHASES = ('process', 'import', 'connect', 'first_query', 'serialize', 'first_request', 'warm_request')
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+class TimedCursor:
+    def __init__(self, cursor, timings: Dict[str, float]):
+        self._cursor = cursor
+        self._timings = timings
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            self._timings.setdefault('first_query', elapsed_ms(started))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+class TimedConnection:
+    def __init__(self, conn, timings: Dict[str, float]):
+        self._conn = conn
+        self._timings = timings
+
+    def cursor(self, *args: Any, **kwargs: Any) -> TimedCursor:
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._timings)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+def profile_child(function: str, probe: Dict[str, str]) -> Dict[str, float]:
+    """Выполняется в отдельном процессе: замеры одного холодного старта"""
+    function_dir = os.path.abspath(os.path.join(BACKEND_DIR, function))
+    sys.path.insert(0, function_dir)
+    os.chdir(function_dir)
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    import index
+    timings['import'] = elapsed_ms(started)
+
+    if not os.environ.get('DATABASE_URL'):
+        return timings
+
+    import api_router
+    connect = index.router.connect
+    dumps = api_router.dumps
+
+    def timed_connect():
+        started = time.perf_counter()
+        conn = connect()
+        timings.setdefault('connect', elapsed_ms(started))
+        return TimedConnection(conn, timings)
+
+    def timed_dumps(value: Any) -> str:
+        started = time.perf_counter()
+        try:
+            return dumps(value)
+        finally:
+            timings.setdefault('serialize', elapsed_ms(started))
+
+    index.router.connect = timed_connect
+    api_router.dumps = timed_dumps
+
+    event = {'httpMethod': 'GET', 'queryStringParameters': probe, 'headers': {}, 'body': None}
+    for phase in ('first_request', 'warm_request'):
+        started = time.perf_counter()
+        response = index.handler(event, None)
+        timings[phase] = elapsed_ms(started)
+        if response.get('statusCode', 200) >= 500:
+            raise RuntimeError(f'{function}: {response.get("body")}')
+    return timings
+
+def run_once(function: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', function],
+        capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout)
+    timings['process'] = elapsed_ms(started)
+    return timings
+
+def top_imports(function: str, count: int) -> List[Dict[str, Any]]:
+    """Самые дорогие прямые импорты index по накопленному времени (один прогон -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=os.path.join(BACKEND_DIR, function), capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Вложенность показана отступом по два пробела; index — уровень 0
+        if len(name) - len(name.lstrip()) == 3:
+            modules.append({'module': name.strip(), 'ms': int(cumulative) / 1000})
+    modules.sort(key=lambda item: item['ms'], reverse=True)
+    return modules[:count]
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for phase in PHASES:
+        values = [run[phase] for run in runs if phase in run]
+        if values:
+            summary[phase] = {
+                'p50': percentile(values, 50),
+                'p99': percentile(values, 99),
+                'max': max(values)
+            }
+    return summary
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Профиль холодного старта функций')
+    parser.add_argument('functions', nargs='*', default=sorted(PROBES), help='по умолчанию все функции')
+    parser.add_argument('--runs', type=int, default=20, help='холодных стартов на функцию')
+    parser.add_argument('--imports', type=int, default=0, help='показать N самых дорогих импортов')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(profile_child(args.child, PROBES.get(args.child, {}))))
+        return
+
+    report = {}
+    for function in args.functions:
+        report[function] = {'phases': summarize([run_once(function) for _ in range(args.runs)])}
+        if args.imports:
+            report[function]['imports'] = top_imports(function, args.imports)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    for function, result in report.items():
+        print(f'{function}  ({args.runs} runs)')
+        for phase, stats in result['phases'].items():
+            print(f'  {phase:<14} p50 {stats["p50"]:8.2f}  p99 {stats["p99"]:8.2f}  max {stats["max"]:8.2f}')
+        for item in result.get('imports', []):
+            print(f'  import {item["module"]:<30} {item["ms"]:8.2f}')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,241 @@
+"""
+Локальный сервер, который поднимает все функции из backend/func2url.json
+одновременно и переводит HTTP-запросы в event облачной функции
+(httpMethod, queryStringParameters, headers, body, requestContext).
+
+    DATABASE_URL=postgresql://localhost/vitamins python scripts/dev_server.py --port 8000
+
+Каждая функция обслуживается своим пулом процессов: один процесс — один
+экземпляр функции со своими модульными кешами, как в облаке. Экземпляр
+стартует с чистого интерпретатора и импортирует index.py, поэтому холодный
+старт настоящий; --cold-start-ms добавляет к нему задержку сети/рантайма,
+--recycle N заменяет все экземпляры функции новыми после каждых N вызовов.
+Если все экземпляры функции заняты, запрос ждёт в очереди, как при лимите
+параллельности. GET /_stats — счётчики вызовов и холодных стартов, занятость
+пула (in_flight из workers, пик); метрики самих функций — /<функция>/?resource=metrics.
+
+Функция доступна по имени (/products/?id=1) и по последнему сегменту её
+облачного URL, поэтому фронтенд запускается с VITE_FUNCTIONS_URL=http://localhost:8000.
+"""
+
+import argparse
+import base64
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Состояние процесса-экземпляра функции
+_HANDLER = None
+_FUNCTION_NAME = ''
+_COLD = True
+
+class Context:
+    """Минимальный context облачной функции"""
+
+    def __init__(self, function_name: str):
+        self.request_id = str(uuid.uuid4())
+        self.function_name = function_name
+
+def start_instance(function_dir: str, function_name: str, cold_start_ms: int) -> None:
+    global _HANDLER, _FUNCTION_NAME
+    sys.path.insert(0, function_dir)
+    os.chdir(function_dir)
+    import index
+    _HANDLER = index.handler
+    _FUNCTION_NAME = function_name
+    if cold_start_ms:
+        time.sleep(cold_start_ms / 1000)
+
+def invoke(event: Dict[str, Any]) -> Tuple[Dict[str, Any], bool, int]:
+    """Вызов handler в экземпляре; возвращает (ответ, холодный ли вызов, pid)"""
+    global _COLD
+    cold, _COLD = _COLD, False
+    return _HANDLER(event, Context(_FUNCTION_NAME)), cold, os.getpid()
+
+def load_functions(func2url_path: str) -> Dict[str, str]:
+    """Сегмент пути -> имя функции: и имя, и id из облачного URL"""
+    with open(func2url_path, encoding='utf-8') as f:
+        urls = json.load(f)
+    routes = {}
+    for name, url in urls.items():
+        if not os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py')):
+            print(f'skip {name}: no backend/{name}/index.py', file=sys.stderr)
+            continue
+        routes[name] = name
+        routes[url.rstrip('/').rsplit('/', 1)[-1]] = name
+    return routes
+
+class FunctionPool:
+    def __init__(self, name: str, workers: int, cold_start_ms: int, recycle: Optional[int]):
+        self.name = name
+        self.workers = workers
+        self.cold_start_ms = cold_start_ms
+        self.recycle = recycle
+        self.stats = {'requests': 0, 'cold_starts': 0, 'errors': 0, 'recycled': 0,
+                      'workers': workers, 'in_flight': 0, 'peak_in_flight': 0}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.executor = self.spawn()
+
+    def spawn(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=start_instance,
+            initargs=(os.path.abspath(os.path.join(BACKEND_DIR, self.name)), self.name, self.cold_start_ms)
+        )
+
+    def submit(self, event: Dict[str, Any]) -> concurrent.futures.Future:
+        """Отправляет вызов; каждые recycle вызовов экземпляры заменяются новыми (холодными)"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+            self.calls += 1
+            if self.recycle and self.calls > self.recycle:
+                # Старый пул дорабатывает принятые вызовы и завершается сам
+                self.executor.shutdown(wait=False)
+                self.executor = self.spawn()
+                self.calls = 1
+                self.stats['recycled'] += 1
+            return self.executor.submit(invoke, event)
+
+    def count(self, key: str, delta: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += delta
+
+    def call(self, event: Dict[str, Any], timeout: float) -> Tuple[Dict[str, Any], bool, int]:
+        try:
+            response, cold, pid = self.submit(event).result(timeout=timeout)
+        except Exception:
+            self.count('errors')
+            raise
+        finally:
+            self.count('in_flight', -1)
+        if cold:
+            self.count('cold_starts')
+        return response, cold, pid
+
+def build_event(method: str, path: str, headers: Dict[str, str], body: bytes, source_ip: str) -> Dict[str, Any]:
+    query = urlsplit(path).query
+    try:
+        text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text, is_base64 = base64.b64encode(body).decode('ascii'), True
+    return {
+        'httpMethod': method,
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(query, keep_blank_values=True)),
+        'body': text,
+        'isBase64Encoded': is_base64,
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'identity': {'sourceIp': source_ip}
+        }
+    }
+
+def make_request_handler(routes: Dict[str, str], pools: Dict[str, FunctionPool], timeout: float, quiet: bool):
+    class RequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def dispatch(self) -> None:
+            started = time.perf_counter()
+            segment = urlsplit(self.path).path.strip('/').split('/', 1)[0]
+
+            if segment == '_stats':
+                self.send(200, {'Content-Type': 'application/json'},
+                          json.dumps({name: pool.stats for name, pool in pools.items()}).encode())
+                return
+
+            name = routes.get(segment)
+            if name is None:
+                self.send(404, {'Content-Type': 'application/json'},
+                          json.dumps({'error': f'Unknown function {segment!r}'}).encode())
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            event = build_event(self.command, self.path, dict(self.headers.items()),
+                                self.rfile.read(length), self.client_address[0])
+            cold = False
+            try:
+                response, cold, pid = pools[name].call(event, timeout)
+            except concurrent.futures.TimeoutError:
+                self.send(504, {'Content-Type': 'application/json'}, b'{"error": "Function timed out"}')
+                return
+            except Exception as e:
+                self.send(502, {'Content-Type': 'application/json'},
+                          json.dumps({'error': f'{type(e).__name__}: {e}'}).encode())
+                return
+
+            body = response.get('body') or ''
+            body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+            self.send(response.get('statusCode', 200), response.get('headers') or {}, body)
+
+            if not quiet:
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f'{name:<13} {self.command:<7} {response.get("statusCode", 200)} {elapsed:8.1f}ms '
+                      f'pid={pid}{" cold" if cold else ""} {self.path}', file=sys.stderr)
+
+        def send(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+            self.send_response(status)
+            for key, value in headers.items():
+                if key.lower() != 'content-length':
+                    self.send_header(key, str(value))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = dispatch
+
+    return RequestHandler
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Локальный сервер всех облачных функций')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--func2url', default=os.path.join(BACKEND_DIR, 'func2url.json'))
+    parser.add_argument('--workers', type=int, default=4, help='экземпляров на функцию')
+    parser.add_argument('--cold-start-ms', type=int, default=0, help='дополнительная задержка холодного старта')
+    parser.add_argument('--recycle', type=int, default=None, help='замена экземпляров функции после каждых N вызовов')
+    parser.add_argument('--timeout', type=float, default=30, help='таймаут вызова, секунды')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='переменная окружения для функций')
+    parser.add_argument('--quiet', action='store_true', help='не печатать строку на каждый запрос')
+    args = parser.parse_args(argv)
+
+    for item in args.env:
+        key, _, value = item.partition('=')
+        os.environ[key] = value
+
+    routes = load_functions(args.func2url)
+    pools = {name: FunctionPool(name, args.workers, args.cold_start_ms, args.recycle)
+             for name in sorted(set(routes.values()))}
+
+    server = ThreadingHTTPServer((args.host, args.port), make_request_handler(routes, pools, args.timeout, args.quiet))
+    server.daemon_threads = True
+    for name in pools:
+        print(f'http://{args.host}:{args.port}/{name}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for pool in pools.values():
+            pool.executor.shutdown(cancel_futures=True)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,114 @@
+"""
+Локальная пара PostgreSQL «основная + реплика» для проверки чтения с реплики.
+Нужны initdb, pg_ctl, pg_basebackup и psql из PATH.
+
+    python scripts/local_replica.py up [--dir .pg-local] [--port 5432]
+    python scripts/local_replica.py lag 30      # реплика применяет WAL с задержкой 30 с
+    python scripts/local_replica.py lag 0
+    python scripts/local_replica.py status
+    python scripts/local_replica.py down
+
+up создаёт основной кластер на --port, применяет db_migrations/V*.sql,
+снимает с него pg_basebackup -R и запускает реплику на --port + 1, после
+чего печатает переменные окружения для функций:
+
+    DATABASE_URL=... DATABASE_REPLICA_URL=... python scripts/dev_server.py
+
+Задержка lag задаётся через recovery_min_apply_delay: реплика отстаёт, и
+при отставании больше REPLICA_MAX_LAG_SECONDS чтения уходят на основную базу.
+"""
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DATABASE = 'vitamins'
+
+def run(*args: str) -> str:
+    return subprocess.run(args, check=True, capture_output=True, text=True).stdout
+
+def dsn(port: int) -> str:
+    return f'postgresql://postgres@localhost:{port}/{DATABASE}'
+
+def psql(port: int, sql: str, database: str = DATABASE) -> str:
+    return run('psql', '-h', 'localhost', '-p', str(port), '-U', 'postgres', '-d', database,
+               '-v', 'ON_ERROR_STOP=1', '-At', '-c', sql).strip()
+
+def up(data_dir: str, port: int) -> None:
+    primary_dir = os.path.join(data_dir, 'primary')
+    replica_dir = os.path.join(data_dir, 'replica')
+    replica_port = port + 1
+
+    if not os.path.isdir(primary_dir):
+        run('initdb', '-D', primary_dir, '-U', 'postgres', '--auth', 'trust')
+        with open(os.path.join(primary_dir, 'postgresql.conf'), 'a') as conf:
+            conf.write(f'\nport = {port}\nwal_level = replica\nmax_wal_senders = 4\nhot_standby = on\n')
+        with open(os.path.join(primary_dir, 'pg_hba.conf'), 'a') as hba:
+            hba.write('\nhost replication postgres 127.0.0.1/32 trust\nhost replication postgres ::1/128 trust\n')
+    run('pg_ctl', '-D', primary_dir, '-l', os.path.join(data_dir, 'primary.log'), '-w', 'start')
+
+    if not psql(port, f"SELECT 1 FROM pg_database WHERE datname = '{DATABASE}'", 'postgres'):
+        psql(port, f'CREATE DATABASE {DATABASE}', 'postgres')
+        for path in sorted(glob.glob(os.path.join(ROOT_DIR, 'db_migrations', 'V*.sql'))):
+            run('psql', '-h', 'localhost', '-p', str(port), '-U', 'postgres', '-d', DATABASE,
+                '-v', 'ON_ERROR_STOP=1', '-q', '-f', path)
+
+    if not os.path.isdir(replica_dir):
+        run('pg_basebackup', '-h', 'localhost', '-p', str(port), '-U', 'postgres', '-D', replica_dir, '-R', '-X', 'stream')
+        with open(os.path.join(replica_dir, 'postgresql.conf'), 'a') as conf:
+            conf.write(f'\nport = {replica_port}\n')
+    run('pg_ctl', '-D', replica_dir, '-l', os.path.join(data_dir, 'replica.log'), '-w', 'start')
+
+    print(f'export DATABASE_URL={dsn(port)}')
+    print(f'export DATABASE_REPLICA_URL={dsn(replica_port)}')
+
+def down(data_dir: str) -> None:
+    for name in ('replica', 'primary'):
+        cluster = os.path.join(data_dir, name)
+        if os.path.isfile(os.path.join(cluster, 'postmaster.pid')):
+            run('pg_ctl', '-D', cluster, '-w', 'stop')
+
+def set_lag(data_dir: str, seconds: int) -> None:
+    replica_dir = os.path.join(data_dir, 'replica')
+    # На standby ALTER SYSTEM недоступен на части версий; последняя строка файла побеждает
+    with open(os.path.join(replica_dir, 'postgresql.auto.conf'), 'a') as conf:
+        conf.write(f"recovery_min_apply_delay = '{seconds}s'\n")
+    run('pg_ctl', '-D', replica_dir, 'reload')
+
+def status(port: int) -> None:
+    # Тот же расчёт отставания, что в api_router.ReplicaRouter.measure_lag
+    print(psql(port + 1, '''
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    '''))
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Локальная основная база и реплика')
+    parser.add_argument('--dir', default=os.path.join(ROOT_DIR, '.pg-local'))
+    parser.add_argument('--port', type=int, default=5432, help='порт основной базы; реплика на следующем')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('up')
+    sub.add_parser('down')
+    sub.add_parser('status', help='текущее отставание реплики, секунды')
+    lag = sub.add_parser('lag', help='задержка применения WAL на реплике')
+    lag.add_argument('seconds', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'up':
+        up(args.dir, args.port)
+    elif args.command == 'down':
+        down(args.dir)
+    elif args.command == 'lag':
+        set_lag(args.dir, args.seconds)
+    else:
+        status(args.port)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,422 @@
+"""
+Регрессии планов запросов функций: каждый запрос из обработчиков
+выполняется через EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) в транзакции,
+которая затем откатывается (пишущие запросы тоже безопасны).
+
+    DATABASE_URL=... python scripts/scale_data.py fill
+    DATABASE_URL=... python scripts/plan_check.py [--only orders.] [--show-plan] [--json]
+
+Проверка падает (код выхода 1), если:
+    - в плане есть Seq Scan по таблице больше --min-rows строк (по pg_class.reltuples),
+      кроме таблиц из allow_seq проверки;
+    - Execution Time больше budget_ms проверки, умноженного на --budget-scale.
+
+Параметры запросов берутся из данных: sample — запрос, первая строка
+которого становится параметрами проверяемого запроса. SQL повторяет
+запросы из backend/<функция>/index.py; при изменении запроса в обработчике
+его нужно обновить и здесь.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+PRODUCT_COLUMNS = '''
+    id, name, category, price, dosage, count, description,
+    emoji, rating, popular, in_stock, images, main_image,
+    about_description, about_usage, documents, videos,
+    composition_description, composition_table, recommendation_tags
+'''
+
+CHECKS: List[Dict[str, Any]] = [
+    {
+        'name': 'orders.list',
+        'sql': '''
+            SELECT id, order_number, customer_name, total_amount,
+                   status, payment_status, created_at
+            FROM orders ORDER BY created_at DESC LIMIT 50
+        ''',
+        'budget_ms': 20,
+    },
+    {
+        'name': 'orders.by_number',
+        'sql': '''
+            SELECT o.id, o.order_number, o.customer_name, o.customer_email,
+                   o.delivery_method, o.total_amount, o.status, o.payment_status,
+                   o.tracking_number, o.created_at
+            FROM order_lookup l
+            JOIN orders o ON o.id = l.order_id AND o.created_at = l.created_at
+            WHERE l.order_number = %s
+        ''',
+        'sample': 'SELECT order_number FROM order_lookup ORDER BY order_number DESC LIMIT 1',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'orders.history_email',
+        'sql': '''
+            SELECT id, order_number, customer_name, total_amount,
+                   status, payment_status, tracking_number, created_at
+            FROM orders
+            WHERE customer_email = %s
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        ''',
+        # Самый активный покупатель — худший случай для пагинации
+        'sample': '''
+            SELECT customer_email, 21 FROM orders
+            GROUP BY customer_email ORDER BY COUNT(*) DESC LIMIT 1
+        ''',
+        'budget_ms': 20,
+    },
+    {
+        'name': 'orders.history_phone_cursor',
+        'sql': '''
+            SELECT id, order_number, customer_name, total_amount,
+                   status, payment_status, tracking_number, created_at
+            FROM orders
+            WHERE customer_phone = %s AND (created_at, id) < (%s, %s)
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        ''',
+        'sample': '''
+            SELECT customer_phone, created_at, id, 21 FROM orders
+            WHERE customer_phone = (
+                SELECT customer_phone FROM orders GROUP BY customer_phone ORDER BY COUNT(*) DESC LIMIT 1
+            )
+            ORDER BY created_at DESC, id DESC OFFSET 20 LIMIT 1
+        ''',
+        'budget_ms': 20,
+    },
+    {
+        'name': 'orders.bulk_status',
+        'sql': '''
+            UPDATE orders AS o
+            SET status = COALESCE(v.status, o.status),
+                tracking_number = COALESCE(v.tracking_number, o.tracking_number),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES (%s::varchar, 'shipped'::varchar, 'TRK-PLAN'::varchar)) AS v(order_number, status, tracking_number)
+            JOIN order_lookup AS l ON l.order_number = v.order_number
+            JOIN orders AS prev ON prev.id = l.order_id AND prev.created_at = l.created_at
+            WHERE o.id = prev.id AND o.created_at = prev.created_at
+            RETURNING o.order_number, o.id, o.customer_email, prev.status, o.status, o.tracking_number
+        ''',
+        'sample': 'SELECT order_number FROM order_lookup ORDER BY order_number LIMIT 1',
+        'budget_ms': 20,
+    },
+    {
+        'name': 'products.by_id',
+        'sql': f'SELECT {PRODUCT_COLUMNS} FROM products WHERE id = %s',
+        'sample': 'SELECT MAX(id) FROM products',
+        'budget_ms': 5,
+    },
+    {
+        'name': 'products.by_category',
+        'sql': f'''
+            SELECT {PRODUCT_COLUMNS} FROM products
+            WHERE category = %s AND in_stock = true
+            ORDER BY popular DESC, rating DESC
+        ''',
+        'sample': 'SELECT category FROM products GROUP BY category ORDER BY COUNT(*) DESC LIMIT 1',
+        'budget_ms': 150,
+        # Категория отдаётся целиком; при крупной категории полный проход честнее индекса
+        'allow_seq': {'products'},
+    },
+    {
+        'name': 'products.catalog',
+        'sql': f'''
+            SELECT {PRODUCT_COLUMNS} FROM products
+            WHERE in_stock = true
+            ORDER BY popular DESC, rating DESC
+        ''',
+        'budget_ms': 1500,
+        # Обработчик отдаёт весь каталог в наличии: здесь следим только за бюджетом
+        'allow_seq': {'products'},
+    },
+    {
+        'name': 'products.catalog_version',
+        'sql': 'SELECT MAX(updated_at) FROM products',
+        'budget_ms': 5,
+    },
+    {
+        'name': 'page-builder.page_version',
+        'sql': '''
+            SELECT is_published, content_hash,
+                   CASE WHEN %s THEN (SELECT MAX(updated_at) FROM products) END
+            FROM pages WHERE slug = %s
+        ''',
+        'sample': 'SELECT TRUE, slug FROM pages ORDER BY id DESC LIMIT 1',
+        'budget_ms': 5,
+    },
+    {
+        'name': 'page-builder.page',
+        'sql': '''
+            SELECT id, slug, title, meta_description, is_published,
+                   blocks, styles, updated_at, version
+            FROM pages WHERE slug = %s
+        ''',
+        'sample': 'SELECT slug FROM pages ORDER BY id DESC LIMIT 1',
+        'budget_ms': 5,
+    },
+    {
+        'name': 'page-builder.pages',
+        'sql': '''
+            SELECT id, slug, title, is_published, updated_at
+            FROM pages ORDER BY updated_at DESC
+        ''',
+        'budget_ms': 50,
+        # Список страниц для админки отдаётся целиком
+        'allow_seq': {'pages'},
+    },
+    {
+        'name': 'page-builder.templates',
+        'sql': '''
+            SELECT id, name, category, preview_image, component_data, default_styles
+            FROM block_templates ORDER BY category, name
+        ''',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'survey.questions',
+        'sql': '''
+            SELECT id, category, question_text, question_type, options,
+                   placeholder, required, order_index, active
+            FROM survey_questions_v2
+            WHERE active = TRUE
+            ORDER BY category, order_index
+        ''',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'survey.user',
+        'sql': '''
+            SELECT u.id, u.name, u.email, u.gender, u.birth_date,
+                   s.id, s.goals, s.stage, s.completed, s.last_step, a.answers
+            FROM users u
+            LEFT JOIN LATERAL (
+                SELECT id, goals, stage, completed, last_step
+                FROM user_surveys
+                WHERE user_id = u.id
+                ORDER BY created_at DESC
+                LIMIT 1
+            ) s ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT COALESCE(
+                           jsonb_object_agg(question_id, COALESCE(answer_json, to_jsonb(answer_value))),
+                           '{}'::jsonb
+                       ) AS answers
+                FROM survey_answers
+                WHERE survey_id = s.id
+            ) a ON TRUE
+            WHERE u.email = %s
+        ''',
+        'sample': '''
+            SELECT u.email FROM users u JOIN user_surveys s ON s.user_id = u.id
+            WHERE s.stage = 2 ORDER BY s.id DESC LIMIT 1
+        ''',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'survey.progress',
+        'sql': '''
+            SELECT s.id, s.stage, s.completed, s.last_step,
+                   COALESCE(
+                       jsonb_object_agg(a.question_id, COALESCE(a.answer_json, to_jsonb(a.answer_value)))
+                           FILTER (WHERE a.question_id IS NOT NULL),
+                       '{}'::jsonb
+                   )
+            FROM user_surveys s
+            LEFT JOIN survey_answers a ON a.survey_id = s.id
+            WHERE s.id = %s
+            GROUP BY s.id
+        ''',
+        'sample': 'SELECT MAX(survey_id) FROM survey_answers',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'survey.features',
+        'sql': '''
+            SELECT s.user_id, s.goals, u.gender,
+                   COALESCE(
+                       jsonb_object_agg(a.question_id, COALESCE(a.answer_json, to_jsonb(a.answer_value)))
+                           FILTER (WHERE a.question_id IS NOT NULL),
+                       '{}'::jsonb
+                   )
+            FROM user_surveys s
+            JOIN users u ON u.id = s.user_id
+            LEFT JOIN survey_answers a ON a.survey_id = s.id
+            WHERE s.id = %s
+            GROUP BY s.id, u.id
+        ''',
+        'sample': 'SELECT MAX(survey_id) FROM survey_answers',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'sync-catalog.settings',
+        'sql': '''
+            SELECT id, sync_type, is_active, source_url, schedule_minutes,
+                   update_prices_only, last_sync_at, last_sync_status, settings
+            FROM sync_settings
+            ORDER BY id DESC
+        ''',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'sync-catalog.logs',
+        'sql': '''
+            SELECT id, sync_setting_id, started_at, finished_at, status,
+                   items_processed, items_added, items_updated, items_skipped, error_message
+            FROM sync_logs
+            ORDER BY started_at DESC LIMIT 50
+        ''',
+        'budget_ms': 10,
+    },
+    {
+        'name': 'sync-catalog.logs_by_setting',
+        'sql': '''
+            SELECT id, sync_setting_id, started_at, finished_at, status,
+                   items_processed, items_added, items_updated, items_skipped, error_message
+            FROM sync_logs
+            WHERE sync_setting_id = %s
+            ORDER BY started_at DESC LIMIT 50
+        ''',
+        'sample': 'SELECT sync_setting_id FROM sync_logs GROUP BY sync_setting_id ORDER BY COUNT(*) DESC LIMIT 1',
+        'budget_ms': 10,
+    },
+    {
+        # Выполняется на каждую строку источника: полный проход здесь умножается на размер выгрузки
+        'name': 'sync-catalog.match_product',
+        'sql': 'SELECT id FROM products WHERE LOWER(name) = LOWER(%s)',
+        'sample': 'SELECT UPPER(name) FROM products ORDER BY id DESC LIMIT 1',
+        'budget_ms': 5,
+    },
+    {
+        'name': 'sync-catalog.update_price',
+        'sql': '''
+            UPDATE products SET price = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE LOWER(name) = LOWER(%s)
+        ''',
+        'sample': 'SELECT price + 1, name FROM products ORDER BY id DESC LIMIT 1',
+        'budget_ms': 5,
+    },
+]
+
+def walk(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from walk(child)
+
+def table_rows(cur, relation: str, cache: Dict[str, float]) -> float:
+    if relation not in cache:
+        cur.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)', (relation,))
+        row = cur.fetchone()
+        cache[relation] = row[0] if row else 0
+    return cache[relation]
+
+def parent_table(cur, relation: str) -> str:
+    """Секция -> секционированная таблица (orders_p2026_01 -> orders)"""
+    cur.execute('''
+        SELECT p.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE c.oid = to_regclass(%s)
+    ''', (relation,))
+    row = cur.fetchone()
+    return row[0] if row else relation
+
+def run_check(conn, check: Dict[str, Any], min_rows: int, budget_scale: float,
+              rows_cache: Dict[str, float]) -> Dict[str, Any]:
+    cur = conn.cursor()
+    result = {'name': check['name'], 'problems': []}
+    try:
+        params = None
+        if check.get('sample'):
+            cur.execute(check['sample'])
+            params = cur.fetchone()
+            if not params or params[0] is None:
+                result['skipped'] = 'нет данных для параметров'
+                return result
+
+        cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + check['sql'], params)
+        explain = cur.fetchone()[0]
+        explain = explain[0] if isinstance(explain, list) else json.loads(explain)[0]
+        plan = explain['Plan']
+
+        result['ms'] = round(explain['Execution Time'], 3)
+        result['shared_hit'] = plan.get('Shared Hit Blocks', 0)
+        result['shared_read'] = plan.get('Shared Read Blocks', 0)
+        result['plan'] = plan
+
+        allowed = check.get('allow_seq', set())
+        for node in walk(plan):
+            if node['Node Type'] != 'Seq Scan':
+                continue
+            relation = node['Relation Name']
+            rows = table_rows(cur, relation, rows_cache)
+            if rows > min_rows and parent_table(cur, relation) not in allowed:
+                result['problems'].append(f'Seq Scan on {relation} (~{int(rows)} rows)')
+
+        budget = check['budget_ms'] * budget_scale
+        if result['ms'] > budget:
+            result['problems'].append(f'{result["ms"]} ms > budget {budget:g} ms')
+    finally:
+        # Пишущие запросы под ANALYZE выполняются по-настоящему: всё откатывается
+        conn.rollback()
+    return result
+
+def format_plan(plan: Dict[str, Any], depth: int = 0) -> List[str]:
+    relation = f' on {plan["Relation Name"]}' if 'Relation Name' in plan else ''
+    index = f' using {plan["Index Name"]}' if 'Index Name' in plan else ''
+    lines = [f'{"  " * depth}-> {plan["Node Type"]}{relation}{index}  '
+             f'rows={plan.get("Actual Rows")} time={plan.get("Actual Total Time")}']
+    for child in plan.get('Plans', []):
+        lines.extend(format_plan(child, depth + 1))
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Проверка планов запросов функций')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='по умолчанию DATABASE_URL')
+    parser.add_argument('--only', default='', help='префикс имени проверки, например orders.')
+    parser.add_argument('--min-rows', type=int, default=10000, help='Seq Scan по таблицам меньше этого не ошибка')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='множитель бюджетов времени')
+    parser.add_argument('--show-plan', action='store_true', help='печатать план упавших проверок')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error('нужен --dsn или DATABASE_URL')
+
+    conn = psycopg2.connect(args.dsn)
+    rows_cache: Dict[str, float] = {}
+    try:
+        results = [run_check(conn, check, args.min_rows, args.budget_scale, rows_cache)
+                   for check in CHECKS if check['name'].startswith(args.only)]
+    finally:
+        conn.close()
+
+    failed = [result for result in results if result['problems']]
+
+    if args.json:
+        print(json.dumps([{k: v for k, v in result.items() if k != 'plan'} for result in results],
+                         ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            if 'skipped' in result:
+                print(f'SKIP {result["name"]:<34} {result["skipped"]}')
+                continue
+            status = 'FAIL' if result['problems'] else 'ok'
+            print(f'{status:<4} {result["name"]:<34} {result["ms"]:10.3f} ms  '
+                  f'hit={result["shared_hit"]} read={result["shared_read"]}')
+            for problem in result['problems']:
+                print(f'       {problem}')
+            if result['problems'] and args.show_plan:
+                print('\n'.join('       ' + line for line in format_plan(result['plan'])))
+        print(f'{len(results) - len(failed)}/{len(results)} passed')
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,89 @@
+"""
+Сверка серверного подбора витаминов (backend/survey/recommendations.py)
+с клиентским (src/services/vitaminRecommendations.ts).
+
+    python scripts/recommendations_parity.py
+
+Проверка падает (код выхода 1), если:
+    - TAG_RULES отличаются от tagToRules клиента (теги, порядок правил, значения);
+    - V2_ANSWER_RULES ссылается на значение, которого нет в правилах;
+    - V2_ANSWER_RULES ссылается на вопрос или вариант ответа, которого нет
+      среди начальных вопросов второго этапа (V0010).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'survey'))
+
+from recommendations import TAG_RULES, V2_ANSWER_RULES, vocabulary  # noqa: E402
+
+TS_RULES_PATH = os.path.join(ROOT, 'src', 'services', 'vitaminRecommendations.ts')
+QUESTIONS_MIGRATION_PATH = os.path.join(ROOT, 'db_migrations', 'V0010__create_users_and_survey_responses.sql')
+
+TS_TOKEN = re.compile(r"'((?:[^'\\]|\\.)*)'|\b([A-Za-z_]\w*)\s*:")
+SEED_QUESTION = re.compile(r"^\('\w+', '([^']*)', '\w+', '(\{.*\})', \d+\)", re.MULTILINE)
+
+def ts_rules(source: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Объект tagToRules из исходника клиента, приведённый к JSON"""
+    match = re.search(r'const tagToRules: ProductRules = (\{.*?\n\});', source, re.DOTALL)
+    if not match:
+        raise ValueError('tagToRules не найден')
+
+    def to_json(token: re.Match) -> str:
+        if token.group(2) is not None:
+            return json.dumps(token.group(2)) + ':'
+        return json.dumps(token.group(1).replace("\\'", "'"), ensure_ascii=False)
+
+    return json.loads(TS_TOKEN.sub(to_json, match.group(1)))
+
+def seed_options(sql: str) -> Dict[str, List[str]]:
+    """Варианты ответов начальных вопросов второго этапа по тексту вопроса"""
+    return {
+        question: json.loads(options).get('options', [])
+        for question, options in SEED_QUESTION.findall(sql)
+    }
+
+def check(rules: Dict[str, List[Dict[str, Any]]], options: Dict[str, List[str]]) -> List[str]:
+    problems = []
+    for tag in sorted(set(rules) | set(TAG_RULES)):
+        if rules.get(tag) != TAG_RULES.get(tag):
+            problems.append(f'правила тега {tag} отличаются от клиента')
+
+    known = vocabulary()
+    for question, answers in V2_ANSWER_RULES.items():
+        if question not in options:
+            problems.append(f'вопроса нет в V0010: {question}')
+        for answer, values in answers.items():
+            if question in options and answer not in options[question]:
+                problems.append(f'варианта нет в V0010: {question} -> {answer}')
+            for value in values:
+                if value not in known:
+                    problems.append(f'значения нет в правилах: {question} -> {answer} -> {value}')
+    return problems
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Сверка правил подбора витаминов с клиентом')
+    parser.add_argument('--ts', default=TS_RULES_PATH, help='файл с tagToRules')
+    parser.add_argument('--migration', default=QUESTIONS_MIGRATION_PATH, help='миграция с вопросами второго этапа')
+    args = parser.parse_args(argv)
+
+    with open(args.ts, encoding='utf-8') as f:
+        rules = ts_rules(f.read())
+    with open(args.migration, encoding='utf-8') as f:
+        options = seed_options(f.read())
+
+    problems = check(rules, options)
+    for problem in problems:
+        print(f'FAIL {problem}')
+    print(f'Тегов: {len(rules)}, сопоставленных вопросов: {len(V2_ANSWER_RULES)}, ошибок: {len(problems)}')
+    if problems:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
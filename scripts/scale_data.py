@@ -0,0 +1,301 @@
+"""
+Генератор данных в масштабе продакшена для проверки планов запросов.
+Заполняет товары, заказы с реалистичным items, пользователей с анкетами
+и ответами, страницы и логи синхронизации прямо в SQL (generate_series),
+поэтому миллионы строк не гоняются через Python.
+
+    DATABASE_URL=... python scripts/scale_data.py fill --products 100000 --orders 5000000
+    DATABASE_URL=... python scripts/scale_data.py clean
+
+Сгенерированные строки помечены (SCALE_MARK в order_number, email,
+external_id, slug, source_url) и удаляются командой clean; данные миграций
+не трогаются. Заказы вставляются пачками по --batch строк, каждая пачка —
+отдельная транзакция; секции заказов за --months месяцев создаются заранее.
+После заполнения выполняется ANALYZE, чтобы планы сразу были честными.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+import psycopg2
+
+SCALE_MARK = 'scale'
+
+CATEGORIES = ['Витамины', 'Минералы', 'Омега', 'Пробиотики', 'Антиоксиданты', 'Аминокислоты',
+              'Коллаген', 'Для иммунитета', 'Для сна', 'Для суставов', 'Спортивное питание', 'Детям']
+EMOJIS = ['💊', '🐟', '☀️', '🍊', '🌿', '🦴', '💪', '🧠', '😴', '🛡️']
+TAGS = ['vitamin_d3', 'omega_3', 'magnesium', 'zinc', 'iron', 'vitamin_c', 'b_complex', 'probiotic', 'collagen']
+
+def elapsed(started: float) -> str:
+    return f'{time.perf_counter() - started:.1f}s'
+
+def fill_products(cur, count: int) -> None:
+    cur.execute('''
+        INSERT INTO products (
+            name, category, price, dosage, count, description, emoji, rating,
+            popular, in_stock, external_id, recommendation_tags, created_at, updated_at
+        )
+        SELECT format('%%s %%s мг №%%s', (%(categories)s::text[])[1 + g %% array_length(%(categories)s::text[], 1)],
+                      (50 + g %% 950), g),
+               (%(categories)s::text[])[1 + g %% array_length(%(categories)s::text[], 1)],
+               (199 + random() * 4800)::int,
+               (50 + g %% 950) || ' мг',
+               (30 * (1 + g %% 6)) || ' капсул',
+               'Сгенерированный товар для нагрузочных проверок',
+               (%(emojis)s::text[])[1 + g %% array_length(%(emojis)s::text[], 1)],
+               round((3 + random() * 2)::numeric, 2),
+               random() < 0.05,
+               random() < 0.9,
+               %(mark)s || ':' || g,
+               jsonb_build_array((%(tags)s::text[])[1 + g %% array_length(%(tags)s::text[], 1)]),
+               ts, ts + random() * (now() - ts)
+        FROM generate_series(1, %(count)s) AS g,
+             LATERAL (SELECT now() - random() * INTERVAL '2 years' + g * INTERVAL '0') AS t(ts)
+    ''', {'count': count, 'categories': CATEGORIES, 'emojis': EMOJIS, 'tags': TAGS, 'mark': SCALE_MARK})
+
+def fill_users(cur, count: int) -> None:
+    """Пользователи, анкеты (у части по две) и ответы на активные вопросы второго этапа"""
+    cur.execute('''
+        INSERT INTO users (name, email, gender, birth_date, created_at)
+        SELECT 'Покупатель ' || g,
+               'user' || g || '@' || %(mark)s || '.test',
+               CASE WHEN g %% 2 = 0 THEN 'female' ELSE 'male' END,
+               DATE '1960-01-01' + (random() * 16000)::int,
+               now() - random() * INTERVAL '2 years' + g * INTERVAL '0'
+        FROM generate_series(1, %(count)s) AS g
+    ''', {'count': count, 'mark': SCALE_MARK})
+
+    cur.execute('''
+        INSERT INTO user_surveys (user_id, goals, stage, completed, last_step, created_at, updated_at)
+        SELECT u.id,
+               (ARRAY['energy', 'immunity', 'sleep', 'beauty', 'sport'])[1 + u.id %% 5 : 1 + u.id %% 5 + n.k %% 3],
+               CASE WHEN r < 0.3 THEN 1 ELSE 2 END,
+               r >= 0.45,
+               CASE WHEN r BETWEEN 0.3 AND 0.45 THEN 'lifestyle' END,
+               u.created_at + n.k * INTERVAL '30 days',
+               u.created_at + n.k * INTERVAL '30 days'
+        FROM users u
+        CROSS JOIN LATERAL generate_series(0, CASE WHEN u.id %% 10 = 0 THEN 1 ELSE 0 END) AS n(k)
+        CROSS JOIN LATERAL (SELECT random() + u.id * 0) AS x(r)
+        WHERE u.email LIKE %(pattern)s
+    ''', {'pattern': f'%@{SCALE_MARK}.test'})
+
+    # Ответы только у анкет второго этапа; выбор варианта — из options вопроса
+    cur.execute('''
+        INSERT INTO survey_answers (survey_id, question_id, answer_value, answer_json)
+        SELECT s.id, q.id,
+               CASE
+                   WHEN q.question_type = 'number' THEN
+                       (COALESCE((q.options->>'min')::int, 0)
+                        + random() * (COALESCE((q.options->>'max')::int, 100) - COALESCE((q.options->>'min')::int, 0)))::int::text
+                   WHEN q.question_type = 'single_choice' THEN
+                       q.options->'options'->>((s.id + q.id) %% GREATEST(jsonb_array_length(q.options->'options'), 1))
+                   WHEN q.question_type = 'multiple_choice' THEN NULL
+                   ELSE 'ответ ' || s.id
+               END,
+               CASE WHEN q.question_type = 'multiple_choice' THEN
+                   jsonb_build_array(q.options->'options'->((s.id + q.id) %% GREATEST(jsonb_array_length(q.options->'options'), 1)))
+               END
+        FROM user_surveys s
+        JOIN users u ON u.id = s.user_id AND u.email LIKE %(pattern)s
+        CROSS JOIN survey_questions_v2 q
+        WHERE s.stage = 2 AND q.active AND random() < 0.85
+    ''', {'pattern': f'%@{SCALE_MARK}.test'})
+
+def ensure_partitions(cur, months: int) -> None:
+    cur.execute('''
+        SELECT create_orders_partition((date_trunc('month', CURRENT_DATE) - make_interval(months => m))::date)
+        FROM generate_series(0, %s) AS m
+    ''', (months,))
+    cur.execute('SELECT ensure_orders_partitions(3)')
+
+def fill_orders(conn, count: int, users: int, months: int, batch: int) -> None:
+    """Заказы пачками; items — 1-4 существующих товара с ценой и количеством, total_amount сходится с items"""
+    cur = conn.cursor()
+    cur.execute('SELECT MIN(id), MAX(id) FROM products')
+    low, high = cur.fetchone()
+    if low is None:
+        raise SystemExit('products пуста: сначала --products')
+
+    for start in range(1, count + 1, batch):
+        stop = min(start + batch - 1, count)
+        started = time.perf_counter()
+        cur.execute('''
+            INSERT INTO orders (
+                order_number, customer_name, customer_email, customer_phone,
+                delivery_method, delivery_address, delivery_city, delivery_postal_code,
+                total_amount, status, payment_status, tracking_number, items, created_at, updated_at
+            )
+            SELECT upper(%(mark)s) || '-' || g,
+                   'Покупатель ' || c.n,
+                   'user' || c.n || '@' || %(mark)s || '.test',
+                   '+7900' || lpad(c.n::text, 7, '0'),
+                   (ARRAY['courier', 'pickup', 'post'])[1 + g %% 3],
+                   'ул. Тестовая, ' || (g %% 200),
+                   (ARRAY['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург'])[1 + g %% 5],
+                   lpad((100000 + g %% 900000)::text, 6, '0'),
+                   COALESCE(i.total, 0),
+                   (ARRAY['pending', 'confirmed', 'shipped', 'delivered', 'delivered', 'delivered', 'cancelled'])[1 + g %% 7],
+                   (ARRAY['pending', 'paid', 'paid', 'paid', 'refunded'])[1 + g %% 5],
+                   CASE WHEN g %% 7 IN (2, 3, 4, 5) THEN 'TRK' || g END,
+                   COALESCE(i.items, '[]'::jsonb),
+                   t.ts, t.ts
+            FROM generate_series(%(start)s, %(stop)s) AS g
+            CROSS JOIN LATERAL (
+                -- Покупатели неравномерны: у малой части пользователей большинство заказов
+                SELECT 1 + floor(power(random(), 3) * %(users)s)::int + g * 0
+            ) AS c(n)
+            CROSS JOIN LATERAL (
+                SELECT now() - random() * make_interval(months => %(months)s) + g * INTERVAL '0'
+            ) AS t(ts)
+            CROSS JOIN LATERAL (
+                SELECT jsonb_agg(jsonb_build_object(
+                           'id', p.id, 'name', p.name, 'price', p.price,
+                           'quantity', q.quantity, 'emoji', p.emoji
+                       )),
+                       SUM(p.price * q.quantity)
+                FROM generate_series(1, 1 + g %% 4) AS k
+                CROSS JOIN LATERAL (
+                    SELECT %(low)s + floor(random() * (%(high)s - %(low)s + 1))::int + k * 0,
+                           1 + floor(random() * 3)::int
+                ) AS q(product_id, quantity)
+                JOIN products p ON p.id = q.product_id
+            ) AS i(items, total)
+        ''', {'mark': SCALE_MARK, 'start': start, 'stop': stop, 'users': max(users, 1),
+              'months': months, 'low': low, 'high': high})
+        conn.commit()
+        print(f'  orders {stop}/{count} ({elapsed(started)})', file=sys.stderr)
+
+def fill_pages(cur, count: int) -> None:
+    cur.execute('''
+        INSERT INTO pages (slug, title, meta_description, is_published, blocks, created_at, updated_at)
+        SELECT %(mark)s || '-page-' || g,
+               'Страница ' || g,
+               'Сгенерированная страница',
+               g %% 3 <> 0,
+               jsonb_build_array(
+                   jsonb_build_object('id', 'hero-' || g, 'type', 'hero', 'content', jsonb_build_object('title', 'Страница ' || g)),
+                   jsonb_build_object('id', 'text-' || g, 'type', 'text', 'content', jsonb_build_object('text', repeat('текст ', 50)))
+               ),
+               ts, ts + random() * (now() - ts)
+        FROM generate_series(1, %(count)s) AS g,
+             LATERAL (SELECT now() - random() * INTERVAL '2 years' + g * INTERVAL '0') AS t(ts)
+    ''', {'count': count, 'mark': SCALE_MARK})
+
+def fill_sync_logs(cur, count: int, settings: int = 5) -> None:
+    cur.execute('''
+        INSERT INTO sync_settings (sync_type, is_active, source_url, update_prices_only)
+        SELECT CASE WHEN g %% 2 = 0 THEN 'google_sheets' ELSE 'website' END,
+               FALSE, %(mark)s || '://source/' || g, g %% 3 = 0
+        FROM generate_series(1, %(settings)s) AS g
+        RETURNING id
+    ''', {'settings': settings, 'mark': SCALE_MARK})
+    setting_ids = [row[0] for row in cur.fetchall()]
+
+    cur.execute('''
+        INSERT INTO sync_logs (
+            sync_setting_id, started_at, finished_at, status,
+            items_processed, items_added, items_updated, items_skipped, error_message
+        )
+        SELECT (%(ids)s::int[])[1 + g %% array_length(%(ids)s::int[], 1)],
+               ts, ts + random() * INTERVAL '5 minutes',
+               CASE WHEN g %% 20 = 0 THEN 'error' ELSE 'success' END,
+               p, p / 10, p - p / 10 - p / 50, p / 50,
+               CASE WHEN g %% 20 = 0 THEN 'HTTP Error 503: Service Unavailable' END
+        FROM generate_series(1, %(count)s) AS g,
+             LATERAL (SELECT now() - g * INTERVAL '1 hour', (random() * 500)::int) AS t(ts, p)
+    ''', {'count': count, 'ids': setting_ids})
+
+def analyze(cur) -> None:
+    for table in ('products', 'orders', 'order_lookup', 'users', 'user_surveys', 'survey_answers',
+                  'pages', 'sync_settings', 'sync_logs'):
+        cur.execute(f'ANALYZE {table}')
+
+def fill(conn, args) -> None:
+    cur = conn.cursor()
+    steps = [
+        ('products', args.products, lambda: fill_products(cur, args.products)),
+        ('users', args.users, lambda: fill_users(cur, args.users)),
+        ('pages', args.pages, lambda: fill_pages(cur, args.pages)),
+        ('sync_logs', args.sync_logs, lambda: fill_sync_logs(cur, args.sync_logs)),
+    ]
+    for name, count, step in steps:
+        if count:
+            started = time.perf_counter()
+            step()
+            conn.commit()
+            print(f'{name}: {count} ({elapsed(started)})', file=sys.stderr)
+
+    if args.orders:
+        started = time.perf_counter()
+        ensure_partitions(cur, args.months)
+        conn.commit()
+        fill_orders(conn, args.orders, args.users, args.months, args.batch)
+        print(f'orders: {args.orders} ({elapsed(started)})', file=sys.stderr)
+
+    analyze(cur)
+    conn.commit()
+
+def clean(conn) -> None:
+    """Удаляет только помеченные строки; триггеры поддерживают order_lookup и счётчики аналитики"""
+    cur = conn.cursor()
+    email = f'%@{SCALE_MARK}.test'
+    statements = [
+        ('orders', 'DELETE FROM orders WHERE order_number LIKE %s', (f'{SCALE_MARK.upper()}-%',)),
+        ('survey_answers', '''
+            DELETE FROM survey_answers a USING user_surveys s, users u
+            WHERE a.survey_id = s.id AND s.user_id = u.id AND u.email LIKE %s
+        ''', (email,)),
+        ('recommendations_history', '''
+            DELETE FROM recommendations_history h USING users u
+            WHERE h.user_id = u.id AND u.email LIKE %s
+        ''', (email,)),
+        ('user_surveys', 'DELETE FROM user_surveys s USING users u WHERE s.user_id = u.id AND u.email LIKE %s', (email,)),
+        ('users', 'DELETE FROM users WHERE email LIKE %s', (email,)),
+        ('sync_logs', '''
+            DELETE FROM sync_logs l USING sync_settings s
+            WHERE l.sync_setting_id = s.id AND s.source_url LIKE %s
+        ''', (f'{SCALE_MARK}://%',)),
+        ('sync_settings', 'DELETE FROM sync_settings WHERE source_url LIKE %s', (f'{SCALE_MARK}://%',)),
+        ('pages', 'DELETE FROM pages WHERE slug LIKE %s', (f'{SCALE_MARK}-page-%',)),
+        ('products', 'DELETE FROM products WHERE external_id LIKE %s', (f'{SCALE_MARK}:%',)),
+    ]
+    for name, sql, params in statements:
+        cur.execute(sql, params)
+        print(f'{name}: -{cur.rowcount}', file=sys.stderr)
+        conn.commit()
+    analyze(cur)
+    conn.commit()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Данные в масштабе продакшена для проверки планов')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='по умолчанию DATABASE_URL')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fill_parser = sub.add_parser('fill')
+    fill_parser.add_argument('--products', type=int, default=100000)
+    fill_parser.add_argument('--orders', type=int, default=5000000)
+    fill_parser.add_argument('--users', type=int, default=200000, help='пользователи с анкетами; они же покупатели')
+    fill_parser.add_argument('--pages', type=int, default=2000)
+    fill_parser.add_argument('--sync-logs', type=int, default=100000)
+    fill_parser.add_argument('--months', type=int, default=24, help='глубина истории заказов')
+    fill_parser.add_argument('--batch', type=int, default=250000, help='заказов в одной транзакции')
+    sub.add_parser('clean', help='удалить сгенерированные строки')
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error('нужен --dsn или DATABASE_URL')
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if args.command == 'fill':
+            fill(conn, args)
+        else:
+            clean(conn)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
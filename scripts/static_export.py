@@ -0,0 +1,276 @@
+"""
+Инкрементальная выгрузка статических снимков для CDN: опубликованные страницы
+и срезы каталога в виде готового JSON (тот же формат, что отдают функции),
+при желании ещё и HTML для страниц.
+
+    DATABASE_URL=... python scripts/static_export.py --out dist-static [--html]
+
+Структура выгрузки:
+    pages/{slug}.json               ответ page-builder ?resource=pages&slug=
+    pages/{slug}.html               (с --html) пререндер заголовков блоков
+    products/{id}.json              ответ products ?id=
+    catalog/all.json                ответ products без параметров
+    catalog/category/{name}.json    ответ products ?category=
+    manifest.json                   хеши содержимого и версии источников
+
+Опубликованные страницы без замороженного документа (созданные до V0015 и
+ещё не открытые через функцию) замораживаются здесь же в том же формате.
+
+Повторный запуск перечитывает только изменившиеся страницы (по content_hash)
+и товары (по updated_at) и перезаписывает только файлы с новым хешем.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import psycopg2
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+PRODUCT_COLUMNS = '''
+    id, name, category, price, dosage, count, description,
+    emoji, rating, popular, in_stock, images, main_image,
+    about_description, about_usage, documents, videos,
+    composition_description, composition_table, recommendation_tags, updated_at
+'''
+
+def product_to_dict(row) -> Dict[str, Any]:
+    """Тот же формат товара, что у функции products"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'category': row[2],
+        'price': row[3],
+        'dosage': row[4],
+        'count': row[5],
+        'description': row[6],
+        'emoji': row[7],
+        'rating': float(row[8]) if row[8] else 0,
+        'popular': row[9],
+        'inStock': row[10],
+        'images': row[11] if row[11] else [],
+        'mainImage': row[12],
+        'aboutDescription': row[13],
+        'aboutUsage': row[14],
+        'documents': row[15] if row[15] else [],
+        'videos': row[16] if row[16] else [],
+        'compositionDescription': row[17],
+        'compositionTable': row[18] if row[18] else [],
+        'recommendation_tags': row[19] if row[19] else []
+    }
+
+def page_to_dict(row) -> Dict[str, Any]:
+    """Тот же формат страницы, что у функции page-builder"""
+    return {
+        'id': row[0],
+        'slug': row[1],
+        'title': row[2],
+        'metaDescription': row[3],
+        'isPublished': row[4],
+        'blocks': row[5],
+        'styles': row[6],
+        'updatedAt': row[7].isoformat(),
+        'version': row[8]
+    }
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def render_html(page: Dict[str, Any], document: str) -> str:
+    """Простой пререндер: мета-теги, заголовки блоков и встроенный JSON для гидрации на клиенте"""
+    sections = []
+    for block in page.get('blocks') or []:
+        content = block.get('content') if isinstance(block.get('content'), dict) else block
+        title = content.get('title')
+        subtitle = content.get('subtitle')
+        parts = [f'<section data-block="{html.escape(str(block.get("id", "")))}">']
+        if title:
+            parts.append(f'<h2>{html.escape(str(title))}</h2>')
+        if subtitle:
+            parts.append(f'<p>{html.escape(str(subtitle))}</p>')
+        parts.append('</section>')
+        sections.append(''.join(parts))
+
+    embedded = document.replace('</', '<\\/')
+    return (
+        '<!DOCTYPE html>\n<html lang="ru">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{html.escape(page.get("title") or "")}</title>\n'
+        f'<meta name="description" content="{html.escape(page.get("metaDescription") or "")}">\n'
+        '</head>\n<body>\n' + '\n'.join(sections) + '\n'
+        f'<script id="page-data" type="application/json">{embedded}</script>\n'
+        '</body>\n</html>\n'
+    )
+
+class Exporter:
+    def __init__(self, out_dir: str, with_html: bool):
+        self.out_dir = out_dir
+        self.with_html = with_html
+        self.manifest_path = os.path.join(out_dir, 'manifest.json')
+        self.manifest: Dict[str, Any] = {'files': {}, 'pages': {}, 'products': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest.update(json.load(f))
+        self.seen: set = set()
+        self.stats = {'written': 0, 'unchanged': 0, 'removed': 0, 'frozen': 0}
+
+    def resolve(self, path: str) -> Optional[str]:
+        """Полный путь файла выгрузки или None, если путь выходит за out_dir (например, slug с ../)"""
+        out_dir = os.path.abspath(self.out_dir)
+        full_path = os.path.abspath(os.path.join(out_dir, path))
+        if os.path.commonpath([out_dir, full_path]) != out_dir:
+            print(f'skip {path}: outside {self.out_dir}', file=sys.stderr)
+            return None
+        return full_path
+
+    def write(self, path: str, text: str) -> None:
+        """Пишет файл, только если хеш содержимого изменился"""
+        full_path = self.resolve(path)
+        if full_path is None:
+            return
+        self.seen.add(path)
+        digest = content_hash(text)
+        if self.manifest['files'].get(path) == digest and os.path.exists(full_path):
+            self.stats['unchanged'] += 1
+            return
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = full_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, full_path)
+        self.manifest['files'][path] = digest
+        self.stats['written'] += 1
+
+    def keep(self, path: str) -> None:
+        self.seen.add(path)
+        self.stats['unchanged'] += 1
+
+    def freeze_pages(self, cur) -> None:
+        """Замораживает опубликованные страницы без документа (созданные до V0015 и ни разу не
+        открытые через функцию) так же, как page-builder: json.dumps({'page': ...}) и его sha256"""
+        cur.execute('''
+            SELECT id, slug, title, meta_description, is_published,
+                   blocks, styles, updated_at, version
+            FROM pages WHERE is_published = true AND content_hash IS NULL
+        ''')
+        for row in cur.fetchall():
+            document = json.dumps({'page': page_to_dict(row)})
+            # Функция могла заморозить страницу параллельно: её документ не перезаписываем
+            cur.execute('''
+                UPDATE pages SET render_document = %s, content_hash = %s
+                WHERE id = %s AND content_hash IS NULL
+            ''', (document, content_hash(document), row[0]))
+            self.stats['frozen'] += cur.rowcount
+        cur.connection.commit()
+
+    def export_pages(self, cur) -> None:
+        self.freeze_pages(cur)
+        cur.execute('SELECT slug, content_hash FROM pages WHERE is_published = true AND content_hash IS NOT NULL')
+        current = dict(cur.fetchall())
+        previous = self.manifest['pages']
+        changed = [
+            slug for slug, digest in current.items()
+            if previous.get(slug) != digest
+            or (self.with_html and f'pages/{slug}.html' not in self.manifest['files'])
+        ]
+
+        for slug in current:
+            if slug not in changed:
+                self.keep(f'pages/{slug}.json')
+                if self.with_html:
+                    self.keep(f'pages/{slug}.html')
+
+        if changed:
+            cur.execute('SELECT slug, render_document FROM pages WHERE slug = ANY(%s)', (changed,))
+            for slug, document in cur.fetchall():
+                self.write(f'pages/{slug}.json', document)
+                if self.with_html:
+                    self.write(f'pages/{slug}.html', render_html(json.loads(document)['page'], document))
+
+        self.manifest['pages'] = current
+
+    def export_catalog(self, cur) -> None:
+        cur.execute('SELECT id, updated_at FROM products')
+        current = {str(row[0]): row[1].isoformat() if row[1] else '' for row in cur.fetchall()}
+        previous = self.manifest['products']
+        changed = [int(pid) for pid, stamp in current.items() if previous.get(pid) != stamp]
+        changed_set = set(changed)
+
+        for pid in current:
+            if int(pid) not in changed_set:
+                self.keep(f'products/{pid}.json')
+
+        if changed or set(previous) != set(current):
+            if changed:
+                cur.execute(f'SELECT {PRODUCT_COLUMNS} FROM products WHERE id = ANY(%s)', (changed,))
+                for row in cur.fetchall():
+                    self.write(f'products/{row[0]}.json', json.dumps({'product': product_to_dict(row)}))
+
+            cur.execute(f'''
+                SELECT {PRODUCT_COLUMNS} FROM products
+                WHERE in_stock = true
+                ORDER BY popular DESC, rating DESC
+            ''')
+            catalog = [product_to_dict(row) for row in cur.fetchall()]
+            self.write('catalog/all.json', json.dumps({'products': catalog}))
+
+            categories: Dict[str, List[Dict[str, Any]]] = {}
+            for product in catalog:
+                categories.setdefault(product['category'] or '', []).append(product)
+            for category, products in categories.items():
+                if category:
+                    self.write(f'catalog/category/{quote(category, safe="")}.json', json.dumps({'products': products}))
+        else:
+            for path in self.manifest['files']:
+                if path.startswith('catalog/'):
+                    self.keep(path)
+
+        self.manifest['products'] = current
+
+    def remove_stale(self) -> None:
+        """Удаляет файлы страниц и товаров, которых больше нет в источнике"""
+        for path in [p for p in self.manifest['files'] if p not in self.seen]:
+            full_path = self.resolve(path)
+            if full_path is not None and os.path.exists(full_path):
+                os.remove(full_path)
+            del self.manifest['files'][path]
+            self.stats['removed'] += 1
+
+    def save_manifest(self) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+def run(conn, out_dir: str, with_html: bool = False) -> Dict[str, int]:
+    exporter = Exporter(out_dir, with_html)
+    cur = conn.cursor()
+    try:
+        exporter.export_pages(cur)
+        exporter.export_catalog(cur)
+    finally:
+        cur.close()
+        conn.rollback()
+    exporter.remove_stale()
+    exporter.save_manifest()
+    return exporter.stats
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Статическая выгрузка страниц и каталога')
+    parser.add_argument('--out', default='dist-static')
+    parser.add_argument('--html', action='store_true', help='дополнительно рендерить HTML страниц')
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        print(json.dumps(run(conn, args.out, args.html)))
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
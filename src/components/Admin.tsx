@@ -7,6 +7,7 @@ import AdminProductsTab from '@/components/admin/AdminProductsTab';
 import AdminOrdersTab from '@/components/admin/AdminOrdersTab';
 import AdminSurveyTab from '@/components/admin/AdminSurveyTab';
 import AdminSyncTab from '@/components/admin/AdminSyncTab';
+import { API_URLS, apiFetch } from '@/config/api';
 
 interface AdminProps {
   onBack: () => void;
@@ -97,7 +98,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const loadProducts = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417');
+      const response = await apiFetch(API_URLS.products);
       const data = await response.json();
       setProducts(data.products || []);
     } catch (error) {
@@ -107,7 +108,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const loadOrders = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/5aa25205-978b-47a8-8f24-80c19fa25511');
+      const response = await apiFetch(API_URLS.orders);
       const data = await response.json();
       setOrders(data.orders || []);
     } catch (error) {
@@ -117,7 +118,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const loadQuestions = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/a6d2ac27-1d35-4daa-b1e5-e9bbe2ad3a31?action=questions&includeInactive=true');
+      const response = await apiFetch(`${API_URLS.survey}?action=questions&includeInactive=true`);
       const data = await response.json();
       const mappedQuestions = (data.questions || []).map((q: any) => ({
         id: q.id,
@@ -137,7 +138,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const loadSyncSettings = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731?resource=settings');
+      const response = await apiFetch(`${API_URLS.syncCatalog}?resource=settings`);
       const data = await response.json();
       setSyncSettings(data.settings || []);
     } catch (error) {
@@ -147,7 +148,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const loadSyncLogs = async (settingId: number) => {
     try {
-      const response = await fetch(`https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731?resource=logs&setting_id=${settingId}`);
+      const response = await apiFetch(`${API_URLS.syncCatalog}?resource=logs&setting_id=${settingId}`);
       const data = await response.json();
       setSyncLogs(data.logs || []);
     } catch (error) {
@@ -161,7 +162,7 @@ const Admin = ({ onBack }: AdminProps) => {
     setLoading(true);
     try {
       const method = editingProduct.id ? 'PUT' : 'POST';
-      const response = await fetch('https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417', {
+      const response = await apiFetch(API_URLS.products, {
         method,
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(editingProduct)
@@ -185,7 +186,7 @@ const Admin = ({ onBack }: AdminProps) => {
     if (!confirm('Удалить товар?')) return;
 
     try {
-      await fetch(`https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417?id=${id}`, {
+      await apiFetch(`${API_URLS.products}?id=${id}`, {
         method: 'DELETE'
       });
       loadProducts();
@@ -216,7 +217,7 @@ const Admin = ({ onBack }: AdminProps) => {
         active: editingQuestion.isActive
       };
 
-      const response = await fetch('https://functions.poehali.dev/a6d2ac27-1d35-4daa-b1e5-e9bbe2ad3a31?action=questions', {
+      const response = await apiFetch(`${API_URLS.survey}?action=questions`, {
         method,
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(body)
@@ -243,7 +244,7 @@ const Admin = ({ onBack }: AdminProps) => {
     if (!confirm('Удалить вопрос?')) return;
 
     try {
-      await fetch(`https://functions.poehali.dev/a6d2ac27-1d35-4daa-b1e5-e9bbe2ad3a31?action=questions&id=${id}`, {
+      await apiFetch(`${API_URLS.survey}?action=questions&id=${id}`, {
         method: 'DELETE'
       });
       loadQuestions();
@@ -261,44 +262,17 @@ const Admin = ({ onBack }: AdminProps) => {
     if (direction === 'down' && index === sortedQuestions.length - 1) return;
 
     const newIndex = direction === 'up' ? index - 1 : index + 1;
-    const currentQ = sortedQuestions[index];
-    const swapQ = sortedQuestions[newIndex];
+    const reordered = [...sortedQuestions];
+    [reordered[index], reordered[newIndex]] = [reordered[newIndex], reordered[index]];
 
     try {
-      // Swap order_index values
-      const response1 = await fetch('https://functions.poehali.dev/a6d2ac27-1d35-4daa-b1e5-e9bbe2ad3a31?action=questions', {
+      const response = await apiFetch(`${API_URLS.survey}?action=reorder`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ 
-          id: currentQ.id, 
-          category: 'general',
-          question_text: currentQ.questionText,
-          question_type: currentQ.questionType,
-          options: currentQ.options && currentQ.options.length > 0 ? { choices: currentQ.options } : {},
-          placeholder: '',
-          required: currentQ.isRequired,
-          order_index: swapQ.displayOrder,
-          active: currentQ.isActive
-        })
+        body: JSON.stringify({ ids: reordered.map(q => q.id) })
       });
 
-      const response2 = await fetch('https://functions.poehali.dev/a6d2ac27-1d35-4daa-b1e5-e9bbe2ad3a31?action=questions', {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ 
-          id: swapQ.id,
-          category: 'general',
-          question_text: swapQ.questionText,
-          question_type: swapQ.questionType,
-          options: swapQ.options && swapQ.options.length > 0 ? { choices: swapQ.options } : {},
-          placeholder: '',
-          required: swapQ.isRequired,
-          order_index: currentQ.displayOrder,
-          active: swapQ.isActive
-        })
-      });
-
-      if (response1.ok && response2.ok) {
+      if (response.ok) {
         loadQuestions();
       } else {
         alert('Ошибка при изменении порядка');
@@ -315,7 +289,7 @@ const Admin = ({ onBack }: AdminProps) => {
     setLoading(true);
     try {
       const method = editingSyncSetting.id ? 'PUT' : 'POST';
-      const response = await fetch('https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731', {
+      const response = await apiFetch(API_URLS.syncCatalog, {
         method,
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(editingSyncSetting)
@@ -338,7 +312,7 @@ const Admin = ({ onBack }: AdminProps) => {
   const handleRunSync = async (settingId: number) => {
     setLoading(true);
     try {
-      const response = await fetch('https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731?action=sync', {
+      const response = await apiFetch(`${API_URLS.syncCatalog}?action=sync`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ settingId })
@@ -362,7 +336,7 @@ const Admin = ({ onBack }: AdminProps) => {
 
   const handleToggleSyncActive = async (setting: SyncSetting) => {
     try {
-      await fetch('https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731', {
+      await apiFetch(API_URLS.syncCatalog, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ id: setting.id, isActive: !setting.isActive })
@@ -377,7 +351,7 @@ const Admin = ({ onBack }: AdminProps) => {
     if (!confirm('Отключить эту синхронизацию?')) return;
 
     try {
-      await fetch(`https://functions.poehali.dev/7b036231-df88-4c5e-adc8-37faa7e68731?id=${id}`, {
+      await apiFetch(`${API_URLS.syncCatalog}?id=${id}`, {
         method: 'DELETE'
       });
       loadSyncSettings();
@@ -5,6 +5,7 @@ import { Badge } from '@/components/ui/badge';
 import { Input } from '@/components/ui/input';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import Icon from '@/components/ui/icon';
+import { API_URLS, apiFetch } from '@/config/api';
 
 interface CatalogProps {
   onBack: () => void;
@@ -39,7 +40,7 @@ const Catalog = ({ onBack, onProductClick, onCheckout }: CatalogProps) => {
 
   const loadProducts = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417');
+      const response = await apiFetch(API_URLS.products);
       const data = await response.json();
       setProducts(data.products || []);
     } catch (error) {
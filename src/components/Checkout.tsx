@@ -6,6 +6,7 @@ import { Label } from '@/components/ui/label';
 import { RadioGroup, RadioGroupItem } from '@/components/ui/radio-group';
 import Icon from '@/components/ui/icon';
 import { SurveyData } from '@/pages/Index';
+import { API_URLS, apiFetch } from '@/config/api';
 
 interface CheckoutProps {
   items: Array<{
@@ -85,7 +86,7 @@ const Checkout = ({ items, surveyData, onBack, onSuccess }: CheckoutProps) => {
     setLoading(true);
     
     try {
-      const response = await fetch('https://functions.poehali.dev/5aa25205-978b-47a8-8f24-80c19fa25511', {
+      const response = await apiFetch(API_URLS.orders, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -9,6 +9,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Badge } from '@/components/ui/badge';
 import { Switch } from '@/components/ui/switch';
 import Icon from '@/components/ui/icon';
+import { API_URLS, apiFetch } from '@/config/api';
 
 interface PageBuilderProps {
   onBack: () => void;
@@ -45,7 +46,7 @@ const PageBuilder = ({ onBack }: PageBuilderProps) => {
 
   const loadPages = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/91d2a680-560a-4c90-8c01-c525dfc2e2b5?resource=pages');
+      const response = await apiFetch(`${API_URLS.pageBuilder}?resource=pages`);
       const data = await response.json();
       setPages(data.pages || []);
     } catch (error) {
@@ -55,7 +56,7 @@ const PageBuilder = ({ onBack }: PageBuilderProps) => {
 
   const loadTemplates = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/91d2a680-560a-4c90-8c01-c525dfc2e2b5?resource=templates');
+      const response = await apiFetch(`${API_URLS.pageBuilder}?resource=templates`);
       const data = await response.json();
       setTemplates(data.templates || []);
     } catch (error) {
@@ -65,7 +66,7 @@ const PageBuilder = ({ onBack }: PageBuilderProps) => {
 
   const handleSelectPage = async (slug: string) => {
     try {
-      const response = await fetch(`https://functions.poehali.dev/91d2a680-560a-4c90-8c01-c525dfc2e2b5?resource=pages&slug=${slug}`);
+      const response = await apiFetch(`${API_URLS.pageBuilder}?resource=pages&slug=${slug}`);
       const data = await response.json();
       setSelectedPage(data.page);
     } catch (error) {
@@ -93,7 +94,7 @@ const PageBuilder = ({ onBack }: PageBuilderProps) => {
     setLoading(true);
     try {
       const method = selectedPage.id ? 'PUT' : 'POST';
-      const response = await fetch('https://functions.poehali.dev/91d2a680-560a-4c90-8c01-c525dfc2e2b5', {
+      const response = await apiFetch(API_URLS.pageBuilder, {
         method,
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(selectedPage)
@@ -6,6 +6,7 @@ import { Label } from '@/components/ui/label';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
 import Icon from '@/components/ui/icon';
+import { API_URLS, apiFetch } from '@/config/api';
 
 interface ProductDetailProps {
   productId: number;
@@ -86,7 +87,7 @@ const ProductDetail = ({ productId, onBack }: ProductDetailProps) => {
 
   const loadProduct = async () => {
     try {
-      const response = await fetch(`https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417?id=${productId}`);
+      const response = await apiFetch(`${API_URLS.products}?id=${productId}`);
       const data = await response.json();
       if (data.product) {
         setProduct(data.product);
@@ -5,6 +5,7 @@ import { Badge } from '@/components/ui/badge';
 import Icon from '@/components/ui/icon';
 import type { SurveyData } from '@/pages/Index';
 import { calculateRecommendations, getSynergies } from '@/services/vitaminRecommendations';
+import { API_URLS, getSurveyUrl, apiFetch } from '@/config/api';
 
 interface ResultsProps {
   data: SurveyData;
@@ -24,14 +25,24 @@ const Results = ({ data, onViewCatalog, onBack }: ResultsProps) => {
     const loadRecommendations = async () => {
       setLoading(true);
       try {
-        const response = await fetch('https://functions.poehali.dev/6278c723-8882-4348-a57b-4a0136730417');
-        const catalogData = await response.json();
-        const products = catalogData.products || [];
-        
-        const smartRecommendations = calculateRecommendations(data, products);
+        const { getUserId, saveRecommendations } = await import('@/services/recommendationsHistory');
+
+        // Сервер мемоизирует подбор по ответам и сохраняет его в recommendations_history
+        const serverResponse = await apiFetch(getSurveyUrl('recommendations'), {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ survey_data: data, user_id: getUserId() })
+        });
+
+        let smartRecommendations;
+        if (serverResponse.ok) {
+          smartRecommendations = (await serverResponse.json()).recommendations || [];
+        } else {
+          const response = await apiFetch(API_URLS.products);
+          const catalogData = await response.json();
+          smartRecommendations = calculateRecommendations(data, catalogData.products || []);
+        }
         setRecommendations(smartRecommendations);
-        
-        const { saveRecommendations } = await import('@/services/recommendationsHistory');
         saveRecommendations(data, smartRecommendations);
       } catch (error) {
         console.error('Error loading recommendations:', error);
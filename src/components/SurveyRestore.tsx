@@ -4,7 +4,7 @@ import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import Icon from '@/components/ui/icon';
-import { getSurveyUrl } from '@/config/api';
+import { getSurveyUrl, apiFetch } from '@/config/api';
 
 interface SurveyRestoreProps {
   onRestore: (userData: any) => void;
@@ -26,7 +26,7 @@ export default function SurveyRestore({ onRestore, onCancel }: SurveyRestoreProp
     setError('');
 
     try {
-      const response = await fetch(`${getSurveyUrl('user')}&email=${encodeURIComponent(email)}`);
+      const response = await apiFetch(`${getSurveyUrl('user')}&email=${encodeURIComponent(email)}`);
       
       if (response.ok) {
         const data = await response.json();
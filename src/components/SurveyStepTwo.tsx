@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -7,7 +7,7 @@ import { Badge } from '@/components/ui/badge';
 import { Checkbox } from '@/components/ui/checkbox';
 import Icon from '@/components/ui/icon';
 import { StepOneData } from './SurveyStepOne';
-import { getSurveyUrl } from '@/config/api';
+import { getSurveyUrl, apiFetch } from '@/config/api';
 
 interface Question {
   id: number;
@@ -27,6 +27,7 @@ interface Question {
 
 interface SurveyStepTwoProps {
   stepOneData: StepOneData;
+  surveyId: number | null;
   onComplete: (answers: Record<number, any>) => void;
   onBack: () => void;
 }
@@ -38,12 +39,13 @@ const CATEGORY_LABELS: Record<string, string> = {
   complaints: 'Жалобы и состояние здоровья'
 };
 
-export default function SurveyStepTwo({ stepOneData, onComplete, onBack }: SurveyStepTwoProps) {
+export default function SurveyStepTwo({ stepOneData, surveyId, onComplete, onBack }: SurveyStepTwoProps) {
   const [questions, setQuestions] = useState<Question[]>([]);
   const [answers, setAnswers] = useState<Record<number, any>>({});
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [errors, setErrors] = useState<string>('');
   const [loading, setLoading] = useState(true);
+  const savedAnswers = useRef<Record<number, string>>({});
 
   useEffect(() => {
     fetchQuestions();
@@ -51,10 +53,12 @@ export default function SurveyStepTwo({ stepOneData, onComplete, onBack }: Surve
 
   const fetchQuestions = async () => {
     try {
-      const response = await fetch(getSurveyUrl('questions'));
+      const response = await apiFetch(getSurveyUrl('questions'));
       if (response.ok) {
         const data = await response.json();
-        setQuestions(data.questions || []);
+        const loaded: Question[] = data.questions || [];
+        setQuestions(loaded);
+        await resumeProgress(loaded);
       }
     } catch (error) {
       console.error('Error fetching questions:', error);
@@ -63,6 +67,54 @@ export default function SurveyStepTwo({ stepOneData, onComplete, onBack }: Surve
     }
   };
 
+  const resumeProgress = async (loaded: Question[]) => {
+    if (!surveyId) return;
+
+    try {
+      const response = await apiFetch(`${getSurveyUrl('resume')}&survey_id=${surveyId}`);
+      if (!response.ok) return;
+
+      const data = await response.json();
+      const restored: Record<number, any> = data.answers || {};
+      savedAnswers.current = Object.fromEntries(
+        Object.entries(restored).map(([id, value]) => [id, JSON.stringify(value)])
+      );
+      setAnswers(restored);
+
+      const firstUnanswered = loaded.findIndex(q => restored[q.id] === undefined);
+      if (firstUnanswered > 0) {
+        setCurrentQuestionIndex(firstUnanswered);
+      }
+    } catch (error) {
+      console.error('Error resuming survey:', error);
+    }
+  };
+
+  // Отправляет только ответы, изменившиеся с прошлого сохранения
+  const saveProgress = async (step: string) => {
+    if (!surveyId) return;
+
+    const changed = Object.fromEntries(
+      Object.entries(answers).filter(([id, value]) => savedAnswers.current[Number(id)] !== JSON.stringify(value))
+    );
+    if (Object.keys(changed).length === 0) return;
+
+    try {
+      const response = await apiFetch(getSurveyUrl('save'), {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ survey_id: surveyId, step, answers: changed })
+      });
+      if (response.ok) {
+        Object.entries(changed).forEach(([id, value]) => {
+          savedAnswers.current[Number(id)] = JSON.stringify(value);
+        });
+      }
+    } catch (error) {
+      console.error('Error saving progress:', error);
+    }
+  };
+
   const currentQuestion = questions[currentQuestionIndex];
   const currentCategory = currentQuestion?.category || '';
   const categoryQuestions = questions.filter(q => q.category === currentCategory);
@@ -91,6 +143,10 @@ export default function SurveyStepTwo({ stepOneData, onComplete, onBack }: Surve
     setErrors('');
 
     if (currentQuestionIndex < questions.length - 1) {
+      const nextCategory = questions[currentQuestionIndex + 1].category;
+      if (nextCategory !== currentCategory) {
+        saveProgress(nextCategory);
+      }
       setCurrentQuestionIndex(currentQuestionIndex + 1);
     } else {
       onComplete(answers);
@@ -1,4 +1,13 @@
-import funcUrls from '../../backend/func2url.json';
+import cloudUrls from '../../backend/func2url.json';
+
+// Локальный запуск всех функций: VITE_FUNCTIONS_URL=http://localhost:8000 (scripts/dev_server.py)
+const localBase: string | undefined = import.meta.env.VITE_FUNCTIONS_URL;
+
+const funcUrls = localBase
+  ? (Object.fromEntries(
+      Object.keys(cloudUrls).map((name) => [name, `${localBase.replace(/\/$/, '')}/${name}`])
+    ) as typeof cloudUrls)
+  : cloudUrls;
 
 export const API_URLS = {
   survey: funcUrls.survey,
@@ -8,6 +17,24 @@ export const API_URLS = {
   pageBuilder: funcUrls['page-builder']
 };
 
-export const getSurveyUrl = (action: 'questions' | 'register' | 'submit' | 'user') => {
+export const getSurveyUrl = (action: 'questions' | 'register' | 'submit' | 'save' | 'resume' | 'recommendations' | 'user') => {
   return `${API_URLS.survey}?action=${action}`;
 };
+
+// Функции отвечают на запись заголовком X-DB-Pin; пока он действует, чтения
+// идут на основную базу, а не на реплику, и видят только что записанное
+const PIN_HEADER = 'X-DB-Pin';
+let primaryPin: string | null = null;
+
+export const apiFetch = async (input: string, init: RequestInit = {}): Promise<Response> => {
+  const headers = new Headers(init.headers);
+  if (primaryPin) {
+    headers.set(PIN_HEADER, primaryPin);
+  }
+  const response = await fetch(input, { ...init, headers });
+  const pin = response.headers.get(PIN_HEADER);
+  if (pin) {
+    primaryPin = pin;
+  }
+  return response;
+};
@@ -13,7 +13,7 @@ import {
 } from '@/components/ui/select';
 import { Textarea } from '@/components/ui/textarea';
 import Icon from '@/components/ui/icon';
-import { getSurveyUrl, API_URLS } from '@/config/api';
+import { getSurveyUrl, API_URLS, apiFetch } from '@/config/api';
 
 interface Question {
   id: number;
@@ -54,7 +54,7 @@ export default function Admin() {
 
   const fetchQuestions = async () => {
     try {
-      const response = await fetch(`${getSurveyUrl('questions')}&includeInactive=true`);
+      const response = await apiFetch(`${getSurveyUrl('questions')}&includeInactive=true`);
       if (response.ok) {
         const data = await response.json();
         setQuestions(data.questions || []);
@@ -70,7 +70,7 @@ export default function Admin() {
     try {
       const method = question.id ? 'PUT' : 'POST';
 
-      const response = await fetch(getSurveyUrl('questions'), {
+      const response = await apiFetch(getSurveyUrl('questions'), {
         method,
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(question)
@@ -94,7 +94,7 @@ export default function Admin() {
     if (!confirm('Вы уверены, что хотите удалить этот вопрос?')) return;
 
     try {
-      const response = await fetch(`${getSurveyUrl('questions')}&id=${questionId}`, {
+      const response = await apiFetch(`${getSurveyUrl('questions')}&id=${questionId}`, {
         method: 'DELETE'
       });
 
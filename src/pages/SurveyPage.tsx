@@ -2,7 +2,7 @@ import { useState } from 'react';
 import SurveyStepOne, { StepOneData } from '@/components/SurveyStepOne';
 import SurveyStepTwo from '@/components/SurveyStepTwo';
 import SurveyRestore from '@/components/SurveyRestore';
-import { getSurveyUrl } from '@/config/api';
+import { getSurveyUrl, apiFetch } from '@/config/api';
 
 interface SurveyPageProps {
   onComplete: (userId: number, surveyId: number) => void;
@@ -50,7 +50,7 @@ export default function SurveyPage({ onComplete }: SurveyPageProps) {
 
   const handleStepOneComplete = async (data: StepOneData) => {
     try {
-      const response = await fetch(getSurveyUrl('register'), {
+      const response = await apiFetch(getSurveyUrl('register'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(data)
@@ -75,7 +75,7 @@ export default function SurveyPage({ onComplete }: SurveyPageProps) {
     if (!surveyId) return;
 
     try {
-      const response = await fetch(getSurveyUrl('submit'), {
+      const response = await apiFetch(getSurveyUrl('submit'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -174,6 +174,7 @@ export default function SurveyPage({ onComplete }: SurveyPageProps) {
       {step === 2 && stepOneData && (
         <SurveyStepTwo
           stepOneData={stepOneData}
+          surveyId={surveyId}
           onComplete={handleStepTwoComplete}
           onBack={handleBackToStepOne}
         />